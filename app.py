@@ -3,11 +3,24 @@ Flask Web Application
 Provides a simple UI for querying the RAG retrieval system
 """
 
-from flask import Flask, request, render_template_string, jsonify
-from retrieve import retrieve, RetrieverError
+import os
+import time
+_import_started = time.perf_counter()
+
+# Heavy libraries (chromadb, sentence_transformers / torch) are imported on
+# first use or by the warm-up, not here
+from flask import Flask, Response, g, request, render_template_string, jsonify
+from retrieve import retrieve, retrieve_many, retrieve_restaurants, get_retriever, loaded_retriever, RetrieverError, SEARCH_MODES
+from batcher import get_batcher
+from async_search import DeadlineExceeded, Saturated, get_search_executor
+from metadata_index import normalize_filters
+from warmup import startup
+from snapshots import snapshot_dir
+import metrics
 import config
 
 app = Flask(__name__)
+startup.record("import app", time.perf_counter() - _import_started)
 
 # HTML Template with improved styling
 HTML_TEMPLATE = """
@@ -293,6 +306,64 @@ HTML_TEMPLATE = """
 </html>
 """
 
+HTTP_SECONDS = metrics.histogram(
+    "rag_http_request_seconds", "HTTP request latency", ["endpoint"])
+HTTP_REQUESTS = metrics.counter(
+    "rag_http_requests_total", "HTTP requests", ["endpoint", "method", "status"])
+HTTP_ERRORS = metrics.counter(
+    "rag_http_errors_total", "HTTP responses with status >= 500 (503 = shed load)", ["endpoint", "status"])
+
+def cache_gauges(field):
+    """
+    Scrape-time view of one cache stats field, skipped until the retriever exists
+    """
+    def read():
+        retriever = loaded_retriever()
+        if retriever is None:
+            return None
+        stats = retriever.cache_stats()
+        if retriever.embedding_cache is not None:
+            stats["embeddings"] = retriever.embedding_cache.stats()
+        return {(name,): cache[field] for name, cache in stats.items() if field in cache}
+    return read
+
+def index_bytes():
+    directory = config.CHROMA_DIR if config.SEARCH_BACKEND == "chroma" else snapshot_dir()
+    return {(config.SEARCH_BACKEND,): metrics.directory_bytes(directory)}
+
+metrics.gauge("rag_cache_hit_ratio", "Hit ratio of the query-embedding, result and persistent embedding caches",
+              cache_gauges("hit_ratio"), ["cache"])
+metrics.gauge("rag_cache_hits_total", "Cache hits", cache_gauges("hits"), ["cache"], kind="counter")
+metrics.gauge("rag_cache_misses_total", "Cache misses", cache_gauges("misses"), ["cache"], kind="counter")
+metrics.gauge("rag_index_vectors", "Vectors in the search index",
+              lambda: loaded_retriever() and loaded_retriever().backend.size())
+metrics.gauge("rag_index_bytes", "On-disk size of the search index", index_bytes, ["backend"])
+metrics.gauge("rag_index_draining_versions", "Replaced index versions still finishing requests",
+              lambda: loaded_retriever() and len(loaded_retriever().draining))
+metrics.gauge("rag_search_in_flight", "/api/search requests admitted and not finished",
+              lambda: get_search_executor().in_flight)
+metrics.gauge("rag_search_rejected_total", "/api/search requests refused with 503 (queue full)",
+              lambda: get_search_executor().rejected, kind="counter")
+metrics.gauge("rag_search_timed_out_total", "/api/search requests past their deadline",
+              lambda: get_search_executor().timed_out, kind="counter")
+
+@app.before_request
+def start_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request(response):
+    """
+    Count every request and observe its latency, labelled by route (not raw path)
+    """
+    endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+    if "request_started" in g:
+        HTTP_SECONDS.observe(time.perf_counter() - g.request_started, endpoint=endpoint)
+    HTTP_REQUESTS.inc(endpoint=endpoint, method=request.method, status=response.status_code)
+    if response.status_code >= 500:
+        HTTP_ERRORS.inc(endpoint=endpoint, status=response.status_code)
+    return response
+
 @app.route("/", methods=["GET", "POST"])
 def index():
     """
@@ -328,10 +399,24 @@ def index():
         threshold=threshold
     )
 
+def busy(error):
+    """
+    503 response telling the client when to retry
+    """
+    response = jsonify({"error": str(error)})
+    response.status_code = 503
+    response.headers["Retry-After"] = str(error.retry_after)
+    return response
+
 @app.route("/api/search", methods=["POST"])
-def api_search():
+async def api_search():
     """
     API endpoint for programmatic access
+    
+    Encoding and search run on the bounded search executor (with micro-batching,
+    the request awaits its batch instead of holding an executor thread); when
+    its queue is full or the request's deadline passes, the client gets 503 +
+    Retry-After.
     """
     data = request.get_json()
     
@@ -346,13 +431,97 @@ def api_search():
     try:
         top_k = data.get("top_k", config.TOP_K)
         threshold = data.get("threshold", config.SIMILARITY_THRESHOLD)
-        
-        results = retrieve(query, top_k=top_k, threshold=threshold)
+        filters = data.get("filters")
+        mode = data.get("mode", config.SEARCH_MODE)
+        
+        try:
+            normalize_filters(filters)
+        except ValueError as e:
+            return jsonify({"error": f"Invalid filters: {e}"}), 400
+        if mode not in SEARCH_MODES:
+            return jsonify({"error": f"'mode' must be one of: {', '.join(SEARCH_MODES)}"}), 400
+        
+        deadline_ms = data.get("deadline_ms")
+        if deadline_ms is not None:
+            if isinstance(deadline_ms, bool) or not isinstance(deadline_ms, (int, float)) or deadline_ms <= 0:
+                return jsonify({"error": "'deadline_ms' must be a positive number"}), 400
+        
+        timings = {}
+        try:
+            if config.MICRO_BATCHING:
+                results = await get_search_executor().run_future(
+                    get_batcher().submit, query, top_k, threshold, filters, mode,
+                    concurrency=config.BATCH_MAX_SIZE, deadline_ms=deadline_ms
+                )
+            else:
+                results = await get_search_executor().run(
+                    retrieve, query, top_k, threshold, filters, mode, timings, deadline_ms=deadline_ms
+                )
+        except (Saturated, DeadlineExceeded) as e:
+            return busy(e)
         
         return jsonify({
             "query": query,
+            "mode": mode,
             "results": results,
-            "count": len(results)
+            "count": len(results),
+            "timings_ms": timings or None
+        })
+    
+    except RetrieverError as e:
+        return jsonify({"error": str(e)}), 500
+    except Exception as e:
+        return jsonify({"error": f"An unexpected error occurred: {e}"}), 500
+
+@app.route("/api/search/batch", methods=["POST"])
+async def api_search_batch():
+    """
+    Batched API endpoint: encodes and searches all queries together, on the
+    same bounded search executor as /api/search
+    """
+    data = request.get_json()
+    
+    if not data or not isinstance(data.get("queries"), list):
+        return jsonify({"error": "Missing 'queries' list parameter"}), 400
+    
+    queries = [q.strip() if isinstance(q, str) else "" for q in data["queries"]]
+    
+    if not queries:
+        return jsonify({"error": "Queries cannot be empty"}), 400
+    if len(queries) > config.MAX_BATCH_QUERIES:
+        return jsonify({"error": f"At most {config.MAX_BATCH_QUERIES} queries per batch"}), 400
+    if not all(queries):
+        return jsonify({"error": "Query cannot be empty"}), 400
+    
+    try:
+        top_k = data.get("top_k", config.TOP_K)
+        threshold = data.get("threshold", config.SIMILARITY_THRESHOLD)
+        filters = data.get("filters")
+        mode = data.get("mode", config.SEARCH_MODE)
+        
+        try:
+            normalize_filters(filters)
+        except ValueError as e:
+            return jsonify({"error": f"Invalid filters: {e}"}), 400
+        if mode not in SEARCH_MODES:
+            return jsonify({"error": f"'mode' must be one of: {', '.join(SEARCH_MODES)}"}), 400
+        
+        timings = {}
+        try:
+            all_results = await get_search_executor().run(
+                retrieve_many, queries, top_k, threshold, filters, mode, timings
+            )
+        except (Saturated, DeadlineExceeded) as e:
+            return busy(e)
+        
+        return jsonify({
+            "results": [
+                {"query": query, "results": results, "count": len(results)}
+                for query, results in zip(queries, all_results)
+            ],
+            "count": len(queries),
+            "mode": mode,
+            "timings_ms": timings
         })
     
     except RetrieverError as e:
@@ -360,13 +529,87 @@ def api_search():
     except Exception as e:
         return jsonify({"error": f"An unexpected error occurred: {e}"}), 500
 
+@app.route("/api/restaurants", methods=["POST"])
+def api_restaurants():
+    """
+    Restaurant-level API endpoint: best restaurants for a query, each with
+    its review stats and a few supporting reviews
+    """
+    data = request.get_json()
+    
+    if not data or "query" not in data:
+        return jsonify({"error": "Missing 'query' parameter"}), 400
+    
+    query = data["query"].strip() if isinstance(data["query"], str) else ""
+    
+    if not query:
+        return jsonify({"error": "Query cannot be empty"}), 400
+    
+    top_k = data.get("top_k", config.RESTAURANT_TOP_K)
+    reviews = data.get("reviews", config.RESTAURANT_REVIEWS)
+    min_reviews = data.get("min_reviews", 1)
+    for name, value, low in (("top_k", top_k, 1), ("reviews", reviews, 0), ("min_reviews", min_reviews, 1)):
+        if not isinstance(value, int) or isinstance(value, bool) or value < low:
+            return jsonify({"error": f"'{name}' must be an integer >= {low}"}), 400
+    
+    try:
+        timings = {}
+        restaurants = retrieve_restaurants(query, top_k=top_k, reviews=reviews, min_reviews=min_reviews, timings=timings)
+        
+        return jsonify({
+            "query": query,
+            "restaurants": restaurants,
+            "count": len(restaurants),
+            "timings_ms": timings
+        })
+    
+    except RetrieverError as e:
+        return jsonify({"error": str(e)}), 500
+    except Exception as e:
+        return jsonify({"error": f"An unexpected error occurred: {e}"}), 500
+
+@app.route("/api/stats")
+def api_stats():
+    """
+    Admission control, cache and micro-batching statistics
+    """
+    stats = {
+        "search_executor": get_search_executor().stats(),
+        "micro_batching": get_batcher().stats() if config.MICRO_BATCHING else None
+    }
+    try:
+        retriever = get_retriever()
+        stats["caches"] = retriever.cache_stats()
+        stats["index"] = retriever.index_stats()
+    except RetrieverError as e:
+        stats["caches"] = {"error": str(e)}
+    stats["slow_queries"] = list(metrics.slow_queries.recent)[-10:]
+    return jsonify(stats)
+
+@app.route("/metrics")
+def prometheus_metrics():
+    """
+    Prometheus text exposition: request, retrieval-stage and ingestion-stage
+    latency histograms, request/error counters, cache hit ratios and index size
+    """
+    return Response(metrics.REGISTRY.render(), mimetype="text/plain; version=0.0.4")
+
 @app.route("/health")
 def health():
     """
-    Health check endpoint
+    Liveness check: the process is up (it may still be warming up, see /ready)
     """
     return jsonify({"status": "ok"})
 
+@app.route("/ready")
+def ready():
+    """
+    Readiness check: 200 once the model is loaded, the index is open and a
+    dummy query has run; 503 before that (or if warm-up failed)
+    """
+    status = startup.status()
+    return jsonify(status), 200 if startup.ready else 503
+
 if __name__ == "__main__":
     print("\n" + "="*50)
     print("🚀 Starting Flask Application")
@@ -374,6 +617,13 @@ if __name__ == "__main__":
     print(f"📊 Collection: {config.COLLECTION_NAME}")
     print(f"🔍 Top-K: {config.TOP_K}")
     print(f"📏 Threshold: {config.SIMILARITY_THRESHOLD}")
+    print(f"🔎 Search mode: {config.SEARCH_MODE}")
+    if config.MICRO_BATCHING:
+        print(f"📦 Micro-batching: {config.BATCH_WINDOW_MS}ms window, max {config.BATCH_MAX_SIZE}")
     print("="*50 + "\n")
     
+    # With the reloader, only the child process (WERKZEUG_RUN_MAIN) serves requests
+    if config.WARM_UP_ON_BOOT and os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        startup.start()
+    
     app.run(debug=True, host="0.0.0.0", port=5000)
\ No newline at end of file
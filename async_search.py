@@ -0,0 +1,185 @@
+"""
+Async Search Admission Control
+Bounded executor behind the async /api/search handler: encoding and vector
+search run on a fixed pool of threads, at most a fixed number of requests may
+wait for one, and every request has a deadline
+"""
+
+import asyncio
+import math
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import config
+
+class Saturated(Exception):
+    """Too many requests already waiting; retry after `retry_after` seconds"""
+
+    def __init__(self, retry_after):
+        super().__init__(f"Search queue is full, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+class DeadlineExceeded(Exception):
+    """The request did not finish (or start) before its deadline"""
+
+    def __init__(self, retry_after):
+        super().__init__(f"Search deadline exceeded, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+class SearchExecutor:
+    """
+    Runs blocking search calls for coroutines, with admission control
+
+    A request is admitted only while fewer than workers + max_queue requests
+    are running or waiting; otherwise Saturated is raised at once. Admitted
+    requests that are still queued when their deadline passes are dropped
+    without doing the work.
+    """
+
+    def __init__(self, workers=None, max_queue=None, deadline_ms=None):
+        """
+        Args:
+            workers (int): Threads running searches
+            max_queue (int): Admitted requests allowed to wait for a thread
+            deadline_ms (float): Default per-request deadline
+        """
+        self.workers = workers or config.SEARCH_WORKERS
+        self.max_queue = config.SEARCH_QUEUE_LIMIT if max_queue is None else max_queue
+        self.deadline = (deadline_ms or config.SEARCH_DEADLINE_MS) / 1000
+
+        self._lock = threading.Lock()
+        self._executor = None
+        self._executor_pid = None
+
+        self.in_flight = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.completed = 0
+        self.service_time = None  # Moving average of seconds per search
+
+    def _get_executor(self):
+        # Threads don't survive fork: each worker process gets its own pool
+        if self._executor is None or self._executor_pid != os.getpid():
+            self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix="search")
+            self._executor_pid = os.getpid()
+        return self._executor
+
+    def retry_after(self):
+        """
+        Seconds until the current backlog should have drained (at least 1)
+        """
+        per_search = self.service_time or 0.1
+        return max(1, math.ceil(self.in_flight * per_search / self.workers))
+
+    def _timeout(self, deadline_ms):
+        return min(self.deadline, deadline_ms / 1000) if deadline_ms else self.deadline
+
+    def _admit(self, concurrency):
+        with self._lock:
+            if self.in_flight >= concurrency + self.max_queue:
+                self.rejected += 1
+                raise Saturated(self.retry_after())
+            self.in_flight += 1
+            self.admitted += 1
+
+    async def run(self, fn, *args, deadline_ms=None):
+        """
+        Run fn(*args) on the pool and await its result
+
+        Raises:
+            Saturated: The queue is full (nothing was started)
+            DeadlineExceeded: No result before the deadline
+        """
+        timeout = self._timeout(deadline_ms)
+        self._admit(self.workers)
+        with self._lock:
+            executor = self._get_executor()
+
+        expires = time.monotonic() + timeout
+        future = executor.submit(self._call, expires, fn, args)
+        return await self._wait(future, timeout)
+
+    async def run_future(self, submit, *args, concurrency=None, deadline_ms=None):
+        """
+        Await work that is asynchronous already: submit(*args) returns a
+        concurrent.futures.Future (e.g. QueryBatcher.submit), so no pool thread
+        is held while it runs. On timeout the future is cancelled, which
+        callees that check set_running_or_notify_cancel() skip.
+
+        Args:
+            concurrency (int): Requests the callee serves at once (default: workers);
+                up to max_queue more may wait
+
+        Raises:
+            Saturated: The queue is full (nothing was submitted)
+            DeadlineExceeded: No result before the deadline
+        """
+        timeout = self._timeout(deadline_ms)
+        self._admit(concurrency or self.workers)
+        started = time.perf_counter()
+        try:
+            future = submit(*args)
+        except BaseException:
+            self._release(None)
+            raise
+        future.add_done_callback(lambda f: f.cancelled() or self._completed(time.perf_counter() - started))
+        return await self._wait(future, timeout)
+
+    async def _wait(self, future, timeout):
+        # Capacity is released when the work really ends, not when the caller gives up
+        future.add_done_callback(self._release)
+
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+        except (asyncio.TimeoutError, DeadlineExceeded):
+            # Cancelling the wrapper also cancels the pool future if it hasn't started
+            with self._lock:
+                self.timed_out += 1
+            raise DeadlineExceeded(self.retry_after())
+
+    def _call(self, expires, fn, args):
+        if time.monotonic() >= expires:
+            raise DeadlineExceeded(self.retry_after())
+        started = time.perf_counter()
+        result = fn(*args)
+        self._completed(time.perf_counter() - started)
+        return result
+
+    def _completed(self, elapsed):
+        with self._lock:
+            self.completed += 1
+            self.service_time = elapsed if self.service_time is None else 0.9 * self.service_time + 0.1 * elapsed
+
+    def _release(self, future):
+        with self._lock:
+            self.in_flight -= 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "deadline_ms": 1000 * self.deadline,
+                "in_flight": self.in_flight,
+                "admitted": self.admitted,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "timed_out": self.timed_out,
+                "mean_service_ms": 1000 * self.service_time if self.service_time is not None else None,
+            }
+
+# Singleton instance
+_search_executor = None
+_search_executor_lock = threading.Lock()
+
+def get_search_executor():
+    """
+    Get or create the shared search executor
+    """
+    global _search_executor
+    with _search_executor_lock:
+        if _search_executor is None:
+            _search_executor = SearchExecutor()
+    return _search_executor
@@ -0,0 +1,176 @@
+"""
+Query Micro-Batching
+Coalesces concurrent single-query searches into one batched encode + search
+"""
+
+import os
+import queue
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import Future
+import config
+from retrieve import get_retriever
+from metadata_index import filters_key
+
+# Recent queueing delays kept for percentile reporting
+_DELAY_SAMPLES = 2048
+
+class QueryBatcher:
+    """
+    Collects queries arriving within a short window (up to a maximum batch
+    size), runs them through Retriever.retrieve_many together, and hands each
+    caller its own results
+    """
+
+    def __init__(self, window_ms=None, max_batch=None, retriever_factory=get_retriever):
+        """
+        Args:
+            window_ms (float): How long the first query of a batch waits for company
+            max_batch (int): Flush as soon as this many queries are waiting
+            retriever_factory (callable): Returns the Retriever to search with
+        """
+        self.window = (config.BATCH_WINDOW_MS if window_ms is None else window_ms) / 1000
+        self.max_batch = max_batch or config.BATCH_MAX_SIZE
+        self.retriever_factory = retriever_factory
+
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker = None
+        self._worker_pid = None
+
+        self.batch_sizes = Counter()
+        self.batches = 0
+        self.queries = 0
+        self.delay_total = 0.0
+        self.delay_max = 0.0
+        self._delays = deque(maxlen=_DELAY_SAMPLES)
+
+    def _ensure_worker(self):
+        """
+        Start the collector thread (again, after a fork: threads don't survive it)
+        """
+        with self._lock:
+            if self._worker is None or self._worker_pid != os.getpid() or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="query-batcher", daemon=True)
+                self._worker_pid = os.getpid()
+                self._worker.start()
+
+    def submit(self, query, top_k=None, threshold=None, filters=None, mode=None):
+        """
+        Queue a query
+
+        Returns:
+            Future: Resolves to the same list retrieve() would return
+        """
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((query, top_k, threshold, filters, mode, time.perf_counter(), future))
+        return future
+
+    def search(self, query, top_k=None, threshold=None, filters=None, mode=None, timeout=None):
+        """
+        Blocking convenience wrapper around submit()
+        """
+        return self.submit(query, top_k, threshold, filters, mode).result(timeout)
+
+    def _collect(self):
+        """
+        Block for the first query, then gather more until the window closes
+        or the batch is full
+        """
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            started = time.perf_counter()
+            self._record(batch, started)
+
+            # Queries with different parameters can't share a search call
+            groups = {}
+            for item in batch:
+                try:
+                    key = (item[1], item[2], filters_key(item[3]), item[4])
+                except TypeError:
+                    # Unhashable (invalid) filters: search alone, retrieve_many reports the error
+                    key = id(item)
+                groups.setdefault(key, []).append(item)
+
+            for items in groups.values():
+                # Skip queries whose caller gave up (cancelled) while they waited
+                items = [item for item in items if item[6].set_running_or_notify_cancel()]
+                if not items:
+                    continue
+                top_k, threshold, filters, mode = items[0][1:5]
+                try:
+                    retriever = self.retriever_factory()
+                    results = retriever.retrieve_many([item[0] for item in items], top_k, threshold, filters, mode)
+                except Exception as e:
+                    for item in items:
+                        item[6].set_exception(e)
+                    continue
+                for item, item_results in zip(items, results):
+                    item[6].set_result(item_results)
+
+    def _record(self, batch, started):
+        with self._lock:
+            self.batches += 1
+            self.queries += len(batch)
+            self.batch_sizes[len(batch)] += 1
+            for item in batch:
+                delay = started - item[5]
+                self.delay_total += delay
+                self.delay_max = max(self.delay_max, delay)
+                self._delays.append(delay)
+
+    def stats(self):
+        """
+        Batch-size distribution and queueing delay (milliseconds)
+        """
+        with self._lock:
+            delays = sorted(self._delays)
+
+        def percentile(p):
+            if not delays:
+                return 0.0
+            return 1000 * delays[min(len(delays) - 1, int(p / 100 * len(delays)))]
+
+        return {
+            "batches": self.batches,
+            "queries": self.queries,
+            "mean_batch_size": self.queries / self.batches if self.batches else 0.0,
+            "batch_sizes": dict(sorted(self.batch_sizes.items())),
+            "queue_delay_ms": {
+                "mean": 1000 * self.delay_total / self.queries if self.queries else 0.0,
+                "p50": percentile(50),
+                "p95": percentile(95),
+                "p99": percentile(99),
+                "max": 1000 * self.delay_max,
+            },
+            "pending": self._queue.qsize(),
+        }
+
+# Singleton instance
+_batcher = None
+_batcher_lock = threading.Lock()
+
+def get_batcher():
+    """
+    Get or create the shared batcher
+    """
+    global _batcher
+    with _batcher_lock:
+        if _batcher is None:
+            _batcher = QueryBatcher()
+    return _batcher
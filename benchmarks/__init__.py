@@ -0,0 +1,12 @@
+"""
+Benchmark Suite
+Synthetic corpora, ingest throughput, query latency percentiles and recall@k,
+reported as JSON so results can be compared between releases
+
+Usage:
+    python -m benchmarks corpus --rows 100000
+    python -m benchmarks ingest --csv data/bench_100000.csv
+    python -m benchmarks query --concurrency 1 4 16 [--url http://localhost:5000/api/search]
+    python -m benchmarks recall --backends chroma numpy quantized
+    python -m benchmarks all --rows 10000 --json bench.json
+"""
@@ -0,0 +1,117 @@
+"""
+Benchmark command line (python -m benchmarks ...); see benchmarks/__init__.py
+"""
+
+import argparse
+import os
+import config
+from benchmarks.common import disable_caches, use_workspace, write_report
+from benchmarks.corpus import generate_corpus, sample_queries
+
+DEFAULT_WORKSPACE = "./bench_workspace"
+
+def corpus_path(rows):
+    return os.path.join("data", f"bench_{rows}.csv")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Performance benchmarks")
+    parser.add_argument("--workspace", default=DEFAULT_WORKSPACE,
+                        help="scratch directory for the benchmark's collection, index and caches")
+    parser.add_argument("--json", help="write results to this JSON file")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    corpus = commands.add_parser("corpus", help="generate a synthetic review CSV")
+    corpus.add_argument("--rows", type=int, default=10000)
+    corpus.add_argument("--out", help="output CSV (default: data/bench_<rows>.csv)")
+    corpus.add_argument("--seed", type=int, default=0)
+
+    def add_ingest(sub):
+        sub.add_argument("--workers", type=int, help="embedding worker processes (0 = one per CPU)")
+        sub.add_argument("--batch-size", type=int, help="reviews per ingest batch")
+        sub.add_argument("--quantize", choices=("int8", "pq"), help="also build quantized codes")
+        sub.add_argument("--cache", action="store_true", help="keep the embedding cache enabled")
+
+    ingest = commands.add_parser("ingest", help="ingest throughput, overall and per stage")
+    ingest.add_argument("--csv", required=True)
+    add_ingest(ingest)
+
+    def add_query(sub):
+        sub.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+        sub.add_argument("--requests", type=int, default=200, help="queries per concurrency level")
+        sub.add_argument("--top-k", type=int, default=config.TOP_K)
+        sub.add_argument("--mode", choices=("vector", "lexical", "hybrid"), help="search mode")
+        sub.add_argument("--url", help="benchmark this /api/search URL instead of in-process retrieve()")
+        sub.add_argument("--warm-cache", action="store_true", help="keep the retriever caches enabled")
+
+    query = commands.add_parser("query", help="query latency percentiles at fixed concurrency")
+    query.add_argument("--csv", help="corpus to draw queries from (default: config.DATA_PATH)")
+    add_query(query)
+
+    recall = commands.add_parser("recall", help="recall@k of search backends vs exact search")
+    recall.add_argument("--csv", help="corpus to draw queries from (default: config.DATA_PATH)")
+    recall.add_argument("--backends", nargs="+", default=["chroma", "numpy", "quantized"])
+    recall.add_argument("--queries", type=int, default=200)
+    recall.add_argument("--k", type=int, default=10)
+
+    every = commands.add_parser("all", help="corpus + ingest + recall + query in one report")
+    every.add_argument("--rows", type=int, default=10000)
+    add_ingest(every)
+    add_query(every)
+    every.add_argument("--backends", nargs="+", default=["chroma", "numpy", "quantized"])
+    every.add_argument("--k", type=int, default=10)
+    return parser.parse_args(argv)
+
+def run_query(args, csv_path):
+    from benchmarks.query_bench import bench_queries, http_target, retrieve_target
+
+    if not args.warm_cache:
+        disable_caches()
+    queries = sample_queries(csv_path, max(args.requests, 50))
+    target = http_target(args.url, args.top_k, args.mode) if args.url else retrieve_target(args.top_k, args.mode)
+    return {
+        "target": args.url or "retrieve",
+        "mode": args.mode or config.SEARCH_MODE,
+        "top_k": args.top_k,
+        "caches": bool(args.warm_cache),
+        "levels": bench_queries(target, queries, args.concurrency, args.requests),
+    }
+
+def main(argv=None):
+    args = parse_args(argv)
+    results = {}
+
+    if args.command == "corpus":
+        out = args.out or corpus_path(args.rows)
+        generate_corpus(args.rows, out, seed=args.seed)
+        print(f"✓ Wrote {args.rows} synthetic reviews to {out}")
+        return
+
+    use_workspace(args.workspace)
+
+    if args.command in ("ingest", "all"):
+        from benchmarks.ingest_bench import bench_ingest
+
+        if args.command == "all":
+            args.csv = corpus_path(args.rows)
+            if not os.path.exists(args.csv):
+                generate_corpus(args.rows, args.csv)
+        if not args.cache:
+            config.USE_EMBEDDING_CACHE = False
+        quantize = args.quantize or ("int8" if "quantized" in getattr(args, "backends", []) else None)
+        results["ingest"] = bench_ingest(args.csv, args.workers, args.batch_size, export=True, quantize=quantize)
+
+    csv_path = args.csv or config.DATA_PATH
+
+    if args.command in ("recall", "all"):
+        from benchmarks.recall import bench_recall
+
+        queries = sample_queries(csv_path, getattr(args, "queries", 200))
+        results["recall"] = bench_recall(args.backends, queries, args.k)
+
+    if args.command in ("query", "all"):
+        results["query"] = run_query(args, csv_path)
+
+    write_report(results, args.json)
+
+if __name__ == "__main__":
+    main()
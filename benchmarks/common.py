@@ -0,0 +1,87 @@
+"""
+Shared helpers: benchmark workspace, latency percentiles and the JSON report
+"""
+
+import json
+import os
+import platform
+import subprocess
+import time
+import numpy as np
+import config
+
+def use_workspace(directory, data_path=None):
+    """
+    Point ingestion and retrieval at a scratch directory so benchmarks never
+    touch the real ./chroma_db, ./vector_index or embedding cache
+    """
+    os.makedirs(directory, exist_ok=True)
+    config.CHROMA_DIR = os.path.join(directory, "chroma_db")
+    config.INDEX_VERSION_FILE = os.path.join(config.CHROMA_DIR, "index_version")
+    config.INGEST_CHECKPOINT = os.path.join(config.CHROMA_DIR, "ingest_checkpoint.json")
+    config.HNSW_SETTINGS_FILE = os.path.join(config.CHROMA_DIR, "hnsw_settings.json")
+    config.VECTOR_INDEX_DIR = os.path.join(directory, "vector_index")
+    config.EMBEDDING_CACHE_DIR = os.path.join(directory, "embedding_cache")
+    if data_path:
+        config.DATA_PATH = data_path
+
+def disable_caches():
+    """
+    Measure cold work: no embedding, query-embedding or result caching
+    """
+    config.USE_EMBEDDING_CACHE = False
+    config.QUERY_CACHE_SIZE = 0
+    config.RESULT_CACHE_SIZE = 0
+
+def percentiles(seconds):
+    """
+    Latency summary in milliseconds
+    """
+    if len(seconds) == 0:
+        return {"count": 0}
+    ms = 1000 * np.asarray(seconds, dtype=np.float64)
+    return {
+        "count": int(len(ms)),
+        "mean": float(ms.mean()),
+        "p50": float(np.percentile(ms, 50)),
+        "p95": float(np.percentile(ms, 95)),
+        "p99": float(np.percentile(ms, 99)),
+        "max": float(ms.max()),
+    }
+
+def environment():
+    """
+    What a result was measured on: code version, machine and relevant settings
+    """
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, timeout=10
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "git_commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "config": {
+            name: getattr(config, name)
+            for name in (
+                "EMBEDDING_MODEL", "ENCODER_BACKEND", "SEARCH_BACKEND", "SEARCH_MODE", "QUANTIZATION",
+                "INGEST_BATCH_SIZE", "ENCODE_BATCH_SIZE", "EMBED_WORKERS", "TOP_K",
+            )
+        },
+    }
+
+def write_report(results, path):
+    """
+    Write {"environment", **results} as JSON (and return it)
+    """
+    report = {"environment": environment(), **results}
+    if path:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"✓ Report written to {path}")
+    return report
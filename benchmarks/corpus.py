@@ -0,0 +1,100 @@
+"""
+Synthetic Corpora
+Scales the review CSV up to any size by recombining its sentences, keeping
+the same columns and realistic rating / restaurant / date distributions
+"""
+
+import os
+import re
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+import config
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+def sentence_pools(texts, ratings):
+    """
+    Sentences of the source reviews, grouped by the review's rating
+    """
+    pools = {}
+    for text, rating in zip(texts, ratings):
+        for sentence in _SENTENCE_END.split(str(text)):
+            sentence = sentence.strip()
+            if len(sentence.split()) >= 3:
+                pools.setdefault(int(rating), []).append(sentence)
+    return {rating: np.array(sentences, dtype=object) for rating, sentences in pools.items()}
+
+def generate_corpus(rows, out_path, source=None, seed=0, chunk_rows=100000,
+                    min_sentences=2, max_sentences=6, reviews_per_restaurant=200):
+    """
+    Write a synthetic review CSV with `rows` rows
+
+    Each review joins min..max sentences drawn from source reviews with the same
+    rating. Restaurants grow with the corpus (about reviews_per_restaurant each);
+    dates are uniform over the source's date range. Rows are written in chunks,
+    so memory stays bounded for millions of rows.
+
+    Returns:
+        str: out_path
+    """
+    source_df = pd.read_csv(source or config.DATA_PATH)
+    source_df = source_df.dropna(subset=[config.TEXT_COLUMN])
+    ratings_source = pd.to_numeric(source_df[config.RATING_COLUMN], errors="coerce").fillna(0).astype(int)
+    pools = sentence_pools(source_df[config.TEXT_COLUMN], ratings_source)
+    rating_values = np.array(sorted(pools))
+    rating_weights = np.array([(ratings_source == r).sum() for r in rating_values], dtype=np.float64)
+    rating_weights /= rating_weights.sum()
+
+    base_restaurants = sorted(source_df[config.RESTAURANT_COLUMN].dropna().unique())
+    restaurant_count = max(len(base_restaurants), rows // reviews_per_restaurant)
+    restaurants = np.array([
+        base_restaurants[i % len(base_restaurants)] + ("" if i < len(base_restaurants) else f"-{i}")
+        for i in range(restaurant_count)
+    ], dtype=object)
+
+    dates = pd.to_datetime(source_df[config.DATE_COLUMN], format=config.DATE_FORMAT, errors="coerce").dropna()
+    first = dates.min() if len(dates) else datetime(2020, 1, 1)
+    span_days = max(1, (dates.max() - first).days) if len(dates) else 365
+
+    rng = np.random.default_rng(seed)
+    os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+    written = 0
+    while written < rows:
+        n = min(chunk_rows, rows - written)
+        ratings = rng.choice(rating_values, n, p=rating_weights)
+        lengths = rng.integers(min_sentences, max_sentences + 1, n)
+        texts = []
+        for rating, length in zip(ratings, lengths):
+            pool = pools[rating]
+            texts.append(" ".join(pool[rng.integers(0, len(pool), length)]))
+        offsets = rng.integers(0, span_days + 1, n)
+        chunk = pd.DataFrame({
+            config.RESTAURANT_COLUMN: restaurants[rng.integers(0, len(restaurants), n)],
+            config.RATING_COLUMN: ratings,
+            config.DATE_COLUMN: [(first + timedelta(days=int(d))).strftime(config.DATE_FORMAT) for d in offsets],
+            config.TEXT_COLUMN: texts,
+        })
+        chunk.to_csv(out_path, mode="w" if written == 0 else "a", header=written == 0, index=False)
+        written += n
+    return out_path
+
+def sample_queries(path, count, seed=1, words=6):
+    """
+    Short query-like strings: the first few words of randomly chosen reviews
+
+    Sampled chunk by chunk (a random key per row, keeping the smallest keys),
+    so the corpus is never loaded whole.
+    """
+    rng = np.random.default_rng(seed)
+    keys = np.zeros(0)
+    kept = []
+    for chunk in pd.read_csv(path, usecols=[config.TEXT_COLUMN], chunksize=config.CSV_CHUNK_ROWS):
+        texts = chunk[config.TEXT_COLUMN].dropna().astype(str).tolist()
+        keys = np.concatenate([keys, rng.random(len(texts))])
+        kept.extend(" ".join(t.split()[:words]) for t in texts)
+        if len(kept) > count:
+            best = np.argsort(keys)[:count]
+            keys = keys[best]
+            kept = [kept[i] for i in best]
+    return kept
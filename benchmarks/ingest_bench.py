@@ -0,0 +1,45 @@
+"""
+Ingest Throughput
+Runs the pipelined streaming ingest on a corpus and reports rows/sec overall
+and per stage (parse, embed, write), plus the index export
+"""
+
+import time
+import config
+
+def bench_ingest(csv_path, workers=None, batch_size=None, export=True, quantize=None):
+    """
+    Ingest csv_path into the current workspace (see common.use_workspace)
+
+    Returns:
+        dict: Overall and per-stage throughput
+    """
+    import ingest
+
+    config.DATA_PATH = csv_path
+    if workers is not None:
+        config.EMBED_WORKERS = workers
+    if batch_size:
+        config.INGEST_BATCH_SIZE = batch_size
+
+    summary = ingest.stream_ingest(pipelined=True)
+    result = {
+        "csv": csv_path,
+        "rows": summary["rows"],
+        "stored": summary["stored"],
+        "seconds": summary["seconds"],
+        "rows_per_sec": summary["rows"] / max(summary["seconds"], 1e-9),
+        "stages": summary["stages"],
+        "embed_workers": config.EMBED_WORKERS,
+        "batch_size": config.INGEST_BATCH_SIZE,
+    }
+
+    if export or quantize:
+        started = time.perf_counter()
+        ingest.export_vector_index(quantize)
+        result["export_seconds"] = time.perf_counter() - started
+        result["quantize"] = quantize
+    ingest.mark_index_updated()
+
+    print(f"✓ Ingested {result['rows']} rows at {result['rows_per_sec']:.0f} rows/sec")
+    return result
@@ -0,0 +1,97 @@
+"""
+Query Latency
+Closed-loop load at fixed concurrency against retrieve() in-process or the
+/api/search endpoint over HTTP; reports latency percentiles and throughput
+"""
+
+import json
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from benchmarks.common import percentiles
+
+def retrieve_target(top_k, mode=None):
+    """
+    Callable running one in-process search
+    """
+    from retrieve import get_retriever
+
+    retriever = get_retriever()
+    return lambda query: retriever.retrieve(query, top_k, mode=mode)
+
+def http_target(url, top_k, mode=None, timeout=30):
+    """
+    Callable POSTing one query to /api/search
+
+    Raises urllib.error.HTTPError on non-2xx responses (503 counts as rejected).
+    """
+    def call(query):
+        body = {"query": query, "top_k": top_k}
+        if mode:
+            body["mode"] = mode
+        request = urllib.request.Request(
+            url, data=json.dumps(body).encode("utf-8"), headers={"Content-Type": "application/json"}
+        )
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return json.load(response)
+    return call
+
+def run_load(target, queries, concurrency, requests):
+    """
+    `concurrency` clients issue `requests` queries in total, each sending its
+    next query as soon as the previous one returns
+
+    Returns:
+        dict: Latency percentiles (ms) of successful requests, throughput and failures
+    """
+    latencies = []
+    rejected = 0
+    errors = 0
+
+    def one(i):
+        started = time.perf_counter()
+        try:
+            target(queries[i % len(queries)])
+            return "ok", time.perf_counter() - started
+        except urllib.error.HTTPError as e:
+            return ("rejected" if e.code == 503 else "error"), None
+        except Exception:
+            return "error", None
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        for outcome, seconds in pool.map(one, range(requests)):
+            if outcome == "ok":
+                latencies.append(seconds)
+            elif outcome == "rejected":
+                rejected += 1
+            else:
+                errors += 1
+    wall = time.perf_counter() - started
+
+    return {
+        "concurrency": concurrency,
+        "requests": requests,
+        "latency_ms": percentiles(latencies),
+        "throughput_qps": len(latencies) / wall if wall > 0 else 0.0,
+        "rejected": rejected,
+        "errors": errors,
+    }
+
+def bench_queries(target, queries, concurrency_levels, requests, warmup=5):
+    """
+    run_load at each concurrency level, after a few warm-up queries
+    """
+    for query in queries[:warmup]:
+        target(query)
+
+    results = []
+    for concurrency in concurrency_levels:
+        result = run_load(target, queries, concurrency, requests)
+        latency = result["latency_ms"]
+        print(f"✓ concurrency {concurrency:>3}: p50 {latency.get('p50', 0):7.1f}ms "
+              f"p95 {latency.get('p95', 0):7.1f}ms p99 {latency.get('p99', 0):7.1f}ms "
+              f"{result['throughput_qps']:7.1f} q/s ({result['rejected']} rejected, {result['errors']} errors)")
+        results.append(result)
+    return results
@@ -0,0 +1,54 @@
+"""
+Recall Against Exact Search
+Compares each search backend's top-k with brute-force exact search over the
+exported vectors, and times the backend search alone
+"""
+
+import time
+import numpy as np
+import config
+from benchmarks.common import percentiles
+from snapshots import snapshot_dir
+from vector_index import VectorIndex, recall_at_k, top_k_l2
+
+def exact_ids(index, query_embeddings, k):
+    """
+    Ground truth: document IDs of the exact top-k by squared L2
+    """
+    rows, _ = top_k_l2(index.vectors, index.sq_norms, query_embeddings, k, block_rows=config.NUMPY_BLOCK_ROWS)
+    return [[index.ids[row] for row in query_rows] for query_rows in rows]
+
+def bench_recall(backends, queries, k=10):
+    """
+    recall@k and per-query search latency for each backend name
+
+    Returns:
+        dict: backend name -> {"recall_at_k", "search_latency_ms"} (or {"error"})
+    """
+    from retrieve import create_backend, load_model
+
+    index = VectorIndex(snapshot_dir())
+    query_embeddings = np.asarray(load_model().encode(queries), dtype=np.float32)
+    truth = exact_ids(index, query_embeddings, k)
+
+    results = {}
+    for name in backends:
+        try:
+            backend = create_backend(name)
+        except Exception as e:
+            results[name] = {"error": str(e)}
+            print(f"❌ {name}: {e}")
+            continue
+
+        found = []
+        latencies = []
+        for embedding in query_embeddings:
+            started = time.perf_counter()
+            hits = backend.search(embedding[None, :], k)[0]
+            latencies.append(time.perf_counter() - started)
+            found.append([hit["id"] for hit in hits])
+
+        recall = recall_at_k(found, truth)
+        results[name] = {"recall_at_k": recall, "k": k, "search_latency_ms": percentiles(latencies)}
+        print(f"✓ {name}: recall@{k} {recall:.3f}, p50 search {results[name]['search_latency_ms']['p50']:.2f}ms")
+    return results
@@ -0,0 +1,325 @@
+"""
+Bulk Search
+Runs a large query file through the retriever offline. Queries are streamed
+in batches, encoded (across a process pool with --workers, see
+embedding_pool.py), searched with one backend call per batch and streamed to
+JSONL or Parquet, so memory stays bounded by a few batches. Read, encode,
+search and write run concurrently (see pipeline.py), and a checkpoint is
+saved after every written batch so an interrupted run can be resumed.
+
+Input: a text file with one query per line, or a .jsonl file of objects with
+a "query" field and an optional "id". Blank lines are skipped; every output
+row carries the 0-based line number of its query.
+
+Output:
+    .jsonl      one {"line", "id", "query", "results"} object per query
+    .parquet    a directory of part files, one row per hit (line, id, query,
+                rank, doc_id, score, distance, text, metadata as JSON);
+                needs pyarrow
+
+Usage:
+    python bulk_search.py QUERIES OUTPUT [--top-k K] [--threshold T] [--filters JSON]
+                          [--workers N] [--batch-size N] [--format jsonl|parquet] [--resume]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import numpy as np
+import config
+from embedding_pool import parallel_encode, resolve_workers
+from metadata_index import normalize_filters
+from pipeline import run_pipeline
+
+OUTPUT_FORMATS = ("jsonl", "parquet")
+
+def file_signature(path):
+    """
+    Identify the query file by size and modification time, so a checkpoint is
+    never resumed against a different file
+    """
+    stat = os.stat(path)
+    return {"path": os.path.abspath(path), "size": stat.st_size, "mtime": stat.st_mtime}
+
+def checkpoint_path(output):
+    return output.rstrip(os.sep) + ".checkpoint.json"
+
+def load_checkpoint(path, job):
+    """
+    Saved progress if it belongs to the same job, else None
+    """
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        checkpoint = json.load(f)
+    if checkpoint.get("job") != job:
+        print(f"⚠️  Checkpoint {path} is for a different query file, index or parameters, starting over")
+        return None
+    return checkpoint
+
+def save_checkpoint(path, job, progress):
+    """
+    Atomically record progress after a batch has been written
+    """
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"job": job, **progress}, f)
+    os.replace(tmp_path, path)
+
+def iter_query_batches(path, batch_size, skip_lines=0):
+    """
+    Stream (lines, ids, queries) batches from a query file, starting at line `skip_lines`
+    """
+    is_jsonl = path.endswith(".jsonl")
+    lines, ids, queries = [], [], []
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f):
+            if line_number < skip_lines or not line.strip():
+                continue
+            if is_jsonl:
+                record = json.loads(line)
+                query, query_id = record.get("query"), record.get("id")
+                if not isinstance(query, str) or not query.strip():
+                    raise ValueError(f"Line {line_number}: missing 'query'")
+            else:
+                query, query_id = line, None
+            lines.append(line_number)
+            ids.append(query_id)
+            queries.append(query.strip())
+            if len(queries) == batch_size:
+                yield lines, ids, queries
+                lines, ids, queries = [], [], []
+    if queries:
+        yield lines, ids, queries
+
+def encode_queries(model, queries, workers):
+    """
+    Encode one batch of queries, spread over the worker pool when there is one
+    """
+    if workers > 1 and len(queries) > config.ENCODE_BATCH_SIZE:
+        return parallel_encode(
+            model, config.EMBEDDING_MODEL, queries, workers,
+            config.ENCODE_BATCH_SIZE, config.ENCODE_BATCHES_PER_TASK
+        )
+    vectors = model.encode(queries, batch_size=config.ENCODE_BATCH_SIZE, convert_to_numpy=True)
+    return np.asarray(vectors, dtype=np.float32)
+
+class JsonlWriter:
+    """
+    Appends one JSON object per query; resuming truncates to the checkpointed size
+    """
+
+    def __init__(self, path, offset=0):
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.file = open(path, "r+b" if offset and os.path.exists(path) else "wb")
+        self.file.truncate(offset)
+        self.file.seek(offset)
+
+    def write(self, lines, ids, queries, all_results):
+        for line, query_id, query, results in zip(lines, ids, queries, all_results):
+            record = {"line": line, "id": query_id, "query": query, "results": results}
+            self.file.write((json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8"))
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def position(self):
+        return self.file.tell()
+
+    def close(self):
+        self.file.close()
+
+class ParquetWriter:
+    """
+    Writes each batch as its own part file in a directory, one row per hit;
+    resuming deletes parts past the checkpoint
+    """
+
+    def __init__(self, directory, parts=0):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise ValueError("Parquet output needs pyarrow (pip install pyarrow)")
+        self.pa, self.pq = pyarrow, pyarrow.parquet
+        self.directory = directory
+        self.parts = parts
+        os.makedirs(directory, exist_ok=True)
+        for name in os.listdir(directory):
+            if name.startswith("part-") and (name.endswith(".tmp") or int(name[5:11]) >= parts):
+                os.remove(os.path.join(directory, name))
+
+    def write(self, lines, ids, queries, all_results):
+        columns = {name: [] for name in
+                   ("line", "id", "query", "rank", "doc_id", "score", "distance", "text", "metadata")}
+        for line, query_id, query, results in zip(lines, ids, queries, all_results):
+            for rank, result in enumerate(results, 1):
+                for name, value in (("line", line), ("id", None if query_id is None else str(query_id)),
+                                    ("query", query), ("rank", rank), ("doc_id", result["id"]),
+                                    ("score", result["score"]), ("distance", result["distance"]),
+                                    ("text", result["text"]),
+                                    ("metadata", json.dumps(result["metadata"], ensure_ascii=False))):
+                    columns[name].append(value)
+        schema = self.pa.schema([
+            ("line", self.pa.int64()), ("id", self.pa.string()), ("query", self.pa.string()),
+            ("rank", self.pa.int32()), ("doc_id", self.pa.string()), ("score", self.pa.float64()),
+            ("distance", self.pa.float64()), ("text", self.pa.string()), ("metadata", self.pa.string()),
+        ])
+        path = os.path.join(self.directory, f"part-{self.parts:06d}.parquet")
+        self.pq.write_table(self.pa.table(columns, schema=schema), path + ".tmp", compression="zstd")
+        os.replace(path + ".tmp", path)
+        self.parts += 1
+
+    def position(self):
+        return self.parts
+
+    def close(self):
+        pass
+
+def bulk_search(queries_path, output, top_k=None, threshold=None, filters=None, workers=None,
+                batch_size=None, output_format=None, resume=False):
+    """
+    Search every query in a file and stream the results to `output`
+
+    Args:
+        queries_path (str): Text file (one query per line) or .jsonl with "query" / "id"
+        output (str): JSONL file or Parquet directory
+        top_k (int): Results per query (default: config.TOP_K)
+        threshold (float): Minimum similarity (default: config.SIMILARITY_THRESHOLD)
+        filters (dict): Optional metadata filters, as for retrieve()
+        workers (int): Encoding processes (default: config.EMBED_WORKERS; 0 = one per core)
+        batch_size (int): Queries per encode / search batch (default: config.BULK_BATCH_QUERIES)
+        output_format (str): "jsonl" or "parquet" (default: from the output's extension)
+        resume (bool): Continue from the checkpoint of an interrupted run
+
+    Returns:
+        dict: Queries, hits, batches and seconds of this run, and per-stage throughput
+    """
+    from retrieve import get_retriever
+
+    top_k = top_k or config.TOP_K
+    threshold = config.SIMILARITY_THRESHOLD if threshold is None else threshold
+    filters = normalize_filters(filters)
+    workers = resolve_workers(config.EMBED_WORKERS if workers is None else workers)
+    batch_size = batch_size or config.BULK_BATCH_QUERIES
+    output_format = output_format or ("parquet" if output.rstrip(os.sep).endswith(".parquet") else "jsonl")
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format '{output_format}' (choose from {', '.join(OUTPUT_FORMATS)})")
+    if workers > 1 and config.ENCODER_BACKEND != "torch":
+        print(f"⚠️  The process pool runs the PyTorch model; encoding in-process with {config.ENCODER_BACKEND}")
+        workers = 1
+
+    retriever = get_retriever()
+    retriever.check_index_version(force=True)
+    view = retriever.acquire_view()
+    try:
+        # One index version for the whole run, even if a new one is published meanwhile
+        job = {
+            "queries": file_signature(queries_path),
+            "output": os.path.abspath(output),
+            "format": output_format,
+            "top_k": top_k,
+            "threshold": threshold,
+            "filters": filters,
+            "index": list(view.version),
+        }
+        state_path = checkpoint_path(output)
+        checkpoint = load_checkpoint(state_path, job) if resume else None
+        progress = {"lines": 0, "queries": 0, "hits": 0, "batches": 0, "position": 0}
+        if checkpoint:
+            progress.update({key: checkpoint[key] for key in progress})
+            print(f"✓ Resuming after line {progress['lines']} ({progress['queries']} queries done)")
+        done_before = progress["queries"]
+
+        if output_format == "jsonl":
+            writer = JsonlWriter(output, progress["position"])
+        else:
+            writer = ParquetWriter(output, progress["position"])
+
+        started = time.perf_counter()
+
+        def encode(batch):
+            lines, ids, queries = batch
+            return lines, ids, queries, encode_queries(retriever.model, queries, workers)
+
+        def search(batch):
+            lines, ids, queries, embeddings = batch
+            return lines, ids, queries, retriever.search_many(embeddings, top_k, threshold, filters, view=view)
+
+        def write(batch):
+            lines, ids, queries, all_results = batch
+            writer.write(lines, ids, queries, all_results)
+
+            # Batches arrive in order, so every line before the next one is written
+            progress["lines"] = lines[-1] + 1
+            progress["queries"] += len(queries)
+            progress["hits"] += sum(len(results) for results in all_results)
+            progress["batches"] += 1
+            progress["position"] = writer.position()
+            save_checkpoint(state_path, job, progress)
+
+            if progress["batches"] % config.PROGRESS_EVERY_BATCHES == 0:
+                rate = (progress["queries"] - done_before) / max(time.perf_counter() - started, 1e-9)
+                print(f"  … {progress['queries']} queries written ({rate:.0f} queries/sec)")
+
+        try:
+            stats, wall_seconds = run_pipeline(
+                iter_query_batches(queries_path, batch_size, progress["lines"]),
+                [("encode", encode), ("search", search), ("write", write)],
+                queue_size=config.PIPELINE_QUEUE_SIZE,
+                count=lambda batch: len(batch[0]),
+                source_name="read"
+            )
+        finally:
+            writer.close()
+    finally:
+        retriever.release_view(view)
+
+    # Finished: nothing left to resume
+    if os.path.exists(state_path):
+        os.remove(state_path)
+
+    queries = progress["queries"] - done_before
+    print(f"✓ {queries} queries searched in {wall_seconds:.2f}s "
+          f"({queries / max(wall_seconds, 1e-9):.0f} queries/sec), {progress['hits']} hits → {output}")
+    print("✓ Stage throughput:")
+    for stage in stats:
+        print(f"    {stage.summary(wall_seconds)}")
+
+    return {
+        "queries": queries,
+        "hits": progress["hits"],
+        "batches": progress["batches"],
+        "seconds": wall_seconds,
+        "stages": {stage.name: stage.as_dict(wall_seconds) for stage in stats},
+    }
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Search every query in a file and stream the results to disk")
+    parser.add_argument("queries", help="text file with one query per line, or .jsonl with 'query' (and 'id')")
+    parser.add_argument("output", help="output .jsonl file, or .parquet directory")
+    parser.add_argument("--top-k", type=int, default=config.TOP_K)
+    parser.add_argument("--threshold", type=float, default=config.SIMILARITY_THRESHOLD)
+    parser.add_argument("--filters", type=json.loads, help="metadata filters as JSON, as for /api/search")
+    parser.add_argument("--workers", type=int, default=config.EMBED_WORKERS,
+                        help="encoding processes (0 = one per CPU core, 1 = in-process)")
+    parser.add_argument("--batch-size", type=int, default=config.BULK_BATCH_QUERIES,
+                        help="queries per encode / search batch")
+    parser.add_argument("--format", choices=OUTPUT_FORMATS, help="default: from the output's extension")
+    parser.add_argument("--resume", action="store_true", help="continue an interrupted run")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    try:
+        bulk_search(args.queries, args.output, args.top_k, args.threshold, args.filters,
+                    args.workers, args.batch_size, args.format, args.resume)
+    except Exception as e:
+        print(f"❌ Bulk search failed: {e}")
+        print("   Progress is saved after every batch; re-run with --resume")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
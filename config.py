@@ -13,10 +13,59 @@ EMBEDDING_MODEL = "all-MiniLM-L6-v2"
 # Data Configuration
 DATA_PATH = "data/Restaurant Reviews.csv"
 TEXT_COLUMN = "Review Text"
+RESTAURANT_COLUMN = "Yelp URL"  # Stored as metadata "restaurant"
+RATING_COLUMN = "Rating"  # Stored as integer metadata "rating"
+DATE_COLUMN = "Date"  # Stored as metadata "date" (YYYY-MM-DD) and "date_key" (YYYYMMDD int)
+DATE_FORMAT = "%m/%d/%Y"  # Format of DATE_COLUMN in the CSV
 
 # ChromaDB Configuration
 CHROMA_DIR = "./chroma_db"
 COLLECTION_NAME = "restaurant_reviews"
+INDEX_VERSION_FILE = os.path.join(CHROMA_DIR, "index_version")  # Rewritten after every ingest
+INDEX_CHECK_INTERVAL = 1.0  # Seconds between a retriever's checks for a newly published index (0 = every request)
+
+# Ingestion Configuration
+INGEST_MODE = "full"  # "full" (drop and rebuild) or "incremental" (content-hash diff)
+INGEST_BATCH_SIZE = 1000  # Rows per ChromaDB read/write call (must stay below Chroma's max batch size)
+CSV_CHUNK_ROWS = 50000  # Rows pandas parses at a time in stream mode
+ENCODE_BATCH_SIZE = 32  # Texts per forward pass of the embedding model
+EMBED_WORKERS = 1  # Embedding processes (0 = one per CPU core, 1 = encode in-process)
+ENCODE_BATCHES_PER_TASK = 8  # Forward passes per length-sorted chunk sent to a worker
+INGEST_CHECKPOINT = os.path.join(CHROMA_DIR, "ingest_checkpoint.json")  # Stream-mode resume point
+PROGRESS_EVERY_BATCHES = 10  # Print throughput every N committed batches
+NEAR_DUPLICATES = True  # Collapse near-identical reviews into one document with a duplicate_count (--keep-duplicates)
+NEAR_DUPLICATE_THRESHOLD = 0.8  # Estimated Jaccard similarity of word shingles at which reviews are duplicates
+MINHASH_PERMUTATIONS = 64  # MinHash signature length
+MINHASH_BANDS = 16  # LSH bands (permutations / bands rows each); more bands find less similar candidates, using more memory
+SHINGLE_WORDS = 3  # Words per shingle
+STREAM_NEAR_DUPLICATES = False  # Also collapse them in stream/pipeline mode (--stream-dedup); the in-memory LSH index grows ~1-2KB per distinct review
+PIPELINE_QUEUE_SIZE = 4  # Batches buffered between pipeline stages (backpressure bound)
+
+# Search Backend Configuration
+SEARCH_BACKEND = "chroma"  # "chroma" (HNSW collection), "numpy" (exact search over VECTOR_INDEX_DIR) or "quantized"
+VECTOR_INDEX_DIR = "./vector_index"  # Versioned memory-mapped snapshots written by ingest.py (see snapshots.py)
+SNAPSHOT_KEEP = 3  # Snapshots kept on disk for rollback, including the current one
+NUMPY_BLOCK_ROWS = 65536  # Rows scored per matrix multiply by the numpy backend
+
+# Quantization Configuration (quantized backend)
+QUANTIZATION = None  # None, "int8" (4x smaller), "pq" (product quantization, 32x smaller at 48 sub-vectors) or "pca" (coarse index)
+PQ_SUBVECTORS = 48  # Sub-vectors per embedding; must divide the embedding dimension (384)
+PQ_TRAIN_SAMPLE = 50000  # Vectors used to train the PQ codebooks / fit the PCA projection
+PCA_DIMS = 64  # Dimensions of the "pca" coarse index (32-96; 6x fewer than 384 at 64)
+RESCORE_FACTOR = 4  # Candidates re-scored with full-precision vectors = top_k * RESCORE_FACTOR
+QUANT_EVAL_QUERIES = 200  # Sample queries for the recall@k report printed at ingest
+
+# Query Encoder Configuration (retrieve.py; ingestion always uses the PyTorch model)
+ENCODER_BACKEND = "torch"  # "torch" (SentenceTransformer) or "onnx" (ONNX Runtime; run `python encoders.py export` first)
+ONNX_DIR = "./onnx_model"  # Exported model, tokenizer and pooling settings
+ONNX_QUANTIZE = False  # Use the dynamically int8-quantized export (`python encoders.py export --quantize`)
+ONNX_THREADS = 0  # ONNX Runtime intra-op threads; 0 = its default
+PARITY_SAMPLES = 1000  # Reviews encoded by `python encoders.py parity`
+
+# Embedding Cache Configuration (shared by ingest.py and retrieve.py)
+USE_EMBEDDING_CACHE = True
+EMBEDDING_CACHE_DIR = "./embedding_cache"
+EMBEDDING_CACHE_MAX_MB = 512  # Least recently used embeddings are evicted beyond this size
 
 # Chunking Configuration
 # Decision: NO CHUNKING - reviews are short (500-800 chars avg)
@@ -24,4 +73,71 @@ USE_CHUNKING = False
 
 # Retrieval Configuration
 TOP_K = 5  # Number of results to return
-SIMILARITY_THRESHOLD = 0.5  # Minimum similarity score (0.5 is reasonable)
\ No newline at end of file
+SIMILARITY_THRESHOLD = 0.5  # Minimum similarity score (0.5 is reasonable)
+MAX_BATCH_QUERIES = 64  # Max queries per /api/search/batch request
+BULK_BATCH_QUERIES = 2048  # Queries per encode / search batch in bulk_search.py
+
+# Restaurant Search Configuration (/api/restaurants, index exported to VECTOR_INDEX_DIR)
+RESTAURANT_INDEX = True  # Build per-restaurant centroids and stats with each index export (--export-index)
+RESTAURANT_CENTROIDS = 4  # Max centroids per restaurant (k-means over its reviews)
+REVIEWS_PER_CENTROID = 50  # A restaurant gets one centroid per this many reviews, up to RESTAURANT_CENTROIDS
+RESTAURANT_TOP_K = 5  # Restaurants returned per query
+RESTAURANT_REVIEWS = 3  # Supporting reviews fetched per returned restaurant
+
+# Hybrid Retrieval Configuration (BM25 index exported to VECTOR_INDEX_DIR)
+SEARCH_MODE = "vector"  # Default mode: "vector", "lexical" (BM25 only) or "hybrid" (both, fused)
+HYBRID_CANDIDATES = 4  # Each leg of a hybrid search fetches top_k * HYBRID_CANDIDATES hits before fusion
+RRF_K = 60  # Reciprocal-rank fusion constant: score = sum of 1 / (RRF_K + rank)
+HYBRID_THREADS = 4  # Threads running the vector leg alongside the lexical one
+BM25_K1 = 1.2  # Term-frequency saturation
+BM25_B = 0.75  # Document-length normalization
+
+# Query Cache Configuration (in-process, per Retriever)
+QUERY_CACHE_SIZE = 1024  # Normalized query -> embedding entries
+QUERY_CACHE_TTL = 3600  # Seconds
+RESULT_CACHE_SIZE = 1024  # (embedding, top_k, threshold) -> results entries
+RESULT_CACHE_TTL = 300  # Seconds; results are also dropped whenever the index is re-ingested
+SEMANTIC_CACHE = False  # Reuse vector-search results of a near-identical earlier query (approximate)
+SEMANTIC_CACHE_SIZE = 1024  # Query embeddings kept
+SEMANTIC_CACHE_RADIUS = 0.05  # Max cosine distance (1 - cosine similarity) to a cached query for a hit
+SEMANTIC_CACHE_TTL = 300  # Seconds
+SEMANTIC_CACHE_AUDIT_RATE = 0.0  # Fraction of hits also searched in full to measure the cache's recall@k
+
+# Startup Configuration
+WARM_UP_ON_BOOT = True  # Load the model, open the index and run a dummy query before /ready reports ready
+
+# Serving Configuration (serve.py, pre-forked gunicorn workers)
+SERVE_BIND = "0.0.0.0:5000"
+SERVE_WORKERS = 2  # Worker processes forked after the model is loaded
+SERVE_THREADS = 4  # Request threads per worker
+SERVE_TIMEOUT = 120  # Seconds before an unresponsive worker is restarted
+TORCH_THREADS_PER_WORKER = 0  # Intra-op threads per worker; 0 = CPU count // SERVE_WORKERS
+
+# Async Search Configuration (/api/search admission control)
+SEARCH_WORKERS = 4  # Threads encoding and searching for /api/search, per process
+SEARCH_QUEUE_LIMIT = 16  # Requests allowed to wait for a thread; beyond this /api/search returns 503
+SEARCH_DEADLINE_MS = 5000  # Per-request deadline; requests may ask for less with "deadline_ms"
+
+# Micro-Batching Configuration (/api/search)
+MICRO_BATCHING = False  # Coalesce concurrent /api/search queries into one encode + search
+BATCH_WINDOW_MS = 5  # How long the first query of a batch waits for others
+BATCH_MAX_SIZE = 32  # Flush immediately once this many queries are waiting
+
+# HNSW Configuration (ChromaDB collection; applied when the collection is created)
+HNSW_SPACE = "l2"  # "l2", "cosine" or "ip"; with "cosine" SIMILARITY_THRESHOLD is a cosine similarity
+HNSW_M = 16  # Graph neighbours per node (ChromaDB's max_neighbors)
+HNSW_CONSTRUCTION_EF = 100  # Candidate list size while building
+HNSW_SEARCH_EF = 100  # Candidate list size while searching; higher = better recall, slower
+HNSW_SETTINGS_FILE = os.path.join(CHROMA_DIR, "hnsw_settings.json")  # Written by `python hnsw.py tune`; overrides M / ef
+HNSW_TUNE_M = (8, 16, 32)
+HNSW_TUNE_CONSTRUCTION_EF = (64, 128, 256)
+HNSW_TUNE_SEARCH_EF = (10, 20, 40, 80, 160, 320)
+HNSW_TUNE_QUERIES = 200  # Held-out stored vectors used as queries
+HNSW_TUNE_MAX_VECTORS = 100000  # Tune on at most this many stored vectors
+HNSW_TARGET_RECALL = 0.95  # The tuner picks the fastest setting reaching this recall@k
+
+# Metrics Configuration (/metrics)
+SLOW_QUERY_MS = 500  # Retrievals slower than this are candidates for the slow-query log
+SLOW_QUERY_SAMPLE_RATE = 1.0  # Fraction of slow retrievals that get logged
+SLOW_QUERY_LOG = "./logs/slow_queries.jsonl"  # JSON lines file; None = keep only the in-memory ring
+INGEST_METRICS_FILE = None  # e.g. "./logs/ingest.prom" for node_exporter's textfile collector
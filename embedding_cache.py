@@ -0,0 +1,349 @@
+"""
+Persistent Embedding Cache
+On-disk cache of text embeddings shared by ingestion and retrieval, so the same
+text is never encoded twice by the same model
+
+Layout (one directory per model):
+    vectors.f32    float32 rows, memory-mapped, grown on demand up to the size limit
+    index.sqlite   key -> row slot, with last-used time for LRU eviction and a
+                   ready flag set once the slot's row has been written
+"""
+
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+import numpy as np
+import config
+
+# SQLite limits the number of bound parameters per statement
+_SQL_CHUNK = 500
+
+# Rows added to the vectors file whenever it has to grow
+_MIN_GROW_ROWS = 1024
+
+# Reserved slots whose writer never marked them ready (it died) are reclaimed
+# by eviction after this many seconds
+_STALE_RESERVATION_SECONDS = 60
+
+# Last-used times of read keys are buffered in memory until the next write
+_MAX_PENDING_TOUCHES = 10000
+
+def normalize_text(text):
+    """
+    Normalization applied before hashing: unicode NFC + collapsed whitespace
+    """
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+def cache_key(model_name, text):
+    """
+    16-byte key for (model, normalized text)
+    """
+    payload = f"{model_name}\0{normalize_text(text)}".encode("utf-8")
+    return hashlib.blake2b(payload, digest_size=16).digest()
+
+class EmbeddingCache:
+    """
+    Size-bounded, LRU-evicted embedding cache for one model
+
+    Safe to share between threads and between processes. Writers reserve slots
+    in a BEGIN IMMEDIATE transaction (one writer at a time), write the vector
+    rows after it commits and only then mark the slots ready. Readers only see
+    ready slots and re-check after reading a row that it wasn't evicted
+    meanwhile. Lookups never write to SQLite: last-used times are buffered and
+    saved by the next put_many.
+    """
+
+    def __init__(self, cache_dir, model_name, max_mb=512):
+        self.model_name = model_name
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.dir = os.path.join(cache_dir, re.sub(r"[^A-Za-z0-9._-]+", "_", model_name))
+        os.makedirs(self.dir, exist_ok=True)
+
+        self.vectors_path = os.path.join(self.dir, "vectors.f32")
+        self.index_path = os.path.join(self.dir, "index.sqlite")
+
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._touched = {}  # key -> last read time, not yet saved
+        self._conn = None
+        self._pid = None
+        self._vectors = None
+        self.dim = None
+        self.capacity = None
+
+        self._load_meta()
+
+    # ---- storage -------------------------------------------------------
+
+    def _db(self):
+        """
+        One SQLite connection per process (connections must not cross a fork).
+        Autocommit mode: write transactions are opened explicitly
+        """
+        if self._conn is None or self._pid != os.getpid():
+            self._conn = sqlite3.connect(self.index_path, timeout=30, check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries "
+                "(key BLOB PRIMARY KEY, slot INTEGER NOT NULL UNIQUE, last_used REAL NOT NULL, "
+                "ready INTEGER NOT NULL DEFAULT 1)"
+            )
+            columns = [row[1] for row in self._conn.execute("PRAGMA table_info(entries)")]
+            if "ready" not in columns:
+                try:
+                    self._conn.execute("ALTER TABLE entries ADD COLUMN ready INTEGER NOT NULL DEFAULT 1")
+                except sqlite3.OperationalError:
+                    pass  # Another process added it first
+            self._conn.execute("CREATE INDEX IF NOT EXISTS entries_lru ON entries (last_used)")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER)")
+            self._pid = os.getpid()
+            self._vectors = None
+            self._touched = {}
+        return self._conn
+
+    def _write(self, work):
+        """
+        Run work(db) in a write transaction, holding SQLite's write lock from the start
+        """
+        db = self._db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            result = work(db)
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("COMMIT")
+        return result
+
+    def _load_meta(self):
+        rows = dict(self._db().execute("SELECT name, value FROM meta").fetchall())
+        if "dim" in rows:
+            self.dim = rows["dim"]
+            self.capacity = rows["capacity"]
+
+    def _init_dim(self, dim):
+        """
+        Fix the vector width on first write and derive the row capacity from max_mb
+        (another process may have fixed it first)
+        """
+        def init(db):
+            db.executemany(
+                "INSERT OR IGNORE INTO meta (name, value) VALUES (?, ?)",
+                [("dim", int(dim)), ("capacity", max(1, self.max_bytes // (int(dim) * 4)))]
+            )
+        self._write(init)
+        self._load_meta()
+
+    def _mapped_rows(self):
+        return 0 if self._vectors is None else self._vectors.shape[0]
+
+    def _map(self, min_rows):
+        """
+        Make sure the vectors file is mapped with at least min_rows rows,
+        growing the file if needed (only writers grow it, under the write lock)
+        """
+        if self._vectors is not None and self._pid == os.getpid() and self._mapped_rows() >= min_rows:
+            return self._vectors
+
+        row_bytes = self.dim * 4
+        file_rows = os.path.getsize(self.vectors_path) // row_bytes if os.path.exists(self.vectors_path) else 0
+        if file_rows < min_rows:
+            file_rows = min(self.capacity, max(min_rows, 2 * file_rows, _MIN_GROW_ROWS))
+            with open(self.vectors_path, "ab") as f:
+                f.truncate(file_rows * row_bytes)
+
+        self._vectors = np.memmap(self.vectors_path, dtype=np.float32, mode="r+", shape=(file_rows, self.dim))
+        return self._vectors
+
+    def _slots(self, db, keys, ready_only=True):
+        """
+        key -> slot for the given keys that have an entry
+        """
+        slots = {}
+        ready = " AND ready = 1" if ready_only else ""
+        for start in range(0, len(keys), _SQL_CHUNK):
+            chunk = keys[start:start + _SQL_CHUNK]
+            marks = ",".join("?" * len(chunk))
+            slots.update(db.execute(f"SELECT key, slot FROM entries WHERE key IN ({marks}){ready}", chunk))
+        return slots
+
+    # ---- public API ----------------------------------------------------
+
+    def get_many(self, texts):
+        """
+        Look up cached embeddings
+
+        Returns:
+            list: One float32 vector (or None on a miss) per input text
+        """
+        keys = [cache_key(self.model_name, t) for t in texts]
+        results = [None] * len(texts)
+        if self.dim is None:
+            self._load_meta()
+        if self.dim is None:
+            self.misses += len(texts)
+            return results
+
+        with self._lock:
+            db = self._db()
+            slots = self._slots(db, list(dict.fromkeys(keys)))
+            if slots:
+                vectors = self._map(max(slots.values()) + 1)
+                rows = {key: np.array(vectors[slot]) for key, slot in slots.items()}
+
+                # A row evicted and rewritten while we read it no longer maps to its key
+                current = self._slots(db, list(slots))
+                for pos, key in enumerate(keys):
+                    if key in rows and current.get(key) == slots[key]:
+                        results[pos] = rows[key]
+
+                now = time.time()
+                for key in current:
+                    self._touched.pop(key, None)
+                    self._touched[key] = now
+                while len(self._touched) > _MAX_PENDING_TOUCHES:
+                    del self._touched[next(iter(self._touched))]
+
+        hits = sum(r is not None for r in results)
+        self.hits += hits
+        self.misses += len(texts) - hits
+        return results
+
+    def put_many(self, texts, vectors):
+        """
+        Store embeddings, evicting the least recently used entries when full
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if len(texts) == 0:
+            return
+        if self.dim is None:
+            self._load_meta()
+        if self.dim is None:
+            self._init_dim(vectors.shape[1])
+        if vectors.shape[1] != self.dim:
+            raise ValueError(f"Expected {self.dim}-dim vectors, got {vectors.shape[1]}")
+
+        # Last write wins for repeated texts within one call
+        pending = {}
+        for text, vector in zip(texts, vectors):
+            pending[cache_key(self.model_name, text)] = vector
+        pending = list(pending.items())[-self.capacity:]
+
+        def reserve(db):
+            # Save the buffered last-used times first so eviction sees them
+            db.executemany("UPDATE entries SET last_used = ? WHERE key = ?", [(t, k) for k, t in self._touched.items()])
+            self._touched.clear()
+
+            existing = self._slots(db, [k for k, _ in pending], ready_only=False)
+            new = [(k, v) for k, v in pending if k not in existing]
+            used = db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            free = list(range(used, min(self.capacity, used + len(new))))
+
+            # Full: reuse the slots of the least recently used entries, skipping
+            # the ones another writer has reserved but not filled yet
+            shortfall = len(new) - len(free)
+            if shortfall > 0:
+                victims = db.execute(
+                    "SELECT key, slot FROM entries WHERE ready = 1 OR last_used < ? ORDER BY last_used LIMIT ?",
+                    (time.time() - _STALE_RESERVATION_SECONDS, shortfall)
+                ).fetchall()
+                db.executemany("DELETE FROM entries WHERE key = ?", [(k,) for k, _ in victims])
+                free.extend(slot for _, slot in victims)
+
+            assignments = list(zip(new, free))
+            if assignments:
+                now = time.time()
+                db.executemany(
+                    "INSERT INTO entries (key, slot, last_used, ready) VALUES (?, ?, ?, 0)",
+                    [(key, slot, now) for (key, _), slot in assignments]
+                )
+                self._map(max(slot for _, slot in assignments) + 1)
+            return assignments
+
+        with self._lock:
+            assignments = self._write(reserve)
+            if not assignments:
+                return
+
+            # The slots are ours now: fill them, then publish them to readers
+            mapped = self._map(max(slot for _, slot in assignments) + 1)
+            for (_, vector), slot in assignments:
+                mapped[slot] = vector
+            mapped.flush()
+            self._write(lambda db: db.executemany(
+                "UPDATE entries SET ready = 1 WHERE key = ? AND slot = ?",
+                [(key, slot) for (key, _), slot in assignments]
+            ))
+
+    def __len__(self):
+        return self._db().execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "entries": len(self),
+            "capacity": self.capacity,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0,
+        }
+
+def cached_encode(cache, texts, encode):
+    """
+    Encode texts, consulting the cache first and storing what had to be computed
+
+    Args:
+        cache (EmbeddingCache): Cache to use, or None to always encode
+        texts (list): Texts to embed
+        encode (callable): list of texts -> float32 (n, dim) array
+
+    Returns:
+        np.ndarray: float32 (n, dim) embeddings in input order
+    """
+    if cache is None:
+        return np.asarray(encode(texts), dtype=np.float32)
+
+    found = cache.get_many(texts)
+    missing = {}
+    for pos, vector in enumerate(found):
+        if vector is None:
+            missing.setdefault(normalize_text(texts[pos]), []).append(pos)
+
+    if missing:
+        # Encode the first original spelling of each missing normalized text
+        to_encode = [texts[positions[0]] for positions in missing.values()]
+        computed = np.asarray(encode(to_encode), dtype=np.float32)
+        cache.put_many(to_encode, computed)
+        for positions, vector in zip(missing.values(), computed):
+            for pos in positions:
+                found[pos] = vector
+
+    if not found:
+        return np.empty((0, cache.dim or 0), dtype=np.float32)
+    return np.stack(found).astype(np.float32, copy=False)
+
+_caches = {}
+_cache_lock = threading.Lock()
+
+def get_embedding_cache(model_name=None):
+    """
+    Shared cache for model_name (default: config.EMBEDDING_MODEL), or None when
+    disabled in config
+    """
+    if not config.USE_EMBEDDING_CACHE:
+        return None
+    model_name = model_name or config.EMBEDDING_MODEL
+    with _cache_lock:
+        if model_name not in _caches:
+            _caches[model_name] = EmbeddingCache(
+                config.EMBEDDING_CACHE_DIR,
+                model_name,
+                config.EMBEDDING_CACHE_MAX_MB
+            )
+        return _caches[model_name]
@@ -0,0 +1,121 @@
+"""
+Parallel Embedding
+Spreads SentenceTransformer encoding over a pool of worker processes, feeding each
+worker length-sorted chunks so batches carry as little padding as possible
+"""
+
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+# Model loaded inside each worker process
+_worker_model = None
+
+# One pool per (model, workers) for the lifetime of the parent process
+_pool = None
+_pool_key = None
+
+def resolve_workers(workers):
+    """
+    0 means one worker per CPU core
+    """
+    if workers == 0:
+        return os.cpu_count() or 1
+    return max(1, workers)
+
+def _init_worker(model_name, torch_threads):
+    """
+    Load the model once per worker and cap its intra-op threads, so N workers
+    don't each spawn a thread per core
+    """
+    global _worker_model
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    torch.set_num_threads(torch_threads)
+    _worker_model = SentenceTransformer(model_name)
+
+def _encode_chunk(texts, batch_size):
+    vectors = _worker_model.encode(texts, batch_size=batch_size, convert_to_numpy=True)
+    return np.asarray(vectors, dtype=np.float32)
+
+def get_pool(model_name, workers):
+    """
+    Get (or start) the shared worker pool
+    """
+    global _pool, _pool_key
+    if _pool is None or _pool_key != (model_name, workers):
+        if _pool is not None:
+            _pool.shutdown()
+        torch_threads = max(1, (os.cpu_count() or 1) // workers)
+        _pool = ProcessPoolExecutor(
+            max_workers=workers,
+            # fork is unsafe once torch has started its thread pool
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(model_name, torch_threads)
+        )
+        _pool_key = (model_name, workers)
+    return _pool
+
+def token_lengths(model, documents):
+    """
+    Token count per document (falls back to character length without a tokenizer)
+    """
+    tokenizer = getattr(model, "tokenizer", None)
+    if tokenizer is None:
+        return [len(doc) for doc in documents]
+
+    encoded = tokenizer(
+        documents,
+        add_special_tokens=False,
+        truncation=True,
+        max_length=getattr(model, "max_seq_length", 512)
+    )
+    return [len(ids) for ids in encoded["input_ids"]]
+
+def length_buckets(lengths, chunk_size):
+    """
+    Sort documents by length and cut the order into contiguous chunks
+
+    Returns:
+        list: Arrays of original positions, one per chunk, shortest first
+    """
+    order = np.argsort(np.asarray(lengths), kind="stable")
+    return [order[start:start + chunk_size] for start in range(0, len(order), chunk_size)]
+
+def parallel_encode(model, model_name, documents, workers, batch_size, batches_per_task=8):
+    """
+    Encode documents across worker processes and return vectors in input order
+
+    Args:
+        model: Local model, used only for its tokenizer
+        model_name (str): Model each worker loads
+        documents (list): Texts to encode
+        workers (int): Number of worker processes
+        batch_size (int): Texts per forward pass inside a worker
+        batches_per_task (int): Forward passes per task sent to a worker
+
+    Returns:
+        np.ndarray: float32 (n, dim) embeddings
+    """
+    pool = get_pool(model_name, workers)
+    buckets = length_buckets(token_lengths(model, documents), batch_size * batches_per_task)
+
+    # Longest chunks first, so the slowest tasks don't end up last in the queue
+    futures = [
+        (positions, pool.submit(_encode_chunk, [documents[i] for i in positions], batch_size))
+        for positions in reversed(buckets)
+    ]
+
+    vectors = None
+    for positions, future in futures:
+        chunk = future.result()
+        if vectors is None:
+            vectors = np.empty((len(documents), chunk.shape[1]), dtype=np.float32)
+        vectors[positions] = chunk
+
+    if vectors is None:
+        return np.empty((0, 0), dtype=np.float32)
+    return vectors
@@ -0,0 +1,354 @@
+"""
+Embedding Encoders
+Interchangeable query encoders with the SentenceTransformer.encode interface:
+the PyTorch SentenceTransformer itself, or an ONNX export of its transformer
+run by ONNX Runtime on CPU (optionally with dynamic int8 weights)
+
+The ONNX directory (config.ONNX_DIR) holds:
+    model.onnx          exported transformer (last hidden state)
+    model.int8.onnx     dynamically quantized copy (export --quantize)
+    tokenizer.json      fast tokenizer of the model
+    encoder.json        model name, pooling, normalization, max sequence length
+
+Usage:
+    python encoders.py export [--quantize]
+    python encoders.py parity [--samples N] [--k K] [--json PATH]
+"""
+
+import argparse
+import inspect
+import json
+import os
+import shutil
+import sys
+import time
+import numpy as np
+import config
+from vector_index import recall_at_k, replace_directory, top_k_l2
+
+ENCODER_BACKENDS = ("torch", "onnx")
+
+ENCODER_META = "encoder.json"
+
+def encoder_id(backend=None, quantized=None):
+    """
+    Name identifying the embeddings a backend produces (embedding cache namespace)
+    """
+    backend = backend or config.ENCODER_BACKEND
+    if backend == "torch":
+        return config.EMBEDDING_MODEL
+    quantized = config.ONNX_QUANTIZE if quantized is None else quantized
+    return f"{config.EMBEDDING_MODEL}@onnx{'-int8' if quantized else ''}"
+
+def import_backend(backend=None):
+    """
+    Import the libraries a backend needs (lets startup time them separately)
+    """
+    backend = backend or config.ENCODER_BACKEND
+    if backend == "torch":
+        import sentence_transformers  # noqa: F401 (pulls in torch)
+    else:
+        import onnxruntime  # noqa: F401
+        import tokenizers  # noqa: F401
+
+def load_encoder(backend=None):
+    """
+    Instantiate the encoder selected in config.ENCODER_BACKEND
+    """
+    backend = backend or config.ENCODER_BACKEND
+    if backend == "torch":
+        from sentence_transformers import SentenceTransformer
+        return SentenceTransformer(config.EMBEDDING_MODEL)
+    if backend == "onnx":
+        encoder = OnnxEncoder(config.ONNX_DIR, config.ONNX_QUANTIZE, config.ONNX_THREADS)
+        if encoder.meta["model"] != config.EMBEDDING_MODEL:
+            raise ValueError(
+                f"{config.ONNX_DIR} was exported from {encoder.meta['model']}, "
+                f"not {config.EMBEDDING_MODEL} (run python encoders.py export)"
+            )
+        return encoder
+    raise ValueError(f"Unknown encoder backend '{backend}' (choose from {', '.join(ENCODER_BACKENDS)})")
+
+class OnnxEncoder:
+    """
+    SentenceTransformer-compatible encoder running an exported model through
+    ONNX Runtime; only the tokenizers and onnxruntime packages are needed
+    """
+
+    def __init__(self, directory, quantized=False, threads=0):
+        """
+        Args:
+            directory (str): Output of export_onnx()
+            quantized (bool): Use model.int8.onnx instead of model.onnx
+            threads (int): ONNX Runtime intra-op threads (0 = its default)
+        """
+        import onnxruntime
+        from tokenizers import Tokenizer
+
+        meta_path = os.path.join(directory, ENCODER_META)
+        if not os.path.exists(meta_path):
+            raise FileNotFoundError(f"No ONNX model at {directory} (run python encoders.py export)")
+        with open(meta_path, encoding="utf-8") as f:
+            self.meta = json.load(f)
+
+        model_file = "model.int8.onnx" if quantized else "model.onnx"
+        if not os.path.exists(os.path.join(directory, model_file)):
+            raise FileNotFoundError(f"No {model_file} in {directory} (run python encoders.py export --quantize)")
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(directory, "tokenizer.json"))
+        self.tokenizer.enable_truncation(self.meta["max_seq_length"])
+        self.tokenizer.enable_padding(pad_id=self.meta["pad_token_id"], pad_token=self.meta["pad_token"])
+
+        options = onnxruntime.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = onnxruntime.InferenceSession(
+            os.path.join(directory, model_file), options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = [i.name for i in self.session.get_inputs()]
+        self.quantized = quantized
+
+    def get_sentence_embedding_dimension(self):
+        return self.meta["dim"]
+
+    def encode(self, sentences, batch_size=32, show_progress_bar=False, **kwargs):
+        """
+        Same contract as SentenceTransformer.encode for the cases this repo
+        uses: a string or list of strings -> float32 array
+        """
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        embeddings = np.zeros((len(texts), self.meta["dim"]), dtype=np.float32)
+
+        # Similar lengths per batch keep padding small (SentenceTransformer does the same)
+        order = np.argsort([-len(t) for t in texts], kind="stable")
+        for start in range(0, len(texts), batch_size):
+            rows = order[start:start + batch_size]
+            encoded = self.tokenizer.encode_batch([texts[i] for i in rows])
+            mask = np.array([e.attention_mask for e in encoded], dtype=np.int64)
+            feed = {
+                "input_ids": np.array([e.ids for e in encoded], dtype=np.int64),
+                "attention_mask": mask,
+                "token_type_ids": np.array([e.type_ids for e in encoded], dtype=np.int64),
+            }
+            hidden = self.session.run(None, {name: feed[name] for name in self.input_names})[0]
+            embeddings[rows] = pool(hidden, mask, self.meta["pooling"], self.meta["normalize"])
+
+        return embeddings[0] if single else embeddings
+
+def pool(hidden, mask, pooling, normalize):
+    """
+    Token embeddings (b, seq, dim) -> sentence embeddings (b, dim)
+    """
+    if pooling == "cls":
+        pooled = hidden[:, 0]
+    else:
+        weights = mask[:, :, None].astype(np.float32)
+        pooled = (hidden * weights).sum(axis=1) / np.maximum(weights.sum(axis=1), 1e-9)
+    if normalize:
+        pooled = pooled / np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12)
+    return pooled.astype(np.float32)
+
+def pooling_mode(module):
+    """
+    Pooling mode of a sentence-transformers Pooling module ("mean", "cls", ...)
+    """
+    settings = module.get_config_dict()
+    if "pooling_mode" in settings:
+        # sentence-transformers >= 6
+        return settings["pooling_mode"]
+    return module.get_pooling_mode_str()
+
+def export_onnx(model, model_name, directory, quantize=False, opset=17):
+    """
+    Export a SentenceTransformer's transformer to ONNX, plus what OnnxEncoder
+    needs to reproduce its tokenization, pooling and normalization
+
+    Args:
+        model: Loaded SentenceTransformer
+        model_name (str): Recorded in encoder.json
+        directory (str): Output directory (replaced atomically)
+        quantize (bool): Also write a dynamically int8-quantized model
+    """
+    import torch
+
+    transformer = model[0]
+    modules = {type(m).__name__: m for m in model}
+    pooling = pooling_mode(modules["Pooling"]) if "Pooling" in modules else "mean"
+    if pooling not in ("mean", "cls"):
+        raise ValueError(f"Pooling '{pooling}' is not supported by the ONNX encoder")
+
+    auto_model = transformer.auto_model.eval()
+    accepts = inspect.signature(auto_model.forward).parameters
+    input_names = ["input_ids", "attention_mask"] + (["token_type_ids"] if "token_type_ids" in accepts else [])
+
+    class LastHiddenState(torch.nn.Module):
+        def __init__(self, inner):
+            super().__init__()
+            self.inner = inner
+
+        def forward(self, *inputs):
+            return self.inner(**dict(zip(input_names, inputs))).last_hidden_state
+
+    tmp_dir = directory + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    # Trace with padding in the batch so the attention mask is not constant-folded
+    sample = transformer.tokenizer(
+        ["an example sentence to trace", "short"], padding=True, return_tensors="pt"
+    )
+    wrapper = LastHiddenState(auto_model).eval()
+    with torch.no_grad():
+        torch.onnx.export(
+            wrapper,
+            tuple(sample[name] for name in input_names),
+            os.path.join(tmp_dir, "model.onnx"),
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes={name: {0: "batch", 1: "sequence"} for name in input_names + ["last_hidden_state"]},
+            opset_version=opset,
+            dynamo=False
+        )
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        quantize_dynamic(
+            os.path.join(tmp_dir, "model.onnx"),
+            os.path.join(tmp_dir, "model.int8.onnx"),
+            weight_type=QuantType.QInt8
+        )
+
+    tokenizer = transformer.tokenizer
+    tokenizer.backend_tokenizer.save(os.path.join(tmp_dir, "tokenizer.json"))
+    meta = {
+        "model": model_name,
+        "dim": model.get_sentence_embedding_dimension(),
+        "pooling": pooling,
+        "normalize": "Normalize" in modules,
+        "max_seq_length": transformer.max_seq_length,
+        "pad_token": tokenizer.pad_token,
+        "pad_token_id": tokenizer.pad_token_id,
+        "inputs": input_names,
+        "quantized": quantize,
+        "created": time.time(),
+    }
+    with open(os.path.join(tmp_dir, ENCODER_META), "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+
+    replace_directory(tmp_dir, directory)
+    return meta
+
+def parity_check(reference, candidate, texts, queries, k=10, batch_size=32):
+    """
+    Compare a candidate encoder with the reference one
+
+    Cosine drift is measured on `texts`. Recall@k is measured on `texts` as the
+    corpus and `queries` as queries, against the reference encoder's exact top-k,
+    in two settings: only queries are encoded by the candidate (switching the
+    serving encoder over an existing index), and corpus + queries are (re-index).
+
+    Returns:
+        dict: Drift, recall and encoding speed figures
+    """
+    timings = {}
+    encoded = {}
+    for name, encoder in (("reference", reference), ("candidate", candidate)):
+        started = time.perf_counter()
+        corpus = np.asarray(encoder.encode(texts, batch_size=batch_size), dtype=np.float32)
+        timings[name] = time.perf_counter() - started
+        encoded[name] = (corpus, np.asarray(encoder.encode(queries, batch_size=batch_size), dtype=np.float32))
+
+    ref_corpus, ref_queries = encoded["reference"]
+    cand_corpus, cand_queries = encoded["candidate"]
+
+    cosine = np.einsum("ij,ij->i", ref_corpus, cand_corpus) / np.maximum(
+        np.linalg.norm(ref_corpus, axis=1) * np.linalg.norm(cand_corpus, axis=1), 1e-12
+    )
+    drift = 1.0 - cosine
+
+    def search(corpus, query_vectors):
+        rows, _ = top_k_l2(corpus, np.einsum("ij,ij->i", corpus, corpus), query_vectors, k)
+        return rows
+
+    exact = search(ref_corpus, ref_queries)
+    return {
+        "texts": len(texts),
+        "queries": len(queries),
+        "k": k,
+        "cosine_drift": {
+            "mean": float(drift.mean()),
+            "p99": float(np.percentile(drift, 99)),
+            "max": float(drift.max()),
+        },
+        "recall_at_k": {
+            "query_encoder_only": recall_at_k(search(ref_corpus, cand_queries), exact),
+            "reindexed": recall_at_k(search(cand_corpus, cand_queries), exact),
+        },
+        "texts_per_sec": {name: len(texts) / max(seconds, 1e-9) for name, seconds in timings.items()},
+    }
+
+def sample_texts(samples, seed=0):
+    """
+    Review texts for the parity check, and short query-like prefixes of others
+    """
+    from ingest import load_data
+
+    texts, _ = load_data()
+    rng = np.random.default_rng(seed)
+    picked = rng.permutation(len(texts))
+    corpus = [texts[i] for i in picked[:samples]]
+    queries = [" ".join(texts[i].split()[:8]) for i in picked[samples:samples + max(1, samples // 10)]]
+    return corpus, queries or [" ".join(t.split()[:8]) for t in corpus[:max(1, samples // 10)]]
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Export and check the ONNX query encoder")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export = commands.add_parser("export", help=f"export {config.EMBEDDING_MODEL} to {config.ONNX_DIR}")
+    export.add_argument("--quantize", action="store_true", help="also write a dynamically int8-quantized model")
+
+    parity = commands.add_parser("parity", help="compare the ONNX encoder with the PyTorch model")
+    parity.add_argument("--samples", type=int, default=config.PARITY_SAMPLES, help="review texts to encode")
+    parity.add_argument("--k", type=int, default=10, help="k for recall@k")
+    parity.add_argument("--quantized", action="store_true", default=config.ONNX_QUANTIZE,
+                        help="check model.int8.onnx")
+    parity.add_argument("--json", help="also write the report to this file")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    from sentence_transformers import SentenceTransformer
+
+    reference = SentenceTransformer(config.EMBEDDING_MODEL)
+
+    if args.command == "export":
+        try:
+            meta = export_onnx(reference, config.EMBEDDING_MODEL, config.ONNX_DIR, args.quantize)
+        except Exception as e:
+            print(f"❌ Error exporting ONNX model: {e}")
+            sys.exit(1)
+        print(f"✓ Exported {meta['model']} ({meta['pooling']} pooling, dim {meta['dim']}) to {config.ONNX_DIR}"
+              f"{' with int8 weights' if args.quantize else ''}")
+        return
+
+    candidate = OnnxEncoder(config.ONNX_DIR, args.quantized, config.ONNX_THREADS)
+    texts, queries = sample_texts(args.samples)
+    report = parity_check(reference, candidate, texts, queries, args.k)
+    report["candidate"] = encoder_id("onnx", args.quantized)
+
+    drift, recall, speed = report["cosine_drift"], report["recall_at_k"], report["texts_per_sec"]
+    print(f"✓ {report['candidate']} vs {config.EMBEDDING_MODEL} on {report['texts']} reviews")
+    print(f"  cosine drift: mean {drift['mean']:.2e}, p99 {drift['p99']:.2e}, max {drift['max']:.2e}")
+    print(f"  recall@{args.k} vs PyTorch ({report['queries']} queries): "
+          f"{recall['query_encoder_only']:.3f} swapping the query encoder only, "
+          f"{recall['reindexed']:.3f} re-indexed")
+    print(f"  speed: {speed['candidate']:.0f} vs {speed['reference']:.0f} texts/sec "
+          f"({speed['candidate'] / speed['reference']:.2f}x)")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
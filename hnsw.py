@@ -0,0 +1,324 @@
+"""
+HNSW Settings and Tuner
+Config-driven index parameters for the ChromaDB collection (distance space,
+M, construction ef, search ef) and a tuner that sweeps them against exact
+search on held-out queries
+
+The tuner builds throwaway collections (in a temporary directory) from the
+stored vectors, minus a held-out set used as queries. It measures recall@k
+and per-query latency for every (M, construction ef, search ef), prints the
+Pareto front and writes the fastest setting that reaches the target recall
+to config.HNSW_SETTINGS_FILE. The next full ingest builds with it; search ef
+is also stored on the live collection at once and takes effect in each
+process the next time it opens the collection.
+
+Usage:
+    python hnsw.py show
+    python hnsw.py tune [--k K] [--queries N] [--target-recall R] [--dry-run] [--json PATH]
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+import config
+from vector_index import recall_at_k, top_k_l2
+
+HNSW_SPACES = ("l2", "cosine", "ip")
+
+def hnsw_settings():
+    """
+    Settings for new collections: config.py, overridden by the tuner's
+    output when it was tuned for the same space
+
+    Returns:
+        dict: space, M, construction_ef, search_ef
+    """
+    settings = {
+        "space": config.HNSW_SPACE,
+        "M": config.HNSW_M,
+        "construction_ef": config.HNSW_CONSTRUCTION_EF,
+        "search_ef": config.HNSW_SEARCH_EF,
+    }
+    tuned = load_tuned()
+    if tuned and tuned.get("space") == settings["space"]:
+        settings.update({key: tuned[key] for key in ("M", "construction_ef", "search_ef") if key in tuned})
+
+    if settings["space"] not in HNSW_SPACES:
+        raise ValueError(f"Unknown HNSW space '{settings['space']}' (choose from {', '.join(HNSW_SPACES)})")
+    return settings
+
+def load_tuned(path=None):
+    """
+    Settings written by the tuner, or None
+    """
+    try:
+        with open(path or config.HNSW_SETTINGS_FILE, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def collection_configuration(settings=None):
+    """
+    `configuration` argument for ChromaDB's create_collection
+    """
+    settings = settings or hnsw_settings()
+    return {"hnsw": {
+        "space": settings["space"],
+        "max_neighbors": settings["M"],
+        "ef_construction": settings["construction_ef"],
+        "ef_search": settings["search_ef"],
+    }}
+
+def collection_settings(collection):
+    """
+    Settings an existing collection was built with (its space can't change later)
+    """
+    hnsw = (getattr(collection, "configuration", None) or {}).get("hnsw") or {}
+    metadata = collection.metadata or {}
+    return {
+        "space": hnsw.get("space") or metadata.get("hnsw:space", "l2"),
+        "M": hnsw.get("max_neighbors", metadata.get("hnsw:M")),
+        "construction_ef": hnsw.get("ef_construction", metadata.get("hnsw:construction_ef")),
+        "search_ef": hnsw.get("ef_search", metadata.get("hnsw:search_ef")),
+    }
+
+def set_search_ef(collection, search_ef):
+    """
+    Change search ef on a built collection (M and construction ef need a rebuild)
+    """
+    collection.modify(configuration={"hnsw": {"ef_search": int(search_ef)}})
+
+# ---- tuner ------------------------------------------------------------------
+
+def load_vectors(collection, limit=None, page_size=None):
+    """
+    Stored embeddings of a collection, page by page, up to `limit` rows
+    """
+    page_size = page_size or config.INGEST_BATCH_SIZE
+    limit = limit or collection.count()
+    pages = []
+    offset = 0
+    while offset < limit:
+        page = collection.get(limit=min(page_size, limit - offset), offset=offset, include=["embeddings"])
+        if not page["ids"]:
+            break
+        pages.append(np.asarray(page["embeddings"], dtype=np.float32))
+        offset += len(page["ids"])
+    return np.concatenate(pages) if pages else np.zeros((0, 0), dtype=np.float32)
+
+def exact_top_k(vectors, queries, k, space):
+    """
+    Ground truth: exact top-k rows in the given space
+    """
+    if space == "cosine":
+        vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        queries = queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+    if space == "ip":
+        # Largest dot product = smallest ||q||^2 + C - 2 q.x; C = max ||x||^2 keeps it >= 0
+        sq_norms = np.full(len(vectors), np.einsum("ij,ij->i", vectors, vectors).max(initial=0.0))
+    else:
+        sq_norms = np.einsum("ij,ij->i", vectors, vectors)
+    rows, _ = top_k_l2(vectors, sq_norms, queries, k, block_rows=config.NUMPY_BLOCK_ROWS)
+    return rows
+
+def split_held_out(vectors, count, seed=0):
+    """
+    Hold out `count` stored vectors as queries and index the rest
+    """
+    rng = np.random.default_rng(seed)
+    count = min(count, max(len(vectors) // 10, 1))
+    order = rng.permutation(len(vectors))
+    return vectors[np.sort(order[count:])], vectors[order[:count]]
+
+def measure(collection, queries, truth, k):
+    """
+    recall@k and single-query latency of a collection against exact rows
+    """
+    found = []
+    latencies = []
+    for query in queries:
+        started = time.perf_counter()
+        result = collection.query(query_embeddings=query[None, :], n_results=k, include=[])
+        latencies.append(time.perf_counter() - started)
+        found.append([int(i) for i in result["ids"][0]])
+    latencies_ms = 1000 * np.asarray(latencies)
+    return {
+        "recall_at_k": round(recall_at_k(found, truth.tolist()), 4),
+        "p50_ms": round(float(np.percentile(latencies_ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(latencies_ms, 95)), 3),
+    }
+
+def reopen(path, name):
+    """
+    Open a collection through a fresh client: a process keeps using the search
+    ef a collection was loaded with, so after set_search_ef() the cached
+    client systems (all of them, in this process) have to go
+    """
+    import chromadb
+    from chromadb.api.shared_system_client import SharedSystemClient
+
+    SharedSystemClient.clear_system_cache()
+    return chromadb.PersistentClient(path=path).get_collection(name=name)
+
+def sweep(corpus, queries, k, space, m_values, construction_efs, search_efs):
+    """
+    Build one throwaway collection per (M, construction ef) and measure every search ef
+
+    Returns:
+        list: One dict per setting: space, M, construction_ef, search_ef,
+            build_seconds, recall_at_k, p50_ms, p95_ms
+    """
+    import chromadb
+
+    truth = exact_top_k(corpus, queries, k, space)
+    ids = [str(i) for i in range(len(corpus))]
+
+    points = []
+    with tempfile.TemporaryDirectory(prefix="hnsw-tune-") as path:
+        for m in m_values:
+            for construction_ef in construction_efs:
+                settings = {"space": space, "M": m, "construction_ef": construction_ef, "search_ef": search_efs[0]}
+                name = f"hnsw-tune-{m}-{construction_ef}"
+                started = time.perf_counter()
+                collection = chromadb.PersistentClient(path=path).create_collection(
+                    name=name, configuration=collection_configuration(settings)
+                )
+                for start in range(0, len(corpus), config.INGEST_BATCH_SIZE):
+                    end = start + config.INGEST_BATCH_SIZE
+                    collection.add(ids=ids[start:end], embeddings=corpus[start:end])
+                build_seconds = round(time.perf_counter() - started, 3)
+
+                for search_ef in search_efs:
+                    set_search_ef(collection, search_ef)
+                    collection = reopen(path, name)
+                    point = dict(settings, search_ef=search_ef, build_seconds=build_seconds)
+                    point.update(measure(collection, queries, truth, k))
+                    points.append(point)
+                    print(f"  M={m:<3} construction_ef={construction_ef:<4} search_ef={search_ef:<4} "
+                          f"recall@{k} {point['recall_at_k']:.3f}  p50 {point['p50_ms']:.2f}ms")
+                chromadb.PersistentClient(path=path).delete_collection(name=name)
+    return points
+
+def pareto_front(points):
+    """
+    Settings no other setting beats on both latency (p50) and recall
+    """
+    front = []
+    best_recall = -1.0
+    for point in sorted(points, key=lambda p: (p["p50_ms"], -p["recall_at_k"])):
+        if point["recall_at_k"] > best_recall:
+            front.append(point)
+            best_recall = point["recall_at_k"]
+    return front
+
+def choose(front, target_recall):
+    """
+    Fastest setting on the front reaching the target recall, else the most accurate
+    """
+    good = [p for p in front if p["recall_at_k"] >= target_recall]
+    if good:
+        return min(good, key=lambda p: p["p50_ms"])
+    return max(front, key=lambda p: p["recall_at_k"])
+
+def save_settings(chosen, report, path=None):
+    """
+    Write the chosen settings (and the sweep that picked them) for hnsw_settings()
+    """
+    path = path or config.HNSW_SETTINGS_FILE
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(dict(
+            {key: chosen[key] for key in ("space", "M", "construction_ef", "search_ef")},
+            tuned=time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            recall_at_k=chosen["recall_at_k"],
+            p50_ms=chosen["p50_ms"],
+            sweep=report,
+        ), f, indent=2)
+    os.replace(tmp_path, path)
+
+def tune(args):
+    import chromadb
+
+    client = chromadb.PersistentClient(path=config.CHROMA_DIR)
+    collection = client.get_collection(name=config.COLLECTION_NAME)
+    live = collection_settings(collection)
+
+    vectors = load_vectors(collection, args.max_vectors)
+    if len(vectors) < 2:
+        print("❌ Not enough vectors to tune; run ingest.py first")
+        sys.exit(1)
+    corpus, queries = split_held_out(vectors, args.queries)
+    k = min(args.k, len(corpus))
+
+    print(f"✓ Tuning {live['space']} HNSW on {len(corpus)} vectors, {len(queries)} held-out queries, k={k}")
+    points = sweep(corpus, queries, k, live["space"], args.m, args.construction_ef, args.search_ef)
+    collection = reopen(config.CHROMA_DIR, config.COLLECTION_NAME)
+    front = pareto_front(points)
+    chosen = choose(front, args.target_recall)
+
+    print(f"\n✓ Pareto front (p50 latency vs recall@{k}):")
+    for point in front:
+        marker = "→" if point is chosen else " "
+        print(f"  {marker} M={point['M']:<3} construction_ef={point['construction_ef']:<4} "
+              f"search_ef={point['search_ef']:<4} recall {point['recall_at_k']:.3f}  "
+              f"p50 {point['p50_ms']:.2f}ms  p95 {point['p95_ms']:.2f}ms")
+    if chosen["recall_at_k"] < args.target_recall:
+        print(f"⚠️  No setting reached recall {args.target_recall}; picked the most accurate")
+
+    report = {"k": k, "corpus": len(corpus), "queries": len(queries), "points": points,
+              "pareto_front": front, "chosen": chosen, "live": live}
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if args.dry_run:
+        return report
+
+    save_settings(chosen, {key: report[key] for key in ("k", "corpus", "queries", "pareto_front")})
+    set_search_ef(collection, chosen["search_ef"])
+    print(f"✓ Settings written to {config.HNSW_SETTINGS_FILE}; search_ef={chosen['search_ef']} stored on "
+          f"{config.COLLECTION_NAME} (running servers use it after a restart)")
+    if (chosen["M"], chosen["construction_ef"]) != (live["M"], live["construction_ef"]):
+        print(f"  M={chosen['M']}, construction_ef={chosen['construction_ef']} take effect on the next "
+              f"rebuild: python ingest.py --mode full")
+    return report
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Show and tune the HNSW parameters of the ChromaDB collection")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("show", help="settings of the live collection and for the next build")
+
+    tune_parser = commands.add_parser("tune", help="sweep HNSW settings against exact search")
+    tune_parser.add_argument("--k", type=int, default=config.TOP_K * 2, help="k for recall@k")
+    tune_parser.add_argument("--queries", type=int, default=config.HNSW_TUNE_QUERIES, help="held-out queries")
+    tune_parser.add_argument("--max-vectors", type=int, default=config.HNSW_TUNE_MAX_VECTORS,
+                             help="stored vectors to tune on (the rest are ignored)")
+    tune_parser.add_argument("--m", type=int, nargs="+", default=list(config.HNSW_TUNE_M))
+    tune_parser.add_argument("--construction-ef", type=int, nargs="+", default=list(config.HNSW_TUNE_CONSTRUCTION_EF))
+    tune_parser.add_argument("--search-ef", type=int, nargs="+", default=list(config.HNSW_TUNE_SEARCH_EF))
+    tune_parser.add_argument("--target-recall", type=float, default=config.HNSW_TARGET_RECALL)
+    tune_parser.add_argument("--dry-run", action="store_true", help="report only, don't write settings")
+    tune_parser.add_argument("--json", help="also write the full sweep to this file")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.command == "tune":
+        tune(args)
+        return
+
+    import chromadb
+    print(f"✓ Next build: {hnsw_settings()}")
+    try:
+        collection = chromadb.PersistentClient(path=config.CHROMA_DIR).get_collection(name=config.COLLECTION_NAME)
+        print(f"✓ {config.COLLECTION_NAME}: {collection_settings(collection)}")
+    except Exception as e:
+        print(f"❌ Could not open {config.COLLECTION_NAME}: {e}")
+
+if __name__ == "__main__":
+    main()
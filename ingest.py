@@ -3,11 +3,32 @@ Data Ingestion Script
 Loads restaurant reviews, creates embeddings, and stores them in ChromaDB
 """
 
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import time
+import uuid
+from collections import defaultdict
+import numpy as np
 import pandas as pd
 import chromadb
 from openai import OpenAI
 import config
 import sys
+from pipeline import run_pipeline
+from embedding_pool import parallel_encode, resolve_workers
+from embedding_cache import cached_encode, get_embedding_cache
+from vector_index import IndexWriter, VectorIndex, top_k_l2, recall_at_k, sample_queries
+from quantization import QUANTIZERS, build_quantized, load_quantizer, quantized_top_k
+from metadata_index import build_metadata_index, date_key
+from lexical_index import build_lexical_index
+from restaurant_index import build_restaurant_index
+from near_duplicates import NearDuplicateIndex
+from hnsw import collection_configuration, collection_settings, hnsw_settings
+from snapshots import new_snapshot, publish_snapshot
+from metrics import ingest_stage, timed_batches, write_textfile
 
 def chunk_text(text, chunk_size, overlap):
     """
@@ -21,9 +42,46 @@ def chunk_text(text, chunk_size, overlap):
         start += chunk_size - overlap
     return chunks
 
+def review_metadatas(df):
+    """
+    Typed metadata for each CSV row: restaurant URL, integer rating and date
+    (ISO string plus a YYYYMMDD int for range filters); missing values are omitted
+    """
+    missing = pd.Series([None] * len(df), index=df.index, dtype=object)
+    restaurants = df.get(config.RESTAURANT_COLUMN, missing)
+    ratings = pd.to_numeric(df.get(config.RATING_COLUMN, missing), errors="coerce")
+    dates = pd.to_datetime(df.get(config.DATE_COLUMN, missing), format=config.DATE_FORMAT, errors="coerce")
+    
+    metadatas = []
+    for restaurant, rating, date in zip(restaurants, ratings, dates):
+        metadata = {}
+        if isinstance(restaurant, str) and restaurant.strip():
+            metadata["restaurant"] = restaurant.strip()
+        if pd.notna(rating):
+            metadata["rating"] = int(rating)
+        if pd.notna(date):
+            metadata["date"] = date.strftime("%Y-%m-%d")
+            metadata["date_key"] = date_key(date)
+        metadatas.append(metadata)
+    return metadatas
+
+def clean_reviews(df):
+    """
+    Drop null/empty reviews and strip whitespace
+    
+    Returns:
+        tuple: (texts, metadatas) for the remaining rows
+    """
+    text = df[config.TEXT_COLUMN].where(df[config.TEXT_COLUMN].notna(), "").astype(str).str.strip()
+    keep = text.str.len() > 0
+    return text[keep].tolist(), review_metadatas(df[keep])
+
 def load_data():
     """
     Load and validate the dataset
+    
+    Returns:
+        tuple: (texts, metadatas) - review texts and their typed metadata
     """
     try:
         df = pd.read_csv(config.DATA_PATH)
@@ -31,20 +89,13 @@ def load_data():
         if config.TEXT_COLUMN not in df.columns:
             raise ValueError(f"Column '{config.TEXT_COLUMN}' not found in CSV")
         
-        # Clean data
-        df = df[[config.TEXT_COLUMN]].dropna()
-        df[config.TEXT_COLUMN] = df[config.TEXT_COLUMN].astype(str).str.strip()
-        
-        # Remove empty reviews
-        df = df[df[config.TEXT_COLUMN].str.len() > 0]
-        
-        texts = df[config.TEXT_COLUMN].tolist()
+        texts, metadatas = clean_reviews(df)
         
         print(f"✓ Loaded {len(texts)} reviews")
         print(f"✓ Average length: {sum(len(t) for t in texts) / len(texts):.0f} chars")
         print(f"✓ Sample review: {texts[0][:100]}...")
         
-        return texts
+        return texts, metadatas
     
     except FileNotFoundError:
         print(f"❌ Error: File not found at {config.DATA_PATH}")
@@ -87,8 +138,7 @@ def prepare_documents(texts):
         print(f"✓ Using full reviews (no chunking)")
         return texts, list(range(len(texts)))
 
-def create_embeddings(documents):
-    # If OpenAI was used, the embedding creation would look like this:
+# If OpenAI was used, the embedding creation would look like this:
 """
 def create_openai_embeddings(texts):
     client = OpenAI(api_key=config.OPENAI_API_KEY)
@@ -98,21 +148,78 @@ def create_openai_embeddings(texts):
     )
     return [e.embedding for e in response.data]
 """
+
+_model = None
+
+def get_embedding_model():
     """
-    Create embeddings using sentence-transformers (FREE, LOCAL)
+    Load the local embedding model once per process
     """
-    try:
+    global _model
+    if _model is None:
         print(f"✓ Loading local embedding model...")
         from sentence_transformers import SentenceTransformer
         
         # Use free local model
-        model = SentenceTransformer('all-MiniLM-L6-v2')
+        _model = SentenceTransformer(config.EMBEDDING_MODEL)
+    return _model
+
+def encode_documents(model, documents, show_progress_bar=False):
+    """
+    Encode a list of documents into a float32 (n, dim) array, reusing
+    embeddings from the persistent cache (see embedding_cache.py)
+    """
+    return cached_encode(
+        get_embedding_cache(),
+        documents,
+        lambda texts: encode_uncached(model, texts, show_progress_bar)
+    )
+
+def encode_uncached(model, documents, show_progress_bar=False):
+    """
+    Run the embedding model over documents
+    
+    With config.EMBED_WORKERS != 1 the work is spread over a process pool in
+    length-sorted chunks (see embedding_pool.py); a single process already
+    length-sorts inside model.encode.
+    """
+    workers = resolve_workers(config.EMBED_WORKERS)
+    if workers > 1 and len(documents) > config.ENCODE_BATCH_SIZE:
+        return parallel_encode(
+            model,
+            config.EMBEDDING_MODEL,
+            documents,
+            workers,
+            config.ENCODE_BATCH_SIZE,
+            config.ENCODE_BATCHES_PER_TASK
+        )
+    
+    vectors = model.encode(
+        documents,
+        batch_size=config.ENCODE_BATCH_SIZE,
+        show_progress_bar=show_progress_bar,
+        convert_to_numpy=True
+    )
+    return np.asarray(vectors, dtype=np.float32)
+
+def create_embeddings(documents):
+    """
+    Create embeddings using sentence-transformers (FREE, LOCAL)
+    """
+    try:
+        model = get_embedding_model()
         
-        print(f"✓ Creating embeddings for {len(documents)} documents...")
-        vectors = model.encode(documents, show_progress_bar=True)
-        vectors = [v.tolist() for v in vectors]
+        workers = resolve_workers(config.EMBED_WORKERS)
+        print(f"✓ Creating embeddings for {len(documents)} documents "
+              f"({workers} worker{'s' if workers > 1 else ''}, batch size {config.ENCODE_BATCH_SIZE})...")
+        vectors = encode_documents(model, documents, show_progress_bar=True)
         
         print(f"✓ Created {len(vectors)} embeddings")
+        cache = get_embedding_cache()
+        if cache is not None:
+            stats = cache.stats()
+            print(f"✓ Embedding cache: {stats['hits']} hits, {stats['misses']} misses "
+                  f"({stats['entries']}/{stats['capacity']} entries)")
         return vectors
     
     except ImportError:
@@ -122,40 +229,213 @@ def create_openai_embeddings(texts):
         print(f"❌ Error creating embeddings: {e}")
         sys.exit(1)
 
-def store_in_chromadb(documents, vectors, metadata_map):
+def make_doc_id(text):
     """
-    Store documents and embeddings in ChromaDB
+    Content-addressed document ID: the same review text always maps to the same ID,
+    regardless of its position in the CSV
     """
-    try:
-        # Initialize ChromaDB
-        client = chromadb.PersistentClient(path=config.CHROMA_DIR)
+    digest = hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+    return f"doc_{digest}"
+
+def build_records(documents, metadata_map, review_metadatas=None):
+    """
+    Build (ids, documents, metadatas), keeping the first occurrence of duplicate texts
+    
+    Args:
+        documents (list): Texts to store
+        metadata_map (list): Review index of each document
+        review_metadatas (list): Optional typed metadata per document
+    """
+    ids, docs, metadatas = [], [], []
+    seen = set()
+    
+    for pos, (doc, idx) in enumerate(zip(documents, metadata_map)):
+        doc_id = make_doc_id(doc)
+        if doc_id in seen:
+            continue
+        seen.add(doc_id)
+        ids.append(doc_id)
+        docs.append(doc)
+        metadata = {"review_idx": idx}
+        if review_metadatas is not None:
+            metadata.update(review_metadatas[pos])
+        metadatas.append(metadata)
+    
+    return ids, docs, metadatas
+
+def near_duplicate_index():
+    return NearDuplicateIndex(
+        config.NEAR_DUPLICATE_THRESHOLD,
+        config.MINHASH_PERMUTATIONS,
+        config.MINHASH_BANDS,
+        config.SHINGLE_WORDS
+    )
+
+def report_near_duplicates(index):
+    stats = index.stats()
+    print(f"✓ Near-duplicates: collapsed {stats['duplicates']} of {stats['documents']} documents "
+          f"({stats['removed_ratio']:.1%}) into {len(index.duplicate_counts)} canonical documents")
+
+def collapse_near_duplicates(documents, metadata_map, review_metadatas):
+    """
+    Keep the first document of every group of near-identical texts (see
+    near_duplicates.py), recording how many were collapsed into it as its
+    'duplicate_count' metadata
+    
+    Returns:
+        tuple: (documents, metadata_map, review_metadatas) of the kept documents
+    """
+    index = near_duplicate_index()
+    keep = [pos for pos, doc in enumerate(documents) if index.add(doc, pos) == pos]
+    
+    metadatas = []
+    for pos in keep:
+        metadata = dict(review_metadatas[pos])
+        if index.duplicate_counts.get(pos):
+            metadata["duplicate_count"] = index.duplicate_counts[pos]
+        metadatas.append(metadata)
+    
+    report_near_duplicates(index)
+    return [documents[p] for p in keep], [metadata_map[p] for p in keep], metadatas
+
+def collapse_batches(batches, index=None):
+    """
+    Drop near-duplicates from streamed batches, checking each review against
+    every earlier one
+    
+    Duplicates of a review in the same batch raise its 'duplicate_count' (and
+    'duplicate_last_idx', the last review counted) before it is written;
+    duplicates of one in an earlier batch are returned as {doc_id: [review_idx]},
+    for write_batch to count together with this batch.
+    
+    Yields:
+        tuple: (review_idxs, texts, metadatas, rows_done, duplicates),
+        where rows_done is the row count covered by the batch before filtering
+    """
+    for review_idxs, texts, metadatas in batches:
+        rows_done = review_idxs[-1] + 1
+        if index is None:
+            yield review_idxs, texts, metadatas, rows_done, {}
+            continue
         
-        # Delete existing collection if it exists
+        kept = {}
+        duplicates = defaultdict(list)
+        for review_idx, text, metadata in zip(review_idxs, texts, metadatas):
+            key = (make_doc_id(text), review_idx)
+            indexed = len(index)
+            canonical = index.add(text, key)
+            if canonical == key:
+                # Already stored when the index was seeded from a resumed run
+                if len(index) > indexed:
+                    kept[key[0]] = (review_idx, text, metadata)
+            elif canonical[0] in kept:
+                metadata = kept[canonical[0]][2]
+                metadata["duplicate_count"] = metadata.get("duplicate_count", 0) + 1
+                metadata["duplicate_last_idx"] = review_idx
+            else:
+                duplicates[canonical[0]].append(review_idx)
+        
+        yield ([r for r, _, _ in kept.values()], [t for _, t, _ in kept.values()],
+               [m for _, _, m in kept.values()], rows_done, dict(duplicates))
+
+def seed_near_duplicates(index, collection):
+    """
+    Index the documents a resumed stream ingest already stored
+    """
+    offset = 0
+    while True:
+        page = collection.get(
+            limit=config.INGEST_BATCH_SIZE,
+            offset=offset,
+            include=["documents", "metadatas"]
+        )
+        if not page["ids"]:
+            break
+        for doc_id, doc, metadata in zip(page["ids"], page["documents"], page["metadatas"]):
+            index.add(doc, (doc_id, (metadata or {}).get("review_idx")))
+        offset += len(page["ids"])
+    
+    # Report only what this run collapses
+    index.documents = index.duplicates = 0
+    index.duplicate_counts.clear()
+    print(f"✓ Near-duplicate index seeded with {len(index)} stored documents")
+
+def counted_duplicates(collection, duplicates):
+    """
+    Stored records whose 'duplicate_count' grows by the given duplicates
+    
+    Reviews up to a record's 'duplicate_last_idx' were already counted, so a
+    batch replayed after a crash doesn't count them twice.
+    
+    Args:
+        duplicates (dict): doc_id -> review indices of its new duplicates
+    
+    Returns:
+        tuple: (ids, documents, embeddings, metadatas) of the records to upsert
+    """
+    stored = collection.get(ids=list(duplicates), include=["documents", "embeddings", "metadatas"])
+    ids, docs, vectors, metadatas = [], [], [], []
+    for doc_id, doc, vector, metadata in zip(stored["ids"], stored["documents"],
+                                             stored["embeddings"], stored["metadatas"]):
+        metadata = dict(metadata or {})
+        new = [idx for idx in duplicates[doc_id] if idx > metadata.get("duplicate_last_idx", -1)]
+        if not new:
+            continue
+        metadata["duplicate_count"] = metadata.get("duplicate_count", 0) + len(new)
+        metadata["duplicate_last_idx"] = max(new)
+        ids.append(doc_id)
+        docs.append(doc)
+        vectors.append(vector)
+        metadatas.append(metadata)
+    return ids, docs, vectors, metadatas
+
+def open_collection(client, reset=False):
+    """
+    Get the reviews collection, optionally dropping it first
+    """
+    if reset:
         try:
             client.delete_collection(name=config.COLLECTION_NAME)
             print(f"✓ Deleted existing collection")
         except:
             pass
+        settings = hnsw_settings()
+        print(f"✓ HNSW: {settings['space']} space, M={settings['M']}, "
+              f"construction_ef={settings['construction_ef']}, search_ef={settings['search_ef']}")
+    
+    # HNSW settings only apply when the collection is created (see hnsw.py)
+    return client.get_or_create_collection(
+        name=config.COLLECTION_NAME,
+        metadata={"description": "Restaurant reviews embeddings"},
+        configuration=collection_configuration()
+    )
+
+def store_in_chromadb(documents, vectors, metadata_map, review_metadatas=None):
+    """
+    Store documents and embeddings in ChromaDB
+    """
+    try:
+        # Initialize ChromaDB
+        client = chromadb.PersistentClient(path=config.CHROMA_DIR)
         
-        # Create new collection
-        collection = client.create_collection(
-            name=config.COLLECTION_NAME,
-            metadata={"description": "Restaurant reviews embeddings"}
-        )
+        # Drop and recreate the collection
+        collection = open_collection(client, reset=True)
         
-        # Prepare IDs and metadata
-        ids = [f"doc_{i}" for i in range(len(documents))]
-        metadatas = [{"review_idx": idx} for idx in metadata_map]
+        # Prepare IDs and metadata (duplicate texts share an ID, keep the first)
+        ids, docs, metadatas = build_records(documents, metadata_map, review_metadatas)
+        vectors_by_id = dict(zip((make_doc_id(d) for d in documents), vectors))
         
-        # Add to collection
-        collection.add(
-            documents=documents,
-            embeddings=vectors,
-            ids=ids,
-            metadatas=metadatas
-        )
+        # Add to collection in batches (Chroma rejects oversized calls)
+        for start in range(0, len(ids), config.INGEST_BATCH_SIZE):
+            end = start + config.INGEST_BATCH_SIZE
+            collection.add(
+                documents=docs[start:end],
+                embeddings=np.stack([vectors_by_id[i] for i in ids[start:end]]),
+                ids=ids[start:end],
+                metadatas=metadatas[start:end]
+            )
         
-        print(f"✓ Stored {len(documents)} documents in ChromaDB")
+        print(f"✓ Stored {len(docs)} documents in ChromaDB")
         print(f"✓ Collection: {config.COLLECTION_NAME}")
         print(f"✓ Location: {config.CHROMA_DIR}")
         
@@ -163,29 +443,566 @@ def store_in_chromadb(documents, vectors, metadata_map):
         print(f"❌ Error storing in ChromaDB: {e}")
         sys.exit(1)
 
-def main():
+def load_stored_metadata(collection):
+    """
+    Read {id: metadata} for everything already in the collection, page by page
+    """
+    stored = {}
+    offset = 0
+    
+    while True:
+        page = collection.get(
+            limit=config.INGEST_BATCH_SIZE,
+            offset=offset,
+            include=["metadatas"]
+        )
+        if not page["ids"]:
+            break
+        for doc_id, metadata in zip(page["ids"], page["metadatas"]):
+            stored[doc_id] = metadata or {}
+        offset += len(page["ids"])
+    
+    return stored
+
+def diff_records(ids, metadatas, stored):
+    """
+    Compare the CSV against the stored collection
+    
+    Returns:
+        tuple: (added, updated, removed, skipped) - added/updated/skipped are
+        positions into ids, removed is a list of stored IDs
+    """
+    added, updated, skipped = [], [], []
+    
+    for pos, (doc_id, metadata) in enumerate(zip(ids, metadatas)):
+        if doc_id not in stored:
+            added.append(pos)
+        elif stored[doc_id] != metadata:
+            updated.append(pos)
+        else:
+            skipped.append(pos)
+    
+    current = set(ids)
+    removed = [doc_id for doc_id in stored if doc_id not in current]
+    
+    return added, updated, removed, skipped
+
+def sync_chromadb(documents, metadata_map, review_metadatas=None):
+    """
+    Incrementally bring the collection in line with the CSV: embed and upsert only
+    new texts, update metadata of moved rows, delete texts that are gone
+    """
+    try:
+        client = chromadb.PersistentClient(path=config.CHROMA_DIR)
+        collection = open_collection(client)
+        
+        ids, docs, metadatas = build_records(documents, metadata_map, review_metadatas)
+        duplicates = len(documents) - len(ids)
+        
+        stored = load_stored_metadata(collection)
+        added, updated, removed, skipped = diff_records(ids, metadatas, stored)
+        print(f"✓ {len(stored)} documents already stored")
+        
+        if added:
+            vectors = create_embeddings([docs[p] for p in added])
+            for start in range(0, len(added), config.INGEST_BATCH_SIZE):
+                batch = added[start:start + config.INGEST_BATCH_SIZE]
+                collection.upsert(
+                    ids=[ids[p] for p in batch],
+                    documents=[docs[p] for p in batch],
+                    embeddings=vectors[start:start + len(batch)],
+                    metadatas=[metadatas[p] for p in batch]
+                )
+        
+        # Metadata-only changes (e.g. a review moved rows) need no re-embedding
+        for start in range(0, len(updated), config.INGEST_BATCH_SIZE):
+            batch = updated[start:start + config.INGEST_BATCH_SIZE]
+            collection.update(
+                ids=[ids[p] for p in batch],
+                metadatas=[metadatas[p] for p in batch]
+            )
+        
+        for start in range(0, len(removed), config.INGEST_BATCH_SIZE):
+            collection.delete(ids=removed[start:start + config.INGEST_BATCH_SIZE])
+        
+        print(f"✓ Added: {len(added)} | Updated: {len(updated)} | "
+              f"Removed: {len(removed)} | Skipped: {len(skipped) + duplicates}"
+              + (f" ({duplicates} duplicate texts)" if duplicates else ""))
+        print(f"✓ Collection: {config.COLLECTION_NAME} ({collection.count()} documents)")
+        print(f"✓ Location: {config.CHROMA_DIR}")
+    
+    except Exception as e:
+        print(f"❌ Error syncing ChromaDB: {e}")
+        sys.exit(1)
+
+def review_columns():
+    """
+    CSV columns ingestion reads
+    """
+    return {config.TEXT_COLUMN, config.RESTAURANT_COLUMN, config.RATING_COLUMN, config.DATE_COLUMN}
+
+def iter_review_batches(path, batch_size, skip_rows=0):
+    """
+    Stream cleaned reviews from a CSV in fixed-size batches
+    
+    Reads config.CSV_CHUNK_ROWS rows at a time, so memory stays flat regardless
+    of file size. review_idx numbering matches load_data().
+    
+    Yields:
+        tuple: (review_idxs, texts, metadatas) with at most batch_size entries each
+    """
+    idxs, texts, metadatas = [], [], []
+    review_idx = 0
+    
+    reader = pd.read_csv(
+        path,
+        usecols=lambda column: column in review_columns(),
+        dtype=str,
+        chunksize=config.CSV_CHUNK_ROWS
+    )
+    for chunk in reader:
+        for text, metadata in zip(*clean_reviews(chunk)):
+            if review_idx >= skip_rows:
+                idxs.append(review_idx)
+                texts.append(text)
+                metadatas.append(metadata)
+                if len(texts) == batch_size:
+                    yield idxs, texts, metadatas
+                    idxs, texts, metadatas = [], [], []
+            review_idx += 1
+    
+    if texts:
+        yield idxs, texts, metadatas
+
+def source_signature(path):
+    """
+    Identify a CSV by size and modification time, so a checkpoint is never
+    resumed against a different file
+    """
+    stat = os.stat(path)
+    return {"path": os.path.abspath(path), "size": stat.st_size, "mtime": stat.st_mtime}
+
+def load_checkpoint(path):
+    """
+    Return the saved checkpoint if it matches the current CSV, else None
+    """
+    if not os.path.exists(path):
+        return None
+    
+    with open(path, encoding="utf-8") as f:
+        checkpoint = json.load(f)
+    
+    if checkpoint.get("source") != source_signature(config.DATA_PATH):
+        print(f"⚠️  Checkpoint {path} is for a different CSV, starting over")
+        return None
+    if checkpoint.get("collection") != config.COLLECTION_NAME:
+        print(f"⚠️  Checkpoint {path} is for another collection, starting over")
+        return None
+    return checkpoint
+
+def save_checkpoint(path, rows_committed, batches_committed):
+    """
+    Atomically record progress after a batch has been committed
+    """
+    checkpoint = {
+        "source": source_signature(config.DATA_PATH),
+        "collection": config.COLLECTION_NAME,
+        "rows_committed": rows_committed,
+        "batches_committed": batches_committed,
+    }
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_path, path)
+
+def write_batch(collection, texts, review_idxs, vectors, review_metadatas=None, duplicates=None):
+    """
+    Upsert one batch; upsert keeps replays after a crash idempotent
+    
+    Args:
+        duplicates (dict): Optional doc_id -> review indices of near-duplicates
+            of already stored documents (see collapse_batches); their counts go
+            into the same upsert as the batch, so a crash never keeps one
+            without the other
+    
+    Returns:
+        int: Documents of the batch stored
+    """
+    ids, docs, metadatas = build_records(texts, review_idxs, review_metadatas) if texts else ([], [], [])
+    if len(ids) < len(texts):
+        # Duplicate texts within a batch share an ID; keep the first vector of each
+        positions = {}
+        for pos, text in enumerate(texts):
+            positions.setdefault(make_doc_id(text), pos)
+        vectors = vectors[[positions[i] for i in ids]]
+    stored = len(ids)
+    vectors = [np.asarray(v, dtype=np.float32) for v in vectors] if stored else []
+    
+    if duplicates:
+        dup_ids, dup_docs, dup_vectors, dup_metadatas = counted_duplicates(collection, duplicates)
+        ids, docs, metadatas = ids + dup_ids, docs + dup_docs, metadatas + dup_metadatas
+        vectors = vectors + [np.asarray(v, dtype=np.float32) for v in dup_vectors]
+    
+    if ids:
+        collection.upsert(ids=ids, documents=docs, embeddings=np.stack(vectors), metadatas=metadatas)
+    return stored
+
+def stream_ingest(resume=False, pipelined=False):
+    """
+    Bounded-memory ingestion: read, encode and write one batch at a time,
+    checkpointing after every committed batch
+    
+    With pipelined=True the parse, embed and write stages run concurrently,
+    connected by bounded queues (see pipeline.py).
+    
+    Returns:
+        dict: rows, stored documents, batches, seconds and (pipelined) per-stage stats
+    """
+    checkpoint_path = config.INGEST_CHECKPOINT
+    checkpoint = load_checkpoint(checkpoint_path) if resume else None
+    progress = {
+        "rows": checkpoint["rows_committed"] if checkpoint else 0,
+        "batches": checkpoint["batches_committed"] if checkpoint else 0,
+        "stored": 0,
+    }
+    mode = "pipeline" if pipelined else "stream"
+    
+    try:
+        model = get_embedding_model()
+        client = chromadb.PersistentClient(path=config.CHROMA_DIR)
+        collection = open_collection(client, reset=checkpoint is None)
+        os.makedirs(os.path.dirname(checkpoint_path) or ".", exist_ok=True)
+        
+        if checkpoint:
+            print(f"✓ Resuming after {progress['rows']} rows ({progress['batches']} batches)")
+        
+        started = time.perf_counter()
+        stage_stats = None
+        
+        def embed(batch):
+            review_idxs, texts, metadatas, rows_done, duplicates = batch
+            with ingest_stage("embed", len(texts)):
+                vectors = encode_documents(model, texts) if texts else None
+                return review_idxs, texts, metadatas, vectors, rows_done, duplicates
+        
+        def persist(batch):
+            review_idxs, texts, metadatas, vectors, rows_done, duplicates = batch
+            with ingest_stage("write", len(texts)):
+                progress["stored"] += write_batch(collection, texts, review_idxs, vectors, metadatas, duplicates)
+            
+            # Batches arrive in order, so everything before this one is committed too
+            progress["rows"] = rows_done
+            progress["batches"] += 1
+            save_checkpoint(checkpoint_path, progress["rows"], progress["batches"])
+            
+            if progress["batches"] % config.PROGRESS_EVERY_BATCHES == 0:
+                rate = progress["stored"] / max(time.perf_counter() - started, 1e-9)
+                print(f"  … {progress['rows']} rows committed ({rate:.0f} docs/sec)")
+        
+        batches = timed_batches(
+            "parse",
+            iter_review_batches(config.DATA_PATH, config.INGEST_BATCH_SIZE, progress["rows"]),
+            count=lambda batch: len(batch[1])
+        )
+        
+        # Near-duplicates are dropped before embedding (see collapse_batches);
+        # opt-in here because the LSH index grows with every distinct review
+        dedup = near_duplicate_index() if config.NEAR_DUPLICATES and config.STREAM_NEAR_DUPLICATES else None
+        if dedup is not None and checkpoint:
+            seed_near_duplicates(dedup, collection)
+        batches = collapse_batches(batches, dedup)
+        if pipelined:
+            stats, wall_seconds = run_pipeline(
+                batches,
+                [("embed", embed), ("write", persist)],
+                queue_size=config.PIPELINE_QUEUE_SIZE,
+                count=lambda batch: len(batch[0])
+            )
+            print(f"✓ Stage throughput (wall {wall_seconds:.2f}s):")
+            for stage in stats:
+                print(f"    {stage.summary(wall_seconds)}")
+            stage_stats = {stage.name: stage.as_dict(wall_seconds) for stage in stats}
+        else:
+            for batch in batches:
+                persist(embed(batch))
+        
+        # Finished: nothing left to resume
+        if os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+        
+        print(f"✓ Streamed {progress['rows']} reviews in {progress['batches']} batches")
+        if dedup is not None:
+            report_near_duplicates(dedup)
+        print(f"✓ Collection: {config.COLLECTION_NAME} ({collection.count()} documents)")
+        print(f"✓ Location: {config.CHROMA_DIR}")
+        
+        return {
+            "rows": progress["rows"],
+            "stored": progress["stored"],
+            "batches": progress["batches"],
+            "seconds": time.perf_counter() - started,
+            "stages": stage_stats,
+        }
+    
+    except ImportError:
+        print("❌ Please install: pip install sentence-transformers")
+        sys.exit(1)
+    except Exception as e:
+        print(f"❌ Error during {mode} ingestion: {e}")
+        print(f"   Progress saved at {progress['rows']} rows; re-run with --mode {mode} --resume")
+        sys.exit(1)
+
+def export_vector_index(quantize=None):
+    """
+    Export the collection as a new memory-mapped index snapshot (see snapshots.py)
+    for the numpy search backend, page by page, plus the BM25 index used by
+    lexical and hybrid search and the restaurant centroids
+    
+    Args:
+        quantize (str): Also write "int8", "pq" or "pca" codes for the quantized backend
+    """
+    tmp_dir = None
+    try:
+        client = chromadb.PersistentClient(path=config.CHROMA_DIR)
+        collection = open_collection(client)
+        count = collection.count()
+        space = collection_settings(collection)["space"]
+        
+        # Written to a staging directory; running retrievers only see it once published
+        version, tmp_dir = new_snapshot()
+        
+        writer = None
+        offset = 0
+        while True:
+            page = collection.get(
+                limit=config.INGEST_BATCH_SIZE,
+                offset=offset,
+                include=["embeddings", "documents", "metadatas"]
+            )
+            if not page["ids"]:
+                break
+            vectors = np.asarray(page["embeddings"], dtype=np.float32)
+            if writer is None:
+                writer = IndexWriter(tmp_dir, count, vectors.shape[1], config.EMBEDDING_MODEL, space)
+            writer.add(page["ids"], page["documents"], page["metadatas"], vectors)
+            offset += len(page["ids"])
+        
+        if writer is None:
+            writer = IndexWriter(tmp_dir, 0, 0, config.EMBEDDING_MODEL, space)
+        writer.close()
+        build_metadata_index(tmp_dir)
+        lexical = build_lexical_index(tmp_dir, config.BM25_K1, config.BM25_B)
+        print(f"✓ BM25 index: {lexical['terms']} terms, {lexical['postings']} postings")
+        if config.RESTAURANT_INDEX:
+            restaurants = build_restaurant_index(tmp_dir, config.RESTAURANT_CENTROIDS, config.REVIEWS_PER_CENTROID)
+            print(f"✓ Restaurant index: {restaurants['restaurants']} restaurants, "
+                  f"{restaurants['centroids']} centroids")
+        
+        if quantize and count:
+            build_quantized(
+                tmp_dir,
+                VectorIndex(tmp_dir).vectors,
+                quantize,
+                config.PQ_SUBVECTORS,
+                config.PQ_TRAIN_SAMPLE,
+                config.PCA_DIMS
+            )
+            report_quantization(tmp_dir, quantize)
+        
+        publish_snapshot(tmp_dir, version)
+        
+        print(f"✓ Exported {count} vectors to snapshot {version} in {config.VECTOR_INDEX_DIR}")
+    
+    except Exception as e:
+        if tmp_dir:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        print(f"❌ Error exporting vector index: {e}")
+        sys.exit(1)
+
+def report_quantization(directory, name, k=10):
+    """
+    Print the memory saved by a quantized index, and its recall@k against exact
+    search and per-query search time for a range of re-scoring factors
+    """
+    index = VectorIndex(directory)
+    quantizer = load_quantizer(directory, name)
+    
+    full_bytes = index.vectors.nbytes
+    saved = 100 * (1 - quantizer.nbytes() / full_bytes) if full_bytes else 0.0
+    print(f"✓ {name} codes: {quantizer.nbytes() / 2**20:.1f} MB vs {full_bytes / 2**20:.1f} MB "
+          f"float32 ({saved:.0f}% less resident memory)")
+    if name == "pca":
+        print(f"✓ {quantizer.codes.shape[1]} of {index.dim} dimensions keep "
+              f"{100 * quantizer.explained:.1f}% of the variance")
+    
+    queries = sample_queries(index.vectors, config.QUANT_EVAL_QUERIES)
+    started = time.perf_counter()
+    exact_rows = [top_k_l2(index.vectors, index.sq_norms, query[None, :], k)[0][0] for query in queries]
+    exact_ms = 1000 * (time.perf_counter() - started) / max(len(queries), 1)
+    print(f"✓ recall@{k} vs exact search ({exact_ms:.2f} ms/query, {len(queries)} sample queries):")
+    for factor in sorted({1, 2, 4, 8, 16, config.RESCORE_FACTOR}):
+        started = time.perf_counter()
+        found = [
+            quantized_top_k(quantizer, index.vectors, index.sq_norms, query[None, :], k, rescore_factor=factor)[0][0]
+            for query in queries
+        ]
+        per_query_ms = 1000 * (time.perf_counter() - started) / max(len(queries), 1)
+        label = "codes only" if factor == 1 else f"{factor}x re-scoring"
+        print(f"    {label:<16} {recall_at_k(found, exact_rows):.3f} ({per_query_ms:.2f} ms/query)"
+              + (" ← RESCORE_FACTOR" if factor == config.RESCORE_FACTOR else ""))
+
+def mark_index_updated():
+    """
+    Write a new index version so running retrievers drop their cached results
+    """
+    os.makedirs(os.path.dirname(config.INDEX_VERSION_FILE) or ".", exist_ok=True)
+    tmp_path = config.INDEX_VERSION_FILE + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(f"{time.time():.6f}-{uuid.uuid4().hex}")
+    os.replace(tmp_path, config.INDEX_VERSION_FILE)
+
+def write_ingest_metrics():
+    """
+    Write per-stage timings to config.INGEST_METRICS_FILE (Prometheus text), if set
+    """
+    if config.INGEST_METRICS_FILE:
+        write_textfile(config.INGEST_METRICS_FILE)
+        print(f"✓ Stage metrics written to {config.INGEST_METRICS_FILE}")
+
+def parse_args(argv=None):
+    """
+    Command line options (defaults come from config.py)
+    """
+    parser = argparse.ArgumentParser(description="Ingest restaurant reviews into ChromaDB")
+    parser.add_argument(
+        "--mode",
+        choices=["full", "incremental", "stream", "pipeline"],
+        default=config.INGEST_MODE,
+        help="full: drop and rebuild the collection; incremental: only embed new/changed rows; "
+             "stream: bounded-memory batched ingestion for very large CSVs; "
+             "pipeline: stream mode with parse/embed/write running concurrently"
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="stream/pipeline mode: continue from the last committed batch"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=config.EMBED_WORKERS,
+        help="embedding processes (0 = one per CPU core, 1 = in-process)"
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=config.ENCODE_BATCH_SIZE,
+        help="texts per forward pass of the embedding model"
+    )
+    parser.add_argument(
+        "--keep-duplicates",
+        action="store_true",
+        default=not config.NEAR_DUPLICATES,
+        help="store near-identical reviews separately instead of collapsing them"
+    )
+    parser.add_argument(
+        "--stream-dedup",
+        action="store_true",
+        default=config.STREAM_NEAR_DUPLICATES,
+        help="stream/pipeline mode: also collapse near-identical reviews (memory grows "
+             "by ~1-2KB per distinct review)"
+    )
+    parser.add_argument(
+        "--quantize",
+        choices=QUANTIZERS,
+        default=config.QUANTIZATION,
+        help="also write int8, product-quantized or PCA coarse-index codes (implies --export-index)"
+    )
+    parser.add_argument(
+        "--pca-dims",
+        type=int,
+        default=config.PCA_DIMS,
+        help="dimensions of the PCA coarse index (--quantize pca)"
+    )
+    parser.add_argument(
+        "--export-index",
+        action="store_true",
+        default=config.SEARCH_BACKEND != "chroma" or config.SEARCH_MODE != "vector",
+        help="also export a memory-mapped index, BM25 postings and restaurant centroids "
+             "for the numpy backend, lexical/hybrid and restaurant search (on unless "
+             "SEARCH_BACKEND is 'chroma' and SEARCH_MODE is 'vector')"
+    )
+    return parser.parse_args(argv)
+
+def main(argv=None):
     """
     Main ingestion pipeline
     """
+    args = parse_args(argv)
+    config.EMBED_WORKERS = args.workers
+    config.ENCODE_BATCH_SIZE = args.batch_size
+    config.NEAR_DUPLICATES = not args.keep_duplicates
+    config.STREAM_NEAR_DUPLICATES = args.stream_dedup
+    config.PCA_DIMS = args.pca_dims
+    
     print("\n" + "="*50)
-    print("🚀 RAG Ingestion Pipeline")
+    print(f"🚀 RAG Ingestion Pipeline ({args.mode})")
     print("="*50 + "\n")
     
+    if args.mode in ("stream", "pipeline"):
+        print("[1/1] Streaming CSV → embeddings → ChromaDB...")
+        stream_ingest(resume=args.resume, pipelined=args.mode == "pipeline")
+        if args.export_index or args.quantize:
+            with ingest_stage("export"):
+                export_vector_index(args.quantize)
+        mark_index_updated()
+        write_ingest_metrics()
+        print("\n" + "="*50)
+        print("✅ Ingestion completed successfully!")
+        print("="*50 + "\n")
+        return
+    
     # Step 1: Load data
     print("[1/4] Loading data...")
-    texts = load_data()
+    with ingest_stage("load"):
+        texts, review_metadatas = load_data()
     
     # Step 2: Prepare documents
     print(f"\n[2/4] Preparing documents...")
-    documents, metadata_map = prepare_documents(texts)
+    with ingest_stage("prepare", len(texts)):
+        documents, metadata_map = prepare_documents(texts)
+    document_metadatas = [review_metadatas[idx] for idx in metadata_map]
+    
+    if config.NEAR_DUPLICATES:
+        with ingest_stage("dedup", len(documents)):
+            documents, metadata_map, document_metadatas = collapse_near_duplicates(
+                documents, metadata_map, document_metadatas
+            )
+    
+    if args.mode == "incremental":
+        # Steps 3+4: Diff against the stored collection, embed only what changed
+        print(f"\n[3/4] Diffing against ChromaDB and embedding changes...")
+        with ingest_stage("sync", len(documents)):
+            sync_chromadb(documents, metadata_map, document_metadatas)
+        print(f"\n[4/4] Stored changes in ChromaDB")
+    else:
+        # Step 3: Create embeddings
+        print(f"\n[3/4] Creating embeddings...")
+        with ingest_stage("embed", len(documents)):
+            vectors = create_embeddings(documents)
+        
+        # Step 4: Store in ChromaDB
+        print(f"\n[4/4] Storing in ChromaDB...")
+        with ingest_stage("write", len(documents)):
+            store_in_chromadb(documents, vectors, metadata_map, document_metadatas)
     
-    # Step 3: Create embeddings
-    print(f"\n[3/4] Creating embeddings...")
-    vectors = create_embeddings(documents)
+    if args.export_index or args.quantize:
+        print(f"\n[+] Exporting vector index...")
+        with ingest_stage("export"):
+            export_vector_index(args.quantize)
     
-    # Step 4: Store in ChromaDB
-    print(f"\n[4/4] Storing in ChromaDB...")
-    store_in_chromadb(documents, vectors, metadata_map)
+    mark_index_updated()
+    write_ingest_metrics()
     
     print("\n" + "="*50)
     print("✅ Ingestion completed successfully!")
@@ -0,0 +1,213 @@
+"""
+Lexical (BM25) Index
+Compact inverted index over the review texts, built at ingest time next to the
+exported vector index, for exact-term matches (dish names, rare tokens) that
+embedding search misses
+
+Files added to the vector index directory:
+    lexical.json                          BM25 parameters, document count, average length
+    terms.bin / terms_offsets.npy         sorted vocabulary (string table)
+    term_offsets.npy                      postings range per term
+    postings_rows.npy, postings_tf.npy    row and term frequency per posting
+    doc_lengths.npy                       tokens per row
+"""
+
+import json
+import os
+import re
+import shutil
+import numpy as np
+from vector_index import StringTable, StringTableWriter, VectorIndex
+from metadata_index import MetadataIndex
+
+LEXICAL_MANIFEST = "lexical.json"
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+def tokenize(text):
+    """
+    Lowercased word tokens
+    """
+    return _TOKEN.findall(text.lower())
+
+def build_lexical_index(directory, k1=1.2, b=0.75, block_rows=65536):
+    """
+    Build BM25 postings for the texts string table of an index directory
+
+    Each block's postings are spilled to disk as a (term, row, tf) run. The runs
+    are then merged into CSR form by term, straight into memory-mapped output
+    files, so memory holds one block plus the vocabulary (one Python string per
+    distinct term), not every posting.
+    """
+    texts = StringTable(directory, "texts")
+    n = len(texts)
+    row_dtype = np.int32 if n < 2**31 else np.int64
+    runs_dir = os.path.join(directory, "lexical_runs")
+    os.makedirs(runs_dir, exist_ok=True)
+
+    vocabulary = {}
+    doc_lengths = np.zeros(n, dtype=np.int32)
+    runs = []
+
+    try:
+        for start in range(0, n, block_rows):
+            terms, rows, tfs = [], [], []
+            for row in range(start, min(start + block_rows, n)):
+                tokens = tokenize(texts[row])
+                doc_lengths[row] = len(tokens)
+                counts = {}
+                for token in tokens:
+                    counts[token] = counts.get(token, 0) + 1
+                for token, tf in counts.items():
+                    terms.append(vocabulary.setdefault(token, len(vocabulary)))
+                    rows.append(row)
+                    tfs.append(min(tf, np.iinfo(np.uint16).max))
+
+            run = os.path.join(runs_dir, f"run_{len(runs)}.npz")
+            np.savez(
+                run,
+                terms=np.array(terms, dtype=np.int64),
+                rows=np.array(rows, dtype=row_dtype),
+                tfs=np.array(tfs, dtype=np.uint16)
+            )
+            runs.append(run)
+
+        # Renumber terms alphabetically so the vocabulary can be stored sorted
+        names = sorted(vocabulary)
+        renumber = np.zeros(len(vocabulary), dtype=np.int64)
+        for new_id, name in enumerate(names):
+            renumber[vocabulary[name]] = new_id
+        del vocabulary
+
+        counts = np.zeros(len(names), dtype=np.int64)
+        for run in runs:
+            with np.load(run) as block:
+                counts += np.bincount(renumber[block["terms"]], minlength=len(names))
+        offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        total = int(offsets[-1])
+
+        out_rows = np.lib.format.open_memmap(
+            os.path.join(directory, "postings_rows.npy"), mode="w+", dtype=row_dtype, shape=(total,)
+        )
+        out_tfs = np.lib.format.open_memmap(
+            os.path.join(directory, "postings_tf.npy"), mode="w+", dtype=np.uint16, shape=(total,)
+        )
+
+        # Runs cover ascending rows, so appending each run's postings to its
+        # terms keeps every posting list sorted by row
+        cursor = offsets[:-1].copy()
+        for run in runs:
+            with np.load(run) as block:
+                term_ids, rows, tfs = renumber[block["terms"]], block["rows"], block["tfs"]
+            order = np.lexsort((rows, term_ids))
+            term_ids = term_ids[order]
+            run_counts = np.bincount(term_ids, minlength=len(names))
+            run_starts = np.concatenate([[0], np.cumsum(run_counts)[:-1]])
+            positions = cursor[term_ids] + np.arange(len(term_ids)) - run_starts[term_ids]
+            out_rows[positions] = rows[order]
+            out_tfs[positions] = tfs[order]
+            cursor += run_counts
+        out_rows.flush()
+        out_tfs.flush()
+        del out_rows, out_tfs
+    finally:
+        shutil.rmtree(runs_dir, ignore_errors=True)
+
+    table = StringTableWriter(directory, "terms", len(names))
+    table.add(names)
+    table.close()
+    np.save(os.path.join(directory, "term_offsets.npy"), offsets)
+    np.save(os.path.join(directory, "doc_lengths.npy"), doc_lengths)
+
+    manifest = {
+        "documents": n,
+        "terms": len(names),
+        "postings": total,
+        "avg_doc_length": float(doc_lengths.mean()) if n else 0.0,
+        "k1": k1,
+        "b": b,
+    }
+    with open(os.path.join(directory, LEXICAL_MANIFEST), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+class LexicalIndex:
+    """
+    BM25 search over an index directory; returns hits in the backend format
+    """
+
+    def __init__(self, directory):
+        manifest_path = os.path.join(directory, LEXICAL_MANIFEST)
+        if not os.path.exists(manifest_path):
+            raise FileNotFoundError(f"No lexical index at {directory} (run ingest.py --export-index)")
+        with open(manifest_path, encoding="utf-8") as f:
+            self.manifest = json.load(f)
+
+        terms = StringTable(directory, "terms")
+        self.vocabulary = {terms[i]: i for i in range(len(terms))}
+        self.term_offsets = np.load(os.path.join(directory, "term_offsets.npy"))
+        self.postings_rows = np.load(os.path.join(directory, "postings_rows.npy"), mmap_mode="r")
+        self.postings_tf = np.load(os.path.join(directory, "postings_tf.npy"), mmap_mode="r")
+        self.doc_lengths = np.load(os.path.join(directory, "doc_lengths.npy"))
+
+        self.index = VectorIndex(directory)
+        self.metadata_index = MetadataIndex(directory)
+
+    def scores(self, query, candidate_rows=None):
+        """
+        BM25 scores of every row containing at least one query term
+
+        Returns:
+            tuple: (rows, scores), rows ascending
+        """
+        n = self.manifest["documents"]
+        k1, b = self.manifest["k1"], self.manifest["b"]
+        avg_length = self.manifest["avg_doc_length"] or 1.0
+
+        all_rows, all_scores = [], []
+        for term in set(tokenize(query)):
+            term_id = self.vocabulary.get(term)
+            if term_id is None:
+                continue
+            start, end = self.term_offsets[term_id], self.term_offsets[term_id + 1]
+            rows = np.asarray(self.postings_rows[start:end], dtype=np.int64)
+            tf = np.asarray(self.postings_tf[start:end], dtype=np.float32)
+
+            df = end - start
+            idf = np.log(1 + (n - df + 0.5) / (df + 0.5))
+            norm = k1 * (1 - b + b * self.doc_lengths[rows] / avg_length)
+            all_rows.append(rows)
+            all_scores.append(idf * tf * (k1 + 1) / (tf + norm))
+
+        if not all_rows:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+        rows = np.concatenate(all_rows)
+        unique_rows, inverse = np.unique(rows, return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(all_scores)).astype(np.float32)
+
+        if candidate_rows is not None:
+            keep = np.isin(unique_rows, candidate_rows, assume_unique=True)
+            unique_rows, scores = unique_rows[keep], scores[keep]
+        return unique_rows, scores
+
+    def search(self, query, top_k, filters=None):
+        """
+        Top-k rows by BM25 (filters restrict the rows considered)
+
+        Returns:
+            list: {'id', 'text', 'metadata', 'bm25'} dicts, best first
+        """
+        rows, scores = self.scores(query, self.metadata_index.candidate_rows(filters))
+        if len(rows) > top_k:
+            keep = np.argpartition(-scores, top_k - 1)[:top_k]
+            rows, scores = rows[keep], scores[keep]
+        order = np.argsort(-scores, kind="stable")
+
+        hits = []
+        for row, score in zip(rows[order], scores[order]):
+            hit = self.index.hit(row, 0.0)
+            del hit["distance"]
+            hit["bm25"] = float(score)
+            hits.append(hit)
+        return hits
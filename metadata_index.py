@@ -0,0 +1,200 @@
+"""
+Metadata Filters and Index
+Typed review metadata (restaurant, rating, date), search filters over it, and
+the precomputed indexes the in-process backends use to restrict the rows they
+score before any vector math happens
+
+Files added to the vector index directory:
+    restaurants.bin / restaurants_offsets.npy   sorted unique restaurant URLs
+    restaurant_offsets.npy, restaurant_rows.npy posting list of rows per restaurant
+    rating_bitmaps.npy                          packed row bitmap per rating 0-5 (0 = unknown)
+    date_keys.npy                               YYYYMMDD per row (0 = unknown)
+    date_order.npy, date_sorted.npy             rows with a date, sorted by date
+"""
+
+import json
+import os
+from datetime import datetime
+import numpy as np
+from vector_index import StringTable, StringTableWriter
+
+FILTER_KEYS = ("restaurant", "rating_min", "rating_max", "date_from", "date_to")
+
+MAX_RATING = 5
+
+def date_key(value):
+    """
+    'YYYY-MM-DD' (or a datetime) -> sortable int YYYYMMDD; ints pass through
+    """
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    if isinstance(value, str):
+        value = datetime.strptime(value.strip(), "%Y-%m-%d")
+    return value.year * 10000 + value.month * 100 + value.day
+
+def normalize_filters(filters):
+    """
+    Validate search filters and return them in canonical form (None if empty)
+
+    Accepted keys: restaurant (Yelp URL), rating_min / rating_max (1-5),
+    date_from / date_to ('YYYY-MM-DD', inclusive). Dates become YYYYMMDD ints.
+
+    Raises:
+        ValueError: On unknown keys or malformed values
+    """
+    if not filters:
+        return None
+    if not isinstance(filters, dict):
+        raise ValueError("Filters must be an object")
+
+    unknown = set(filters) - set(FILTER_KEYS)
+    if unknown:
+        raise ValueError(f"Unknown filter(s): {', '.join(sorted(unknown))}")
+
+    normalized = {}
+    if filters.get("restaurant") is not None:
+        if not isinstance(filters["restaurant"], str) or not filters["restaurant"].strip():
+            raise ValueError("Filter 'restaurant' must be a non-empty string")
+        normalized["restaurant"] = filters["restaurant"].strip()
+
+    for key in ("rating_min", "rating_max"):
+        if filters.get(key) is not None:
+            value = filters[key]
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                raise ValueError(f"Filter '{key}' must be a number")
+            normalized[key] = value
+
+    for key in ("date_from", "date_to"):
+        value = filters.get(key)
+        if value is not None:
+            # date_key also takes datetimes, which JSON can't carry; anything else is malformed
+            if isinstance(value, bool) or not isinstance(value, (str, int)):
+                raise ValueError(f"Filter '{key}' must be a date in YYYY-MM-DD format")
+            try:
+                normalized[key] = date_key(value)
+            except (TypeError, ValueError):
+                raise ValueError(f"Filter '{key}' must be a date in YYYY-MM-DD format")
+
+    return normalized or None
+
+def filters_key(filters):
+    """
+    Hashable form of normalized filters, for cache keys and batching groups
+    """
+    return tuple(sorted(filters.items())) if filters else None
+
+def chroma_where(filters):
+    """
+    Translate normalized filters into a ChromaDB `where` clause (None if no filters)
+    """
+    if not filters:
+        return None
+
+    clauses = []
+    if "restaurant" in filters:
+        clauses.append({"restaurant": {"$eq": filters["restaurant"]}})
+    if "rating_min" in filters:
+        clauses.append({"rating": {"$gte": filters["rating_min"]}})
+    if "rating_max" in filters:
+        clauses.append({"rating": {"$lte": filters["rating_max"]}})
+    if "date_from" in filters:
+        clauses.append({"date_key": {"$gte": filters["date_from"]}})
+    if "date_to" in filters:
+        clauses.append({"date_key": {"$lte": filters["date_to"]}})
+
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+def build_metadata_index(directory):
+    """
+    Build the filter indexes from the metadata string table of an index directory
+    """
+    metadata = StringTable(directory, "metadata")
+    n = len(metadata)
+
+    ratings = np.zeros(n, dtype=np.int8)
+    date_keys = np.zeros(n, dtype=np.int32)
+    restaurant_of_row = []
+    for row in range(n):
+        fields = json.loads(metadata[row])
+        ratings[row] = int(fields.get("rating", 0) or 0)
+        date_keys[row] = int(fields.get("date_key", 0) or 0)
+        restaurant_of_row.append(fields.get("restaurant", ""))
+
+    # Restaurant posting lists (rows grouped by restaurant, ascending within each)
+    names = sorted(set(name for name in restaurant_of_row if name))
+    position = {name: i for i, name in enumerate(names)}
+    codes = np.array([position.get(name, -1) for name in restaurant_of_row], dtype=np.int64)
+    order = np.argsort(codes, kind="stable")
+    order = order[codes[order] >= 0]
+    counts = np.bincount(codes[codes >= 0], minlength=len(names))
+    offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+
+    table = StringTableWriter(directory, "restaurants", len(names))
+    table.add(names)
+    table.close()
+    np.save(os.path.join(directory, "restaurant_offsets.npy"), offsets)
+    np.save(os.path.join(directory, "restaurant_rows.npy"), order.astype(np.int64))
+
+    # One packed bitmap per rating value
+    bitmaps = np.stack([np.packbits(ratings == r) for r in range(MAX_RATING + 1)])
+    np.save(os.path.join(directory, "rating_bitmaps.npy"), bitmaps)
+
+    # Sorted date index
+    dated = np.flatnonzero(date_keys > 0)
+    date_order = dated[np.argsort(date_keys[dated], kind="stable")]
+    np.save(os.path.join(directory, "date_keys.npy"), date_keys)
+    np.save(os.path.join(directory, "date_order.npy"), date_order.astype(np.int64))
+    np.save(os.path.join(directory, "date_sorted.npy"), date_keys[date_order])
+
+class MetadataIndex:
+    """
+    Resolves normalized filters to the sorted array of matching rows
+    """
+
+    def __init__(self, directory):
+        self.count = len(np.load(os.path.join(directory, "date_keys.npy"), mmap_mode="r"))
+        names = StringTable(directory, "restaurants")
+        self.restaurants = {names[i]: i for i in range(len(names))}
+        self.restaurant_offsets = np.load(os.path.join(directory, "restaurant_offsets.npy"))
+        self.restaurant_rows = np.load(os.path.join(directory, "restaurant_rows.npy"), mmap_mode="r")
+        self.rating_bitmaps = np.load(os.path.join(directory, "rating_bitmaps.npy"))
+        self.date_order = np.load(os.path.join(directory, "date_order.npy"), mmap_mode="r")
+        self.date_sorted = np.load(os.path.join(directory, "date_sorted.npy"))
+
+    def restaurant_rows_for(self, name):
+        i = self.restaurants.get(name)
+        if i is None:
+            return np.zeros(0, dtype=np.int64)
+        return np.asarray(self.restaurant_rows[self.restaurant_offsets[i]:self.restaurant_offsets[i + 1]])
+
+    def candidate_rows(self, filters):
+        """
+        Rows matching all filters, ascending (None when there are no filters)
+        """
+        if not filters:
+            return None
+
+        mask = np.ones(self.count, dtype=bool)
+
+        if "restaurant" in filters:
+            only = np.zeros(self.count, dtype=bool)
+            only[self.restaurant_rows_for(filters["restaurant"])] = True
+            mask &= only
+
+        if "rating_min" in filters or "rating_max" in filters:
+            low = filters.get("rating_min", 1)
+            high = filters.get("rating_max", MAX_RATING)
+            packed = np.zeros(self.rating_bitmaps.shape[1], dtype=np.uint8)
+            for rating in range(1, MAX_RATING + 1):
+                if low <= rating <= high:
+                    packed |= self.rating_bitmaps[rating]
+            mask &= np.unpackbits(packed, count=self.count).astype(bool)
+
+        if "date_from" in filters or "date_to" in filters:
+            start = np.searchsorted(self.date_sorted, filters.get("date_from", 0), side="left")
+            end = np.searchsorted(self.date_sorted, filters.get("date_to", 99999999), side="right")
+            only = np.zeros(self.count, dtype=bool)
+            only[np.asarray(self.date_order[start:end])] = True
+            mask &= only
+
+        return np.flatnonzero(mask)
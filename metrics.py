@@ -0,0 +1,277 @@
+"""
+Metrics
+Lightweight in-process counters, gauges and histograms rendered in the
+Prometheus text format for /metrics, stage timing hooks for retrieval and
+ingestion, and a sampled slow-query log
+
+Metrics are per process: under serve.py each worker reports its own.
+"""
+
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+import config
+
+# Seconds; covers sub-millisecond cache hits up to multi-second cold searches
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def _labels(names, values):
+    if not names:
+        return ""
+    pairs = ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values))
+    return "{" + pairs + "}"
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Counter:
+    """
+    Monotonic counter, optionally labelled
+    """
+    kind = "counter"
+
+    def __init__(self, name, help, labelnames=()):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels[n]) for n in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(tuple(str(labels[n]) for n in self.labelnames), 0)
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            yield f"{self.name}{_labels(self.labelnames, key)} {_number(value)}"
+
+class Histogram:
+    """
+    Cumulative-bucket histogram, optionally labelled
+    """
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self.buckets = tuple(buckets) + (float("inf"),)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels[n]) for n in self.labelnames)
+        with self._lock:
+            counts, total = self._series.get(key, ([0] * len(self.buckets), 0.0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self._series[key] = (counts, total + value)
+
+    def count(self, **labels):
+        series = self._series.get(tuple(str(labels[n]) for n in self.labelnames))
+        return series[0][-1] if series else 0
+
+    def samples(self):
+        with self._lock:
+            items = sorted((key, (list(counts), total)) for key, (counts, total) in self._series.items())
+        names = self.labelnames + ("le",)
+        for key, (counts, total) in items:
+            for bound, count in zip(self.buckets, counts):
+                yield f"{self.name}_bucket{_labels(names, key + (_number(bound),))} {count}"
+            yield f"{self.name}_sum{_labels(self.labelnames, key)} {_number(total)}"
+            yield f"{self.name}_count{_labels(self.labelnames, key)} {counts[-1]}"
+
+class Gauge:
+    """
+    Value read at scrape time from a callback returning {label tuple: value}
+    (or a plain number when the gauge has no labels)
+
+    kind="counter" exposes a running total kept elsewhere (e.g. in a stats dict).
+    """
+
+    def __init__(self, name, help, callback, labelnames=(), kind="gauge"):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self.callback = callback
+        self.kind = kind
+
+    def samples(self):
+        try:
+            values = self.callback()
+        except Exception:
+            return
+        if values is None:
+            return
+        if not isinstance(values, dict):
+            values = {(): values}
+        for key, value in sorted(values.items()):
+            if value is not None:
+                yield f"{self.name}{_labels(self.labelnames, key)} {_number(value)}"
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            # Re-registering (e.g. a module reloaded in tests) keeps the first instance
+            return self._metrics.setdefault(metric.name, metric)
+
+    def render(self):
+        """
+        Prometheus text exposition format (version 0.0.4)
+        """
+        lines = []
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+REGISTRY = Registry()
+
+def counter(name, help, labelnames=()):
+    return REGISTRY.register(Counter(name, help, labelnames))
+
+def histogram(name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+    return REGISTRY.register(Histogram(name, help, labelnames, buckets))
+
+def gauge(name, help, callback, labelnames=(), kind="gauge"):
+    return REGISTRY.register(Gauge(name, help, callback, labelnames, kind))
+
+def directory_bytes(path):
+    """
+    Total size of the files under path (0 if it doesn't exist)
+    """
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+# ---- retrieval and ingestion ------------------------------------------------
+
+RETRIEVE_SECONDS = histogram(
+    "rag_retrieve_seconds", "End-to-end Retriever.retrieve_many latency", ["mode"])
+RETRIEVE_STAGE_SECONDS = histogram(
+    "rag_retrieve_stage_seconds", "Time per retrieval stage (encode, search, format, lexical, fusion)", ["stage"])
+RETRIEVE_QUERIES = counter(
+    "rag_retrieve_queries_total", "Queries answered by the retriever", ["mode"])
+RETRIEVE_ERRORS = counter(
+    "rag_retrieve_errors_total", "Failed retrieve_many calls", ["mode"])
+
+SEMANTIC_CACHE_RECALL = histogram(
+    "rag_semantic_cache_recall", "recall@k of semantic cache hits against a full search (sampled)",
+    buckets=(0.5, 0.6, 0.7, 0.8, 0.9, 0.95, 0.99, 1.0))
+
+INGEST_STAGE_SECONDS = histogram(
+    "rag_ingest_stage_seconds", "Time per ingestion batch and stage (parse, embed, write)", ["stage"],
+    buckets=(0.01, 0.05, 0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0))
+INGEST_ROWS = counter(
+    "rag_ingest_rows_total", "Rows processed per ingestion stage", ["stage"])
+
+def record_retrieval(mode, queries, timings):
+    """
+    Feed one retrieve_many call's timings (milliseconds, as filled in by the
+    retriever) into the histograms
+    """
+    RETRIEVE_QUERIES.inc(queries, mode=mode)
+    for key, ms in timings.items():
+        if key == "total_ms":
+            RETRIEVE_SECONDS.observe(ms / 1000, mode=mode)
+        elif key.endswith("_ms"):
+            RETRIEVE_STAGE_SECONDS.observe(ms / 1000, stage=key[:-3])
+
+@contextmanager
+def ingest_stage(stage, rows=None):
+    """
+    Time one batch (or, outside stream mode, one whole step) of an ingestion stage
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        INGEST_STAGE_SECONDS.observe(time.perf_counter() - started, stage=stage)
+        if rows is not None:
+            INGEST_ROWS.inc(rows, stage=stage)
+
+def timed_batches(stage, batches, count=len):
+    """
+    Wrap a batch generator so the time spent producing each batch is recorded
+    """
+    batches = iter(batches)
+    while True:
+        started = time.perf_counter()
+        try:
+            batch = next(batches)
+        except StopIteration:
+            return
+        INGEST_STAGE_SECONDS.observe(time.perf_counter() - started, stage=stage)
+        INGEST_ROWS.inc(count(batch), stage=stage)
+        yield batch
+
+def write_textfile(path):
+    """
+    Dump all metrics to a file (for node_exporter's textfile collector), atomically
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = f"{path}.tmp-{os.getpid()}"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(REGISTRY.render())
+    os.replace(tmp, path)
+
+# ---- slow-query log ---------------------------------------------------------
+
+class SlowQueryLog:
+    """
+    Records a sample of retrievals slower than a threshold, with their stage
+    breakdown: appended as JSON lines to a file and kept in a small ring
+    """
+
+    def __init__(self, threshold_ms=None, sample_rate=None, path=None, keep=100):
+        self.threshold_ms = config.SLOW_QUERY_MS if threshold_ms is None else threshold_ms
+        self.sample_rate = config.SLOW_QUERY_SAMPLE_RATE if sample_rate is None else sample_rate
+        self.path = config.SLOW_QUERY_LOG if path is None else path
+        self.recent = deque(maxlen=keep)
+        self._lock = threading.Lock()
+
+    def maybe_record(self, queries, mode, top_k, filters, timings):
+        total = timings.get("total_ms", 0.0)
+        if total < self.threshold_ms or random.random() >= self.sample_rate:
+            return False
+
+        entry = {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "pid": os.getpid(),
+            "queries": list(queries),
+            "mode": mode,
+            "top_k": top_k,
+            "filters": filters,
+            "timings_ms": dict(timings),
+        }
+        with self._lock:
+            self.recent.append(entry)
+            if self.path:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(entry) + "\n")
+        return True
+
+slow_queries = SlowQueryLog()
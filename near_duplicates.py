@@ -0,0 +1,118 @@
+"""
+Near-Duplicate Detection
+MinHash signatures over word shingles, bucketed by LSH bands, to find reposted
+and near-identical reviews in one streaming pass. Every document is checked
+against the canonical documents seen so far: candidates sharing a band bucket
+count as duplicates when their signatures agree on at least `threshold` of the
+positions (an estimate of the shingle-set Jaccard similarity).
+"""
+
+import re
+import zlib
+from collections import defaultdict
+import numpy as np
+
+_WORD = re.compile(r"\w+")
+
+def shingle_hashes(text, words=3):
+    """
+    32-bit hashes of the text's lowercased `words`-word shingles (the whole
+    text is one shingle when it is shorter than that)
+    """
+    tokens = _WORD.findall(text.lower())
+    if len(tokens) <= words:
+        shingles = {" ".join(tokens)}
+    else:
+        shingles = {" ".join(tokens[i:i + words]) for i in range(len(tokens) - words + 1)}
+    return np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64, count=len(shingles))
+
+class NearDuplicateIndex:
+    """
+    Canonical documents seen so far, looked up by MinHash LSH
+    """
+
+    def __init__(self, threshold=0.8, permutations=64, bands=16, shingle_words=3, seed=0):
+        """
+        Args:
+            threshold (float): Estimated Jaccard similarity at which two documents are duplicates
+            permutations (int): MinHash signature length
+            bands (int): LSH bands; must divide permutations. More bands find
+                lower-similarity candidates at the cost of more comparisons
+            shingle_words (int): Words per shingle
+            seed (int): Seed of the hash functions
+        """
+        if permutations % bands:
+            raise ValueError(f"{bands} bands don't divide {permutations} permutations")
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = permutations // bands
+        self.shingle_words = shingle_words
+
+        # Multiply-shift hash functions h(x) = (a * x + b) >> 32 with odd a, mod 2^64
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, 2 ** 63, permutations, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        self._b = rng.integers(0, 2 ** 63, permutations, dtype=np.uint64)
+        self._band_mix = rng.integers(1, 2 ** 63, self.rows, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+
+        self._buckets = [dict() for _ in range(bands)]  # band key -> canonical number
+        self._signatures = np.zeros((1024, permutations), dtype=np.uint32)
+        self.keys = []  # canonical number -> caller's key
+        self.duplicate_counts = defaultdict(int)  # canonical key -> duplicates collapsed into it
+        self.documents = 0
+        self.duplicates = 0
+
+    def signature(self, text):
+        hashes = shingle_hashes(text, self.shingle_words)
+        with np.errstate(over="ignore"):
+            values = (hashes[:, None] * self._a[None, :] + self._b[None, :]) >> np.uint64(32)
+        return values.min(axis=0).astype(np.uint32)
+
+    def band_keys(self, signature):
+        with np.errstate(over="ignore"):
+            mixed = signature.reshape(self.bands, self.rows).astype(np.uint64) * self._band_mix[None, :]
+        return [int(key) for key in np.bitwise_xor.reduce(mixed, axis=1)]
+
+    def add(self, text, key):
+        """
+        Check one document against the canonical ones and index it if it is new
+
+        Returns:
+            The key of the canonical document it duplicates, or `key` itself
+            when it is new (or already indexed under the same key)
+        """
+        self.documents += 1
+        signature = self.signature(text)
+        band_keys = self.band_keys(signature)
+
+        candidates = {bucket[k] for bucket, k in zip(self._buckets, band_keys) if k in bucket}
+        best, best_similarity = None, self.threshold
+        for number in candidates:
+            similarity = float(np.mean(self._signatures[number] == signature))
+            if similarity >= best_similarity:
+                best, best_similarity = number, similarity
+        if best is not None:
+            canonical = self.keys[best]
+            if canonical != key:
+                self.duplicates += 1
+                self.duplicate_counts[canonical] += 1
+            return canonical
+
+        number = len(self.keys)
+        if number == len(self._signatures):
+            self._signatures = np.concatenate([self._signatures, np.zeros_like(self._signatures)])
+        self._signatures[number] = signature
+        self.keys.append(key)
+        for bucket, k in zip(self._buckets, band_keys):
+            bucket.setdefault(k, number)
+        return key
+
+    def __len__(self):
+        return len(self.keys)
+
+    def stats(self):
+        return {
+            "documents": self.documents,
+            "canonical": len(self.keys),
+            "duplicates": self.duplicates,
+            "removed_ratio": self.duplicates / self.documents if self.documents else 0.0,
+        }
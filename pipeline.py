@@ -0,0 +1,171 @@
+"""
+Pipelined Execution Engine
+Runs ingestion stages (parse → embed → write) concurrently in threads connected
+by bounded queues, so total time approaches the slowest stage instead of the sum
+"""
+
+import queue
+import threading
+import time
+
+# Marks the end of the stream on a queue
+_DONE = object()
+
+# How often blocked threads re-check whether another stage failed
+_POLL_SECONDS = 0.1
+
+class PipelineError(Exception):
+    """Raised when a pipeline stage fails"""
+    pass
+
+class StageStats:
+    """
+    Throughput counters for one stage
+
+    busy: seconds spent doing the stage's own work
+    starved: seconds waiting for input from the previous stage
+    blocked: seconds waiting for room in the next stage's queue (backpressure)
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.items = 0
+        self.rows = 0
+        self.busy = 0.0
+        self.starved = 0.0
+        self.blocked = 0.0
+
+    def rows_per_sec(self):
+        return self.rows / self.busy if self.busy > 0 else 0.0
+
+    def as_dict(self, wall_seconds):
+        return {
+            "batches": self.items,
+            "rows": self.rows,
+            "busy_seconds": self.busy,
+            "starved_seconds": self.starved,
+            "blocked_seconds": self.blocked,
+            "utilization": self.busy / wall_seconds if wall_seconds > 0 else 0.0,
+            "rows_per_sec": self.rows_per_sec(),
+        }
+
+    def summary(self, wall_seconds):
+        utilization = 100 * self.busy / wall_seconds if wall_seconds > 0 else 0.0
+        return (
+            f"{self.name:<6} {self.items:>6} batches {self.rows:>9} rows | "
+            f"busy {self.busy:7.2f}s ({utilization:5.1f}%) | "
+            f"starved {self.starved:6.2f}s | blocked {self.blocked:6.2f}s | "
+            f"{self.rows_per_sec():9.0f} rows/s"
+        )
+
+def _put(q, item, abort, stats):
+    """
+    Put with backpressure, giving up if another stage failed
+    """
+    started = time.perf_counter()
+    while not abort.is_set():
+        try:
+            q.put(item, timeout=_POLL_SECONDS)
+            break
+        except queue.Full:
+            continue
+    stats.blocked += time.perf_counter() - started
+
+def _get(q, abort, stats):
+    """
+    Get the next item, returning _DONE if another stage failed
+    """
+    started = time.perf_counter()
+    item = _DONE
+    while not abort.is_set():
+        try:
+            item = q.get(timeout=_POLL_SECONDS)
+            break
+        except queue.Empty:
+            continue
+    stats.starved += time.perf_counter() - started
+    return item
+
+def run_pipeline(source, stages, queue_size=4, count=len, source_name="parse"):
+    """
+    Run source → stage_1 → ... → stage_n concurrently
+
+    Args:
+        source (iterable): Produces work items (runs in its own thread)
+        stages (list): (name, fn) pairs; each fn maps an item to the next stage's input.
+            The last stage's return value is discarded.
+        queue_size (int): Max items buffered between two stages (backpressure)
+        count (callable): Number of rows in an item, for throughput counters
+        source_name (str): Stage name reported for the source
+
+    Returns:
+        tuple: (list of StageStats in pipeline order, wall-clock seconds)
+    """
+    abort = threading.Event()
+    errors = []
+    all_stats = [StageStats(source_name)] + [StageStats(name) for name, _ in stages]
+    queues = [queue.Queue(maxsize=queue_size) for _ in stages]
+
+    def run_source():
+        stats = all_stats[0]
+        iterator = iter(source)
+        try:
+            while not abort.is_set():
+                started = time.perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    break
+                finally:
+                    stats.busy += time.perf_counter() - started
+                stats.items += 1
+                stats.rows += count(item)
+                _put(queues[0], item, abort, stats)
+        except Exception as e:
+            errors.append((stats.name, e))
+            abort.set()
+        finally:
+            _put(queues[0], _DONE, abort, stats)
+
+    def run_stage(position, fn):
+        stats = all_stats[position + 1]
+        inbox = queues[position]
+        outbox = queues[position + 1] if position + 1 < len(queues) else None
+        try:
+            while True:
+                item = _get(inbox, abort, stats)
+                if item is _DONE:
+                    break
+                started = time.perf_counter()
+                rows = count(item)
+                result = fn(item)
+                stats.busy += time.perf_counter() - started
+                stats.items += 1
+                stats.rows += rows
+                if outbox is not None:
+                    _put(outbox, result, abort, stats)
+        except Exception as e:
+            errors.append((stats.name, e))
+            abort.set()
+        finally:
+            if outbox is not None:
+                _put(outbox, _DONE, abort, stats)
+
+    threads = [threading.Thread(target=run_source, name=f"pipeline-{source_name}", daemon=True)]
+    for position, (name, fn) in enumerate(stages):
+        threads.append(threading.Thread(
+            target=run_stage, args=(position, fn), name=f"pipeline-{name}", daemon=True
+        ))
+
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall_seconds = time.perf_counter() - started
+
+    if errors:
+        name, error = errors[0]
+        raise PipelineError(f"Stage '{name}' failed: {error}") from error
+
+    return all_stats, wall_seconds
@@ -0,0 +1,276 @@
+"""
+Vector Quantization
+Compressed copies of the exported vectors (scalar int8, product quantization
+or a PCA projection to a few dimensions) that are scanned first, with a small
+over-fetched candidate set re-scored against the full-precision vectors
+
+Files added to the vector index directory:
+    int8_codes.npy, int8_params.npz      scalar quantization (1 byte per dimension)
+    pq_codes.npy, pq_codebooks.npy       product quantization (1 byte per sub-vector)
+    pca_codes.npy, pca_residuals.npy,    coarse index: float32 coordinates along the top
+    pca_params.npz                       principal components, plus each row's residual norm
+"""
+
+import os
+import numpy as np
+from vector_index import top_k_l2
+
+QUANTIZERS = ("int8", "pq", "pca")
+
+def _blocks(n, block_rows):
+    for start in range(0, n, block_rows):
+        yield start, min(start + block_rows, n)
+
+# ---- scalar int8 ---------------------------------------------------------
+
+def build_int8(directory, vectors, block_rows=65536):
+    """
+    Per-dimension min/max scalar quantization to int8
+    """
+    n, dim = vectors.shape
+    low = np.full(dim, np.inf, dtype=np.float32)
+    high = np.full(dim, -np.inf, dtype=np.float32)
+    for start, end in _blocks(n, block_rows):
+        block = np.asarray(vectors[start:end])
+        low = np.minimum(low, block.min(axis=0))
+        high = np.maximum(high, block.max(axis=0))
+
+    scale = np.maximum(high - low, 1e-12) / 255.0
+    codes = np.lib.format.open_memmap(
+        os.path.join(directory, "int8_codes.npy"), mode="w+", dtype=np.int8, shape=(n, dim)
+    )
+    for start, end in _blocks(n, block_rows):
+        block = np.asarray(vectors[start:end])
+        codes[start:end] = (np.rint((block - low) / scale) - 128).astype(np.int8)
+    codes.flush()
+    del codes
+    np.savez(os.path.join(directory, "int8_params.npz"), offset=low, scale=scale.astype(np.float32))
+
+class Int8Quantizer:
+    """
+    Approximate squared L2 from int8 codes: x ~ offset + scale * (code + 128)
+    """
+    name = "int8"
+
+    def __init__(self, directory):
+        self.codes = np.load(os.path.join(directory, "int8_codes.npy"))
+        params = np.load(os.path.join(directory, "int8_params.npz"))
+        self.offset = params["offset"]
+        self.scale = params["scale"]
+
+    def nbytes(self):
+        return self.codes.nbytes + self.offset.nbytes + self.scale.nbytes
+
+    def distances(self, queries, sq_norms, start, end):
+        """
+        Approximate distances for rows [start, end) (exact norms, approximate dot products)
+        """
+        q_dot_offset = queries @ self.offset
+        block = self.codes[start:end].astype(np.float32) + 128.0
+        dots = q_dot_offset[:, None] + (queries * self.scale) @ block.T
+        q_sq = np.einsum("ij,ij->i", queries, queries)
+        return q_sq[:, None] + np.asarray(sq_norms[start:end])[None, :] - 2.0 * dots
+
+# ---- product quantization -------------------------------------------------
+
+def kmeans(data, k, iterations=15, seed=0):
+    """
+    Plain Lloyd's k-means (numpy only), initialized from a random sample
+    """
+    rng = np.random.default_rng(seed)
+    k = min(k, len(data))
+    centroids = data[rng.choice(len(data), k, replace=False)].copy()
+    for _ in range(iterations):
+        dist = (data ** 2).sum(1)[:, None] - 2 * data @ centroids.T + (centroids ** 2).sum(1)[None, :]
+        assign = dist.argmin(axis=1)
+        for c in range(k):
+            members = data[assign == c]
+            if len(members):
+                centroids[c] = members.mean(axis=0)
+            else:
+                # Re-seed empty clusters on a random point
+                centroids[c] = data[rng.integers(len(data))]
+    return centroids
+
+def build_pq(directory, vectors, subvectors, train_sample=50000, iterations=15, block_rows=65536):
+    """
+    Product quantization: split each vector into `subvectors` pieces and store
+    the index of the nearest of 256 trained centroids per piece
+    """
+    n, dim = vectors.shape
+    if dim % subvectors:
+        raise ValueError(f"Dimension {dim} is not divisible into {subvectors} sub-vectors")
+    sub_dim = dim // subvectors
+
+    rng = np.random.default_rng(0)
+    sample_rows = np.sort(rng.choice(n, min(n, train_sample), replace=False))
+    sample = np.asarray(vectors[sample_rows], dtype=np.float32)
+
+    codebooks = np.zeros((subvectors, 256, sub_dim), dtype=np.float32)
+    for j in range(subvectors):
+        trained = kmeans(sample[:, j * sub_dim:(j + 1) * sub_dim], 256, iterations, seed=j)
+        codebooks[j, :len(trained)] = trained
+        # Fewer points than centroids: pad with copies so every code is valid
+        codebooks[j, len(trained):] = trained[0]
+
+    codes = np.lib.format.open_memmap(
+        os.path.join(directory, "pq_codes.npy"), mode="w+", dtype=np.uint8, shape=(n, subvectors)
+    )
+    for start, end in _blocks(n, block_rows):
+        block = np.asarray(vectors[start:end], dtype=np.float32)
+        for j in range(subvectors):
+            piece = block[:, j * sub_dim:(j + 1) * sub_dim]
+            book = codebooks[j]
+            dist = (piece ** 2).sum(1)[:, None] - 2 * piece @ book.T + (book ** 2).sum(1)[None, :]
+            codes[start:end, j] = dist.argmin(axis=1)
+    codes.flush()
+    del codes
+    np.save(os.path.join(directory, "pq_codebooks.npy"), codebooks)
+
+class PQQuantizer:
+    """
+    Asymmetric distance computation: exact query vs. quantized rows, via a
+    per-query (subvectors, 256) lookup table
+    """
+    name = "pq"
+
+    def __init__(self, directory):
+        self.codes = np.load(os.path.join(directory, "pq_codes.npy"))
+        self.codebooks = np.load(os.path.join(directory, "pq_codebooks.npy"))
+
+    def nbytes(self):
+        return self.codes.nbytes + self.codebooks.nbytes
+
+    def distances(self, queries, sq_norms, start, end):
+        subvectors, _, sub_dim = self.codebooks.shape
+        pieces = queries.reshape(len(queries), subvectors, sub_dim)
+        # tables[b, j, c] = ||q_j - centroid_jc||^2
+        tables = (
+            (pieces ** 2).sum(2)[:, :, None]
+            - 2 * np.einsum("bjd,jcd->bjc", pieces, self.codebooks)
+            + (self.codebooks ** 2).sum(2)[None, :, :]
+        )
+        block = self.codes[start:end].astype(np.intp)
+        sub_index = np.arange(subvectors)[None, :]
+        return np.stack([table[sub_index, block].sum(axis=1) for table in tables])
+
+# ---- PCA coarse index --------------------------------------------------------
+
+def build_pca(directory, vectors, dims, train_sample=50000, block_rows=65536):
+    """
+    Project vectors onto their top `dims` principal components (fitted on a
+    sample), keeping the squared norm of what the projection drops
+    """
+    n, dim = vectors.shape
+    if not 0 < dims <= dim:
+        raise ValueError(f"PCA dimensions must be between 1 and {dim}, got {dims}")
+
+    rng = np.random.default_rng(0)
+    sample_rows = np.sort(rng.choice(n, min(n, train_sample), replace=False))
+    sample = np.asarray(vectors[sample_rows], dtype=np.float32)
+    mean = sample.mean(axis=0)
+    _, singular_values, components = np.linalg.svd(sample - mean, full_matrices=False)
+    components = np.ascontiguousarray(components[:dims], dtype=np.float32)
+    variance = singular_values ** 2
+    explained = float(variance[:dims].sum() / max(variance.sum(), 1e-12))
+
+    codes = np.lib.format.open_memmap(
+        os.path.join(directory, "pca_codes.npy"), mode="w+", dtype=np.float32, shape=(n, dims)
+    )
+    residuals = np.lib.format.open_memmap(
+        os.path.join(directory, "pca_residuals.npy"), mode="w+", dtype=np.float32, shape=(n,)
+    )
+    for start, end in _blocks(n, block_rows):
+        centered = np.asarray(vectors[start:end], dtype=np.float32) - mean
+        projected = centered @ components.T
+        codes[start:end] = projected
+        residuals[start:end] = np.maximum(
+            np.einsum("ij,ij->i", centered, centered) - np.einsum("ij,ij->i", projected, projected), 0
+        )
+    codes.flush()
+    residuals.flush()
+    del codes, residuals
+    np.savez(os.path.join(directory, "pca_params.npz"), mean=mean, components=components, explained=explained)
+
+class PCAQuantizer:
+    """
+    Approximate squared L2 in the projected space, plus both residual norms
+    (as if the parts the projection drops were orthogonal)
+    """
+    name = "pca"
+
+    def __init__(self, directory):
+        self.codes = np.load(os.path.join(directory, "pca_codes.npy"))
+        params = np.load(os.path.join(directory, "pca_params.npz"))
+        self.mean = params["mean"]
+        self.components = params["components"]
+        self.explained = float(params["explained"])
+        # ||x_p||^2 + ||x_r||^2 per row, so a scan only needs the dot products
+        self.row_terms = np.load(os.path.join(directory, "pca_residuals.npy")) + np.einsum(
+            "ij,ij->i", self.codes, self.codes
+        )
+
+    def nbytes(self):
+        return self.codes.nbytes + self.row_terms.nbytes + self.mean.nbytes + self.components.nbytes
+
+    def distances(self, queries, sq_norms, start, end):
+        centered = queries - self.mean
+        projected = centered @ self.components.T
+        q_terms = np.einsum("ij,ij->i", centered, centered)
+        return q_terms[:, None] + self.row_terms[None, start:end] - 2.0 * projected @ self.codes[start:end].T
+
+# ---- search -----------------------------------------------------------------
+
+def load_quantizer(directory, name):
+    if name == "int8":
+        return Int8Quantizer(directory)
+    if name == "pq":
+        return PQQuantizer(directory)
+    if name == "pca":
+        return PCAQuantizer(directory)
+    raise ValueError(f"Unknown quantization '{name}' (choose from {', '.join(QUANTIZERS)})")
+
+def build_quantized(directory, vectors, name, pq_subvectors=48, train_sample=50000, pca_dims=64):
+    if name == "int8":
+        build_int8(directory, vectors)
+    elif name == "pq":
+        build_pq(directory, vectors, pq_subvectors, train_sample)
+    elif name == "pca":
+        build_pca(directory, vectors, pca_dims, train_sample)
+    else:
+        raise ValueError(f"Unknown quantization '{name}' (choose from {', '.join(QUANTIZERS)})")
+
+def quantized_top_k(quantizer, vectors, sq_norms, queries, top_k, rescore_factor=4, block_rows=65536):
+    """
+    Scan the codes for top_k * rescore_factor candidates per query, then re-score
+    them with the full-precision vectors
+
+    Returns:
+        tuple: (rows, distances), each (b, k), closest first, exact distances
+    """
+    queries = np.asarray(queries, dtype=np.float32)
+    n = len(sq_norms)
+    candidates = min(n, max(top_k, top_k * rescore_factor))
+    if candidates == 0:
+        empty = np.zeros((len(queries), 0))
+        return empty.astype(np.int64), empty.astype(np.float32)
+
+    best_rows = np.zeros((len(queries), 0), dtype=np.int64)
+    best_dist = np.zeros((len(queries), 0), dtype=np.float32)
+    for start, end in _blocks(n, block_rows):
+        dist = quantizer.distances(queries, sq_norms, start, end)
+        cand_dist = np.concatenate([best_dist, dist], axis=1)
+        cand_rows = np.concatenate([best_rows, np.broadcast_to(np.arange(start, end), dist.shape)], axis=1)
+        if cand_dist.shape[1] > candidates:
+            keep = np.argpartition(cand_dist, candidates - 1, axis=1)[:, :candidates]
+            cand_dist = np.take_along_axis(cand_dist, keep, axis=1)
+            cand_rows = np.take_along_axis(cand_rows, keep, axis=1)
+        best_dist, best_rows = cand_dist, cand_rows
+
+    rows = np.zeros((len(queries), min(top_k, n)), dtype=np.int64)
+    distances = np.zeros(rows.shape, dtype=np.float32)
+    for q, query in enumerate(queries):
+        subset = np.sort(best_rows[q])
+        found_rows, found_dist = top_k_l2(vectors, sq_norms, query[None, :], top_k, rows=subset)
+        rows[q], distances[q] = found_rows[0], found_dist[0]
+    return rows, distances
@@ -0,0 +1,188 @@
+"""
+Query Caches
+In-process caches used by the retriever
+"""
+
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+
+class LRUCache:
+    """
+    Thread-safe LRU cache with an optional time-to-live and hit/miss counters
+    """
+
+    def __init__(self, maxsize=1024, ttl=None):
+        """
+        Args:
+            maxsize (int): Maximum number of entries (least recently used evicted first)
+            ttl (float): Seconds an entry stays valid (None = no expiry)
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                value, stored_at = entry
+                if self.ttl is None or time.monotonic() - stored_at <= self.ttl:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = (value, time.monotonic())
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": self.hits / total if total else 0.0,
+        }
+
+class SemanticCache:
+    """
+    Thread-safe LRU cache looked up by query embedding instead of exact key
+
+    Entries are grouped by a key (index version, top_k, threshold, filters);
+    a lookup returns the value stored under the same key whose embedding is
+    nearest to the query, if its cosine distance is within `radius`. The
+    embeddings live in one preallocated matrix, so a lookup is a single
+    matrix-vector product over the entries sharing the key.
+    """
+
+    def __init__(self, maxsize=1024, radius=0.05, ttl=None):
+        """
+        Args:
+            maxsize (int): Maximum number of entries (least recently used evicted first)
+            radius (float): Maximum cosine distance (1 - cosine similarity) for a hit
+            ttl (float): Seconds an entry stays valid (None = no expiry)
+        """
+        self.maxsize = maxsize
+        self.radius = radius
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.audits = 0
+        self.audit_recall_sum = 0.0
+        self._vectors = None
+        self._keys = [None] * maxsize
+        self._values = [None] * maxsize
+        self._stored_at = [0.0] * maxsize
+        self._slots = {}  # key -> set of slots
+        self._lru = OrderedDict()  # slot -> None, least recently used first
+        self._free = list(range(maxsize - 1, -1, -1))
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _unit(embedding):
+        embedding = np.asarray(embedding, dtype=np.float32).ravel()
+        return embedding / max(float(np.linalg.norm(embedding)), 1e-12)
+
+    def get(self, key, embedding, default=None):
+        """
+        Value of the nearest cached embedding under `key` within the radius
+
+        Returns:
+            tuple: (value, cosine distance), or (default, None) on a miss
+        """
+        with self._lock:
+            slots = list(self._slots.get(key, ()))
+            if slots:
+                similarities = self._vectors[slots] @ self._unit(embedding)
+                best = int(np.argmax(similarities))
+                slot, distance = slots[best], 1.0 - float(similarities[best])
+                if distance <= self.radius:
+                    if self.ttl is None or time.monotonic() - self._stored_at[slot] <= self.ttl:
+                        self._lru.move_to_end(slot)
+                        self.hits += 1
+                        return self._values[slot], max(distance, 0.0)
+                    self._remove(slot)
+            self.misses += 1
+            return default, None
+
+    def put(self, key, embedding, value):
+        if self.maxsize <= 0:
+            return
+        embedding = self._unit(embedding)
+        with self._lock:
+            if self._vectors is None:
+                self._vectors = np.zeros((self.maxsize, len(embedding)), dtype=np.float32)
+            if not self._free:
+                self._remove(next(iter(self._lru)))
+                self.evictions += 1
+            slot = self._free.pop()
+            self._vectors[slot] = embedding
+            self._keys[slot] = key
+            self._values[slot] = value
+            self._stored_at[slot] = time.monotonic()
+            self._slots.setdefault(key, set()).add(slot)
+            self._lru[slot] = None
+
+    def _remove(self, slot):
+        key = self._keys[slot]
+        self._slots[key].discard(slot)
+        if not self._slots[key]:
+            del self._slots[key]
+        self._keys[slot] = self._values[slot] = None
+        del self._lru[slot]
+        self._free.append(slot)
+
+    def record_audit(self, recall):
+        """
+        Record the recall@k of a hit's cached results against a full search
+        """
+        with self._lock:
+            self.audits += 1
+            self.audit_recall_sum += recall
+
+    def clear(self):
+        with self._lock:
+            for slot in list(self._lru):
+                self._remove(slot)
+
+    def __len__(self):
+        return len(self._lru)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "size": len(self._lru),
+            "maxsize": self.maxsize,
+            "radius": self.radius,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": self.hits / total if total else 0.0,
+            "audits": self.audits,
+            "audit_recall": self.audit_recall_sum / self.audits if self.audits else None,
+        }
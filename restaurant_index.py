@@ -0,0 +1,127 @@
+"""
+Restaurant Index
+Per-restaurant aggregates built at ingest time next to the exported vector
+index: one or more centroid embeddings per restaurant plus review counts and
+rating / date stats, for answering "which restaurants are best for X" without
+over-fetching reviews
+
+Files added to the vector index directory:
+    restaurant_index.json          parameters and per-restaurant stats
+    restaurant_centroids.npy       unit-length centroids, grouped by restaurant
+    restaurant_centroid_owner.npy  restaurant number of each centroid
+"""
+
+import json
+import math
+import os
+import numpy as np
+from vector_index import StringTable, VectorIndex
+from metadata_index import MAX_RATING
+from quantization import kmeans
+
+RESTAURANT_MANIFEST = "restaurant_index.json"
+
+def unit_rows(vectors):
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+def restaurant_centroids(vectors, max_centroids, reviews_per_centroid, sample=2000, seed=0):
+    """
+    Centroids of one restaurant's review embeddings: their mean, or for larger
+    restaurants up to max_centroids k-means centres (one per
+    reviews_per_centroid reviews), so distinct topics aren't averaged away
+    """
+    k = max(1, min(max_centroids, math.ceil(len(vectors) / reviews_per_centroid)))
+    vectors = unit_rows(np.asarray(vectors, dtype=np.float32))
+    if k == 1:
+        return unit_rows(vectors.mean(axis=0, keepdims=True))
+    if len(vectors) > sample:
+        vectors = vectors[np.random.default_rng(seed).choice(len(vectors), sample, replace=False)]
+    return unit_rows(kmeans(vectors, k, seed=seed))
+
+def build_restaurant_index(directory, max_centroids=4, reviews_per_centroid=50):
+    """
+    Build centroids and stats from an index directory that already has its
+    metadata index (restaurant posting lists)
+
+    Returns:
+        dict: restaurants and centroids written
+    """
+    index = VectorIndex(directory)
+    names = StringTable(directory, "restaurants")
+    offsets = np.load(os.path.join(directory, "restaurant_offsets.npy"))
+    rows_by_restaurant = np.load(os.path.join(directory, "restaurant_rows.npy"), mmap_mode="r")
+
+    centroids, owners, restaurants = [], [], []
+    for i in range(len(names)):
+        rows = np.asarray(rows_by_restaurant[offsets[i]:offsets[i + 1]])
+        found = restaurant_centroids(index.vectors[rows], max_centroids, reviews_per_centroid, seed=i)
+        centroids.append(found)
+        owners.append(np.full(len(found), i, dtype=np.int32))
+
+        histogram = [0] * MAX_RATING
+        dates = []
+        for row in rows:
+            metadata = json.loads(index.metadata[row])
+            if 1 <= int(metadata.get("rating", 0) or 0) <= MAX_RATING:
+                histogram[int(metadata["rating"]) - 1] += 1
+            if metadata.get("date"):
+                dates.append(metadata["date"])
+        rated = sum(histogram)
+        restaurants.append({
+            "restaurant": names[i],
+            "reviews": len(rows),
+            "rating_mean": round(sum((r + 1) * n for r, n in enumerate(histogram)) / rated, 3) if rated else None,
+            "rating_histogram": histogram,
+            "first_date": min(dates) if dates else None,
+            "last_date": max(dates) if dates else None,
+        })
+
+    dim = index.dim
+    np.save(os.path.join(directory, "restaurant_centroids.npy"),
+            np.concatenate(centroids).astype(np.float32) if centroids else np.zeros((0, dim), dtype=np.float32))
+    np.save(os.path.join(directory, "restaurant_centroid_owner.npy"),
+            np.concatenate(owners) if owners else np.zeros(0, dtype=np.int32))
+    with open(os.path.join(directory, RESTAURANT_MANIFEST), "w", encoding="utf-8") as f:
+        json.dump({
+            "max_centroids": max_centroids,
+            "reviews_per_centroid": reviews_per_centroid,
+            "restaurants": restaurants,
+        }, f)
+
+    return {"restaurants": len(restaurants), "centroids": int(sum(len(c) for c in centroids))}
+
+class RestaurantIndex:
+    """
+    Ranks restaurants by the cosine similarity of a query to their closest centroid
+    """
+
+    def __init__(self, directory):
+        with open(os.path.join(directory, RESTAURANT_MANIFEST), encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        self.restaurants = self.manifest["restaurants"]
+        self.centroids = np.load(os.path.join(directory, "restaurant_centroids.npy"))
+        self.owner = np.load(os.path.join(directory, "restaurant_centroid_owner.npy"))
+
+    def __len__(self):
+        return len(self.restaurants)
+
+    def search(self, query_embedding, top_k, min_reviews=1):
+        """
+        Best restaurants for one query embedding
+
+        Returns:
+            list: Stats dicts of the top restaurants plus 'score', best first
+        """
+        query = unit_rows(np.asarray(query_embedding, dtype=np.float32).reshape(1, -1))[0]
+        best = np.full(len(self.restaurants), -np.inf, dtype=np.float32)
+        np.maximum.at(best, self.owner, self.centroids @ query)
+
+        if min_reviews > 1:
+            best[[stats["reviews"] < min_reviews for stats in self.restaurants]] = -np.inf
+        candidates = np.flatnonzero(np.isfinite(best))
+        k = min(top_k, len(candidates))
+        if k == 0:
+            return []
+        top = candidates[np.argpartition(-best[candidates], k - 1)[:k]]
+        top = top[np.argsort(-best[top], kind="stable")]
+        return [dict(self.restaurants[i], score=round(float(best[i]), 4)) for i in top]
@@ -3,30 +3,269 @@ Retrieval Module
 Handles querying the vector database and returning relevant results
 """
 
-import chromadb
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 import config
+from embedding_cache import cached_encode, get_embedding_cache, normalize_text
+from query_cache import LRUCache, SemanticCache
+from vector_index import VectorIndex, recall_at_k, top_k_l2
+from quantization import load_quantizer, quantized_top_k
+from metadata_index import MetadataIndex, chroma_where, filters_key, normalize_filters
+from lexical_index import LexicalIndex
+from restaurant_index import RestaurantIndex
+from encoders import encoder_id, load_encoder
+from hnsw import collection_settings, hnsw_settings
+from snapshots import snapshot_dir, current_version
+import metrics
+
+SEARCH_MODES = ("vector", "lexical", "hybrid")
 
 class RetrieverError(Exception):
     """Custom exception for retrieval errors"""
     pass
 
+class ChromaBackend:
+    """
+    Search backend: ChromaDB persistent collection (HNSW)
+    """
+    name = "chroma"
+    
+    def __init__(self, index_dir=None):
+        # Imported here: chromadb takes most of a second to import and the
+        # numpy backends don't need it
+        import chromadb
+        self.client = chromadb.PersistentClient(path=config.CHROMA_DIR)
+        self.collection = self.client.get_collection(name=config.COLLECTION_NAME)
+        
+        # Distances are in the space the collection was built with
+        self.space = collection_settings(self.collection)["space"]
+    
+    def search(self, query_embeddings, top_k, filters=None):
+        """
+        Nearest neighbours for each query embedding
+        
+        Filters become a `where` clause, which ChromaDB applies before the
+        vector search.
+        
+        Returns:
+            list: Per query, a list of {'id', 'text', 'distance', 'metadata'}, closest first
+        """
+        results = self.collection.query(
+            query_embeddings=np.asarray(query_embeddings, dtype=np.float32),
+            n_results=top_k,
+            where=chroma_where(filters),
+            include=["documents", "distances", "metadatas"]
+        )
+        
+        all_hits = []
+        for q in range(len(query_embeddings)):
+            hits = []
+            if results and results['documents'] and len(results['documents'][q]) > 0:
+                for i in range(len(results['documents'][q])):
+                    hits.append({
+                        'id': results['ids'][q][i],
+                        'text': results['documents'][q][i],
+                        'distance': results['distances'][q][i],
+                        'metadata': results['metadatas'][q][i] if results['metadatas'] else {}
+                    })
+            all_hits.append(hits)
+        return all_hits
+    
+    def size(self):
+        """
+        Number of stored vectors
+        """
+        return self.collection.count()
+
+class NumpyBackend:
+    """
+    Search backend: exact, vectorized top-k over a memory-mapped index snapshot
+    exported by ingest.py (the current one by default)
+    """
+    name = "numpy"
+    
+    def __init__(self, index_dir=None):
+        self.index_dir = index_dir or snapshot_dir()
+        self.index = VectorIndex(self.index_dir)
+        self.metadata_index = MetadataIndex(self.index_dir)
+        
+        # Rows are ranked by L2, which ranks like cosine / inner product for the
+        # normalized embeddings of the default model; distances are reported
+        # in the space of the collection the snapshot was exported from, so
+        # scores match the ChromaDB backend (snapshots exported before the
+        # space was recorded fall back to the configured one)
+        self.space = self.index.manifest.get("space") or hnsw_settings()["space"]
+    
+    def search(self, query_embeddings, top_k, filters=None):
+        """
+        Nearest neighbours for each query embedding (same format as ChromaBackend)
+        
+        Filters are resolved to candidate rows through the metadata index, and
+        only those rows are scored.
+        """
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        rows, distances = top_k_l2(
+            self.index.vectors,
+            self.index.sq_norms,
+            queries,
+            top_k,
+            block_rows=config.NUMPY_BLOCK_ROWS,
+            rows=self.metadata_index.candidate_rows(filters)
+        )
+        return self.hits(rows, distances, queries)
+    
+    def size(self):
+        return len(self.index)
+    
+    def hits(self, rows, distances, queries):
+        distances = self.to_space(rows, distances, queries)
+        return [
+            [self.index.hit(row, distance) for row, distance in zip(query_rows, query_distances)]
+            for query_rows, query_distances in zip(rows, distances)
+        ]
+    
+    def to_space(self, rows, distances, queries):
+        """
+        Convert squared L2 distances to cosine / inner-product distances
+        (1 - similarity, as ChromaDB reports them)
+        """
+        if self.space == "l2" or not np.size(rows):
+            return distances
+        q_sq = np.einsum("ij,ij->i", queries, queries)[:, None]
+        x_sq = np.asarray(self.index.sq_norms)[rows]
+        dot = (q_sq + x_sq - distances) / 2
+        if self.space == "ip":
+            return 1 - dot
+        return 1 - dot / np.sqrt(np.maximum(q_sq * x_sq, 1e-24))
+
+class QuantizedBackend(NumpyBackend):
+    """
+    Search backend: scan int8 / PQ codes held in memory, then re-score the top
+    top_k * config.RESCORE_FACTOR candidates with the memory-mapped float32 vectors
+    """
+    name = "quantized"
+    
+    def __init__(self, index_dir=None, quantization=None):
+        self.quantization = quantization or config.QUANTIZATION or "int8"
+        super().__init__(index_dir)
+        self.quantizer = load_quantizer(self.index_dir, self.quantization)
+    
+    def search(self, query_embeddings, top_k, filters=None):
+        # Filtered searches only score the (usually small) candidate set: exact is cheaper
+        if filters:
+            return super().search(query_embeddings, top_k, filters)
+        
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        rows, distances = quantized_top_k(
+            self.quantizer,
+            self.index.vectors,
+            self.index.sq_norms,
+            queries,
+            top_k,
+            rescore_factor=config.RESCORE_FACTOR,
+            block_rows=config.NUMPY_BLOCK_ROWS
+        )
+        return self.hits(rows, distances, queries)
+
+SEARCH_BACKENDS = {
+    "chroma": ChromaBackend,
+    "numpy": NumpyBackend,
+    "quantized": QuantizedBackend,
+}
+
+def create_backend(name=None, index_dir=None):
+    """
+    Instantiate the search backend selected in config.SEARCH_BACKEND
+    (the numpy backends over index_dir, default: the current snapshot)
+    """
+    name = name or config.SEARCH_BACKEND
+    if name not in SEARCH_BACKENDS:
+        raise RetrieverError(f"Unknown search backend '{name}' (choose from {', '.join(SEARCH_BACKENDS)})")
+    return SEARCH_BACKENDS[name](index_dir)
+
+class IndexView:
+    """
+    One version of the index as the retriever serves it: the search backend
+    and (opened on first use) the BM25 and restaurant indexes of one snapshot
+    
+    Requests hold a view for their whole duration. When a newer snapshot is
+    published the retriever switches to a new view, and the old one is closed
+    once its last request has finished.
+    """
+    
+    def __init__(self, version, backend=None):
+        self.version = version
+        self.directory = snapshot_dir(version[1])
+        self.backend = create_backend(backend, self.directory)
+        self.lexical_index = None
+        self.restaurant_index = None
+        self.active = 0
+        self.retired = False
+        self._lock = threading.Lock()
+    
+    def get_lexical_index(self):
+        if self.lexical_index is None:
+            with self._lock:
+                if self.lexical_index is None:
+                    self.lexical_index = LexicalIndex(self.directory)
+        return self.lexical_index
+    
+    def get_restaurant_index(self):
+        if self.restaurant_index is None:
+            with self._lock:
+                if self.restaurant_index is None:
+                    self.restaurant_index = RestaurantIndex(self.directory)
+        return self.restaurant_index
+    
+    def close(self):
+        """
+        Drop the backend and its side indexes so their memory maps are released
+        """
+        self.backend = None
+        self.lexical_index = None
+        self.restaurant_index = None
+
 class Retriever:
-    def __init__(self):
+    def __init__(self, backend=None):
         """
-        Initialize the retriever with ChromaDB
+        Initialize the retriever with the configured search backend
         """
         try:
-            self.client = chromadb.PersistentClient(path=config.CHROMA_DIR)
-            self.collection = self.client.get_collection(name=config.COLLECTION_NAME)
+            # The index version being served; swapped when ingest publishes a new one
+            self.backend_name = backend
+            self.view = IndexView(read_index_version(), backend)
+            self.draining = set()
+            self.failed_version = None
+            self.next_version_check = time.monotonic() + config.INDEX_CHECK_INTERVAL
+            self._view_lock = threading.Lock()
+            self._swap_lock = threading.Lock()
+            
+            # Query encoder (config.ENCODER_BACKEND), loaded once per process
+            self.model = load_model()
+            
+            # Persistent embedding cache (None if disabled); shared with ingest.py
+            # when both use the PyTorch model, separate for the ONNX encoders
+            self.embedding_cache = get_embedding_cache(encoder_id())
+            
+            # In-process caches: normalized query -> embedding, search key -> results
+            self.query_cache = LRUCache(config.QUERY_CACHE_SIZE, config.QUERY_CACHE_TTL)
+            self.result_cache = LRUCache(config.RESULT_CACHE_SIZE, config.RESULT_CACHE_TTL)
             
-            # Load local embedding model
-            from sentence_transformers import SentenceTransformer
-            self.model = SentenceTransformer('all-MiniLM-L6-v2')
+            # Vector-search results of recent queries, reused for near-identical ones
+            self.semantic_cache = SemanticCache(
+                config.SEMANTIC_CACHE_SIZE, config.SEMANTIC_CACHE_RADIUS, config.SEMANTIC_CACHE_TTL
+            ) if config.SEMANTIC_CACHE else None
+            
+            # Threads that run the vector leg of hybrid searches
+            self.hybrid_pool = ThreadPoolExecutor(config.HYBRID_THREADS, thread_name_prefix="hybrid")
             
         except Exception as e:
             raise RetrieverError(f"Failed to initialize retriever: {e}")
     
-    def retrieve(self, query, top_k=None, threshold=None):
+    def retrieve(self, query, top_k=None, threshold=None, filters=None, mode=None, timings=None):
         """
         Retrieve relevant documents for a query
         
@@ -34,66 +273,553 @@ class Retriever:
             query (str): User query
             top_k (int): Number of results to return (default: from config)
             threshold (float): Minimum similarity score (default: from config)
+            filters (dict): Optional restaurant / rating_min / rating_max /
+                date_from / date_to filters, applied before vector scoring
+            mode (str): "vector", "lexical" or "hybrid" (default: config.SEARCH_MODE)
+            timings (dict): If given, filled with per-stage milliseconds
         
         Returns:
             list: List of dicts with 'id', 'text', 'score', 'metadata'
+                (lexical / hybrid results also carry 'vector_score' and 'bm25')
         """
         if not query or not query.strip():
             raise RetrieverError("Query cannot be empty")
         
+        return self.retrieve_many([query], top_k, threshold, filters, mode, timings)[0]
+    
+    def retrieve_many(self, queries, top_k=None, threshold=None, filters=None, mode=None, timings=None):
+        """
+        Retrieve relevant documents for several queries at once
+        
+        All uncached queries are encoded in one forward pass and searched in
+        one vectorized backend call.
+        
+        Args:
+            queries (list): User queries
+            top_k (int): Number of results per query (default: from config)
+            threshold (float): Minimum similarity score (default: from config)
+            filters (dict): Metadata filters shared by all queries (see retrieve())
+            mode (str): "vector", "lexical" or "hybrid" (default: config.SEARCH_MODE)
+            timings (dict): If given, filled with per-stage milliseconds
+                (encode_ms, vector_ms = search_ms + format_ms, lexical_ms,
+                fusion_ms, total_ms)
+        
+        Returns:
+            list: One result list per query, each in the format of retrieve()
+        """
+        for i, query in enumerate(queries):
+            if not isinstance(query, str) or not query.strip():
+                raise RetrieverError(f"Query {i} cannot be empty")
+        
         top_k = top_k or config.TOP_K
         threshold = threshold if threshold is not None else config.SIMILARITY_THRESHOLD
         
+        mode = mode or config.SEARCH_MODE
+        if mode not in SEARCH_MODES:
+            raise RetrieverError(f"Unknown search mode '{mode}' (choose from {', '.join(SEARCH_MODES)})")
+        
         try:
-            # Create query embedding using local model
-            query_embedding = self.model.encode([query.strip()])[0].tolist()
+            filters = normalize_filters(filters)
+        except ValueError as e:
+            raise RetrieverError(f"Invalid filters: {e}")
+        
+        timings = {} if timings is None else timings
+        started = time.perf_counter()
+        view = None
+        try:
+            self.check_index_version()
+            view = self.acquire_view()
+            if mode == "vector":
+                all_results = self.retrieve_vector(view, queries, top_k, threshold, filters, timings)
+            else:
+                all_results = self.retrieve_fused(view, queries, top_k, threshold, filters, mode, timings)
+            timings["total_ms"] = elapsed_ms(started)
+        
+        except Exception as e:
+            metrics.RETRIEVE_ERRORS.inc(mode=mode)
+            raise RetrieverError(f"Retrieval failed: {e}")
+        finally:
+            if view is not None:
+                self.release_view(view)
+        
+        metrics.record_retrieval(mode, len(queries), timings)
+        metrics.slow_queries.maybe_record(queries, mode, top_k, filters, timings)
+        return all_results
+    
+    def retrieve_restaurants(self, query, top_k=None, reviews=None, min_reviews=1, timings=None):
+        """
+        Best restaurants for a query, each with a few supporting reviews
+        
+        Restaurants are ranked by the query's similarity to their closest
+        centroid (see restaurant_index.py); only then are reviews searched,
+        restricted to each of the top restaurants.
+        
+        Args:
+            query (str): User query
+            top_k (int): Restaurants to return (default: config.RESTAURANT_TOP_K)
+            reviews (int): Supporting reviews per restaurant (default: config.RESTAURANT_REVIEWS)
+            min_reviews (int): Skip restaurants with fewer reviews than this
+            timings (dict): If given, filled with per-stage milliseconds
+        
+        Returns:
+            list: Dicts with 'restaurant', 'score', 'reviews', 'rating_mean',
+                'rating_histogram', 'first_date', 'last_date' and
+                'supporting_reviews' (results in the format of retrieve())
+        """
+        if not isinstance(query, str) or not query.strip():
+            raise RetrieverError("Query cannot be empty")
+        
+        top_k = top_k or config.RESTAURANT_TOP_K
+        reviews = config.RESTAURANT_REVIEWS if reviews is None else reviews
+        
+        timings = {} if timings is None else timings
+        started = time.perf_counter()
+        view = None
+        try:
+            self.check_index_version()
+            view = self.acquire_view()
             
-            # Query ChromaDB
-            results = self.collection.query(
-                query_embeddings=[query_embedding],
-                n_results=top_k,
-                include=["documents", "distances", "metadatas"]
-            )
+            cache_key = (view.version, "restaurants", normalize_text(query), top_k, reviews, min_reviews)
+            cached = self.result_cache.get(cache_key)
+            if cached is not None:
+                timings["total_ms"] = elapsed_ms(started)
+                return [dict(r, supporting_reviews=copy_results(r["supporting_reviews"])) for r in cached]
+            
+            stage = time.perf_counter()
+            query_embedding = self.embed_queries([query])[0]
+            timings["encode_ms"] = elapsed_ms(stage)
             
-            # Format results
-            formatted_results = []
+            stage = time.perf_counter()
+            restaurants = view.get_restaurant_index().search(query_embedding, top_k, min_reviews)
+            timings["restaurants_ms"] = elapsed_ms(stage)
             
-            if results and results['documents'] and len(results['documents'][0]) > 0:
-                for i in range(len(results['documents'][0])):
-                    # Convert distance to similarity score
-                    distance = results['distances'][0][i]
-                    similarity = 1 / (1 + distance)
-                    
-                    # Apply threshold
-                    if similarity >= threshold:
-                        formatted_results.append({
-                            'id': results['ids'][0][i],
-                            'text': results['documents'][0][i],
-                            'score': round(similarity, 4),
-                            'distance': round(distance, 4),
-                            'metadata': results['metadatas'][0][i] if results['metadatas'] else {}
-                        })
+            stage = time.perf_counter()
+            for restaurant in restaurants:
+                restaurant["supporting_reviews"] = []
+                if reviews:
+                    hits = view.backend.search([query_embedding], reviews, {"restaurant": restaurant["restaurant"]})[0]
+                    restaurant["supporting_reviews"] = format_results(hits, 0.0, view.backend.space)
+            timings["reviews_ms"] = elapsed_ms(stage)
             
-            return formatted_results
+            self.result_cache.put(cache_key, [
+                dict(r, supporting_reviews=copy_results(r["supporting_reviews"])) for r in restaurants
+            ])
+            timings["total_ms"] = elapsed_ms(started)
         
         except Exception as e:
-            raise RetrieverError(f"Retrieval failed: {e}")
+            metrics.RETRIEVE_ERRORS.inc(mode="restaurants")
+            raise RetrieverError(f"Restaurant retrieval failed: {e}")
+        finally:
+            if view is not None:
+                self.release_view(view)
+        
+        metrics.record_retrieval("restaurants", 1, timings)
+        metrics.slow_queries.maybe_record([query], "restaurants", top_k, None, timings)
+        return restaurants
+    
+    def retrieve_vector(self, view, queries, top_k, threshold, filters, timings):
+        """
+        Vector-only search, with results cached per (index version, embedding,
+        top_k, threshold, filters)
+        
+        With config.SEMANTIC_CACHE, a query missing that exact cache reuses the
+        results of an earlier query whose embedding is within
+        config.SEMANTIC_CACHE_RADIUS (same top_k, threshold and filters). A
+        config.SEMANTIC_CACHE_AUDIT_RATE fraction of those hits is searched in
+        full anyway, recording the cached results' recall@k and returning the
+        fresh ones.
+        """
+        started = time.perf_counter()
+        query_embeddings = self.embed_queries(queries)
+        timings["encode_ms"] = elapsed_ms(started)
+        
+        # Identical (or, with the semantic cache, near-identical) searches already answered?
+        all_results = [None] * len(queries)
+        semantic_key = (view.version, top_k, threshold, filters_key(filters))
+        cache_keys = [(view.version, e.tobytes(), top_k, threshold, filters_key(filters)) for e in query_embeddings]
+        pending = {}
+        audited = {}
+        for i, cache_key in enumerate(cache_keys):
+            cached = self.result_cache.get(cache_key)
+            if cached is None and self.semantic_cache is not None and cache_key not in pending:
+                cached, _ = self.semantic_cache.get(semantic_key, query_embeddings[i])
+                if cached is not None and random.random() < config.SEMANTIC_CACHE_AUDIT_RATE:
+                    audited[cache_key] = cached
+                    cached = None
+            if cached is not None:
+                all_results[i] = copy_results(cached)
+            else:
+                pending.setdefault(cache_key, []).append(i)
+        
+        started = time.perf_counter()
+        if pending:
+            positions = list(pending.values())
+            searched = self.search_many(
+                [query_embeddings[p[0]] for p in positions], top_k, threshold, filters, timings, view
+            )
+            for cache_key, same_queries, formatted_results in zip(pending, positions, searched):
+                self.result_cache.put(cache_key, copy_results(formatted_results))
+                if self.semantic_cache is not None:
+                    self.semantic_cache.put(semantic_key, query_embeddings[same_queries[0]], copy_results(formatted_results))
+                if cache_key in audited:
+                    self.audit_semantic_hit(audited[cache_key], formatted_results)
+                for i in same_queries:
+                    all_results[i] = copy_results(formatted_results)
+        timings["vector_ms"] = elapsed_ms(started)
+        
+        return all_results
+    
+    def retrieve_fused(self, view, queries, top_k, threshold, filters, mode, timings):
+        """
+        Lexical-only or hybrid search
+        
+        In hybrid mode the vector leg (encode + search, threshold applied) runs
+        on the hybrid pool while BM25 runs on the calling thread; both legs
+        over-fetch top_k * config.HYBRID_CANDIDATES hits, which are merged by
+        reciprocal-rank fusion. Results are cached per normalized query text.
+        """
+        all_results = [None] * len(queries)
+        pending = {}
+        for i, query in enumerate(queries):
+            cache_key = (view.version, mode, normalize_text(query), top_k, threshold, filters_key(filters))
+            cached = self.result_cache.get(cache_key)
+            if cached is not None:
+                all_results[i] = copy_results(cached)
+            else:
+                pending.setdefault(cache_key, []).append(i)
+        
+        if not pending:
+            return all_results
+        
+        texts = [queries[p[0]].strip() for p in pending.values()]
+        candidates = top_k * config.HYBRID_CANDIDATES
+        
+        vector_leg = None
+        if mode == "hybrid":
+            vector_leg = self.hybrid_pool.submit(
+                self.vector_candidates, view, texts, candidates, threshold, filters, timings
+            )
+        
+        started = time.perf_counter()
+        lexical_index = view.get_lexical_index()
+        lexical_hits = [lexical_index.search(text, candidates, filters) for text in texts]
+        timings["lexical_ms"] = elapsed_ms(started)
+        
+        vector_results = vector_leg.result() if vector_leg else [[] for _ in texts]
+        
+        started = time.perf_counter()
+        legs = 2 if mode == "hybrid" else 1
+        for cache_key, same_queries, vector_hits, lexical in zip(pending, pending.values(), vector_results, lexical_hits):
+            fused = fuse_results(vector_hits, lexical, top_k, config.RRF_K, legs)
+            self.result_cache.put(cache_key, copy_results(fused))
+            for i in same_queries:
+                all_results[i] = copy_results(fused)
+        timings["fusion_ms"] = elapsed_ms(started)
+        
+        return all_results
+    
+    def audit_semantic_hit(self, cached, fresh):
+        """
+        Record the recall@k of a semantic cache hit against the full search
+        """
+        recall = recall_at_k([[r['id'] for r in cached]], [[r['id'] for r in fresh]]) if fresh else 1.0
+        self.semantic_cache.record_audit(recall)
+        metrics.SEMANTIC_CACHE_RECALL.observe(recall)
+    
+    def vector_candidates(self, view, texts, top_k, threshold, filters, timings):
+        """
+        Vector leg of a hybrid search
+        """
+        started = time.perf_counter()
+        query_embeddings = self.embed_queries(texts)
+        timings["encode_ms"] = elapsed_ms(started)
+        
+        started = time.perf_counter()
+        results = self.search_many(query_embeddings, top_k, threshold, filters, timings, view)
+        timings["vector_ms"] = elapsed_ms(started)
+        return results
+    
+    @property
+    def backend(self):
+        """
+        Search backend of the index version currently served
+        """
+        return self.view.backend
+    
+    def get_lexical_index(self):
+        """
+        BM25 index of the current snapshot (opened on first use)
+        """
+        return self.view.get_lexical_index()
+    
+    def embed_queries(self, queries):
+        """
+        Embed queries via the in-process LRU and the persistent embedding cache,
+        encoding all remaining ones in a single batch
+        """
+        keys = [normalize_text(q) for q in queries]
+        query_embeddings = [self.query_cache.get(key) for key in keys]
+        
+        missing = {}
+        for i, embedding in enumerate(query_embeddings):
+            if embedding is None:
+                missing.setdefault(keys[i], []).append(i)
+        
+        if missing:
+            texts = [queries[positions[0]].strip() for positions in missing.values()]
+            encoded = cached_encode(self.embedding_cache, texts, self.model.encode)
+            for key, positions, embedding in zip(missing, missing.values(), encoded):
+                self.query_cache.put(key, embedding)
+                for i in positions:
+                    query_embeddings[i] = embedding
+        
+        return query_embeddings
+    
+    def search_many(self, query_embeddings, top_k, threshold, filters=None, timings=None, view=None):
+        """
+        Search the backend with several embeddings in one call and format the results
+        (timings, if given, gets search_ms and format_ms)
+        """
+        backend = (view or self.view).backend
+        started = time.perf_counter()
+        all_hits = backend.search(query_embeddings, top_k, filters)
+        searched = time.perf_counter()
+        formatted = [format_results(hits, threshold, backend.space) for hits in all_hits]
+        if timings is not None:
+            timings["search_ms"] = round(1000 * (searched - started), 3)
+            timings["format_ms"] = elapsed_ms(searched)
+        return formatted
+    
+    def check_index_version(self, force=False):
+        """
+        Swap to the newest index when ingest.py (or a rollback) has published one
+        
+        The new view is opened before the swap, so requests never wait on it;
+        if it can't be opened the current one keeps serving. Query embeddings
+        are kept: they depend only on the model, not the index.
+        
+        The version files are read at most once per config.INDEX_CHECK_INTERVAL
+        seconds (unless force=True), not on every request.
+        """
+        now = time.monotonic()
+        if not force and now < self.next_version_check:
+            return
+        self.next_version_check = now + config.INDEX_CHECK_INTERVAL
+        
+        version = read_index_version()
+        if version == self.view.version or version == self.failed_version:
+            return
+        
+        with self._swap_lock:
+            if version == self.view.version:
+                return
+            try:
+                view = IndexView(version, self.backend_name)
+            except Exception as e:
+                self.failed_version = version
+                print(f"❌ Could not open index {version[1] or version[0]}: {e}; "
+                      f"still serving {self.view.version[1] or self.view.version[0]}")
+                return
+            self.swap_view(view)
+    
+    def swap_view(self, view):
+        """
+        Make `view` current; the previous view stays open until it drains
+        """
+        with self._view_lock:
+            old, self.view = self.view, view
+            old.retired = True
+            if old.active:
+                self.draining.add(old)
+            else:
+                old.close()
+        self.failed_version = None
+        self.result_cache.clear()
+        if self.semantic_cache is not None:
+            self.semantic_cache.clear()
+    
+    def acquire_view(self):
+        with self._view_lock:
+            view = self.view
+            view.active += 1
+        return view
+    
+    def release_view(self, view):
+        with self._view_lock:
+            view.active -= 1
+            if view.retired and not view.active:
+                self.draining.discard(view)
+                view.close()
+    
+    def index_stats(self):
+        """
+        Index version being served and older versions still finishing requests
+        """
+        with self._view_lock:
+            return {
+                "marker": self.view.version[0],
+                "snapshot": self.view.version[1],
+                "active_requests": self.view.active,
+                "draining": [{"snapshot": v.version[1], "active_requests": v.active} for v in self.draining],
+            }
+    
+    def cache_stats(self):
+        """
+        Hit/miss counters for the in-process caches
+        """
+        stats = {
+            "query_embeddings": self.query_cache.stats(),
+            "results": self.result_cache.stats(),
+        }
+        if self.semantic_cache is not None:
+            stats["semantic"] = self.semantic_cache.stats()
+        return stats
+
+def read_index_version():
+    """
+    Version of the index to serve: the marker ingest.py writes after every
+    successful ingest, and the current snapshot
+    """
+    try:
+        with open(config.INDEX_VERSION_FILE, encoding="utf-8") as f:
+            marker = f.read().strip()
+    except OSError:
+        marker = None
+    return marker, current_version()
+
+def similarity_score(distance, space="l2"):
+    """
+    Similarity in [0, 1] (for normalized embeddings) from a backend distance
+    
+    Cosine and inner-product distances are 1 - similarity, so the threshold is
+    a plain cosine similarity; L2 keeps the original 1 / (1 + distance).
+    """
+    if space == "l2":
+        return 1 / (1 + distance)
+    return 1 - distance
+
+def format_results(hits, threshold, space="l2"):
+    """
+    Turn backend hits into result dicts, dropping those below the threshold
+    """
+    formatted_results = []
+    
+    for hit in hits:
+        # Convert distance to similarity score
+        distance = hit['distance']
+        similarity = similarity_score(distance, space)
+        
+        # Apply threshold
+        if similarity >= threshold:
+            formatted_results.append({
+                'id': hit['id'],
+                'text': hit['text'],
+                'score': round(similarity, 4),
+                'distance': round(distance, 4),
+                'metadata': hit['metadata'] or {}
+            })
+    
+    return formatted_results
+
+def fuse_results(vector_results, lexical_hits, top_k, rrf_k, legs=2):
+    """
+    Reciprocal-rank fusion of formatted vector results and BM25 hits
+    
+    Each document scores sum(1 / (rrf_k + rank)) over the lists it appears in;
+    'score' is that sum scaled so a document ranked first by every leg gets 1.0.
+    """
+    fused = {}
+    for rank, result in enumerate(vector_results, 1):
+        entry = fused.setdefault(result['id'], {
+            'id': result['id'], 'text': result['text'], 'metadata': result['metadata'],
+            'rrf': 0.0, 'distance': None, 'vector_score': None, 'bm25': None
+        })
+        entry['rrf'] += 1 / (rrf_k + rank)
+        entry['distance'] = result['distance']
+        entry['vector_score'] = result['score']
+    
+    for rank, hit in enumerate(lexical_hits, 1):
+        entry = fused.setdefault(hit['id'], {
+            'id': hit['id'], 'text': hit['text'], 'metadata': hit['metadata'] or {},
+            'rrf': 0.0, 'distance': None, 'vector_score': None, 'bm25': None
+        })
+        entry['rrf'] += 1 / (rrf_k + rank)
+        entry['bm25'] = round(hit['bm25'], 4)
+    
+    ranked = sorted(fused.values(), key=lambda entry: -entry['rrf'])[:top_k]
+    return [{
+        'id': entry['id'],
+        'text': entry['text'],
+        'score': round(entry.pop('rrf') * (rrf_k + 1) / legs, 4),
+        'distance': entry['distance'],
+        'metadata': entry['metadata'],
+        'vector_score': entry['vector_score'],
+        'bm25': entry['bm25']
+    } for entry in ranked]
+
+def elapsed_ms(started):
+    return round(1000 * (time.perf_counter() - started), 3)
+
+def copy_results(results):
+    """
+    Copy result dicts so callers can't mutate cached entries
+    """
+    return [dict(r, metadata=dict(r['metadata'] or {})) for r in results]
 
-# Singleton instance
+# Shared model and singleton instance
+_model = None
+_model_lock = threading.Lock()
 _retriever = None
+_retriever_lock = threading.Lock()
+
+def load_model():
+    """
+    Load the query encoder once per process
+    
+    serve.py calls this before forking so every worker shares the weights
+    copy-on-write instead of loading its own copy.
+    """
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                _model = load_encoder()
+    return _model
 
 def get_retriever():
     """
-    Get or create retriever instance
+    Get or create retriever instance (safe to call from concurrent requests)
     """
     global _retriever
     if _retriever is None:
-        _retriever = Retriever()
+        with _retriever_lock:
+            if _retriever is None:
+                _retriever = Retriever()
     return _retriever
 
-def retrieve(query, top_k=None, threshold=None):
+def loaded_retriever():
+    """
+    The retriever if it has been created, else None (never loads the model)
+    """
+    return _retriever
+
+def retrieve(query, top_k=None, threshold=None, filters=None, mode=None, timings=None):
     """
     Convenience function for retrieval
     """
     retriever = get_retriever()
-    return retriever.retrieve(query, top_k, threshold)
\ No newline at end of file
+    return retriever.retrieve(query, top_k, threshold, filters, mode, timings)
+
+def retrieve_restaurants(query, top_k=None, reviews=None, min_reviews=1, timings=None):
+    """
+    Convenience function for restaurant-level retrieval
+    """
+    retriever = get_retriever()
+    return retriever.retrieve_restaurants(query, top_k, reviews, min_reviews, timings)
+
+def retrieve_many(queries, top_k=None, threshold=None, filters=None, mode=None, timings=None):
+    """
+    Convenience function for batched retrieval
+    """
+    retriever = get_retriever()
+    return retriever.retrieve_many(queries, top_k, threshold, filters, mode, timings)
@@ -0,0 +1,111 @@
+"""
+Production Server
+Runs app.py under gunicorn with pre-forked workers instead of Flask's
+single-process development server
+
+The master process loads the embedding model (and, for the numpy and
+quantized backends, the exported index) before forking, so workers share
+those pages copy-on-write. Each worker then pins torch to its share of the
+CPUs and opens its own ChromaDB client: the client is not fork-safe.
+
+Usage:
+    python serve.py [--workers N] [--threads N] [--bind HOST:PORT]
+"""
+
+import argparse
+import os
+import config
+
+# The tokenizer's thread pool must not be started before the fork
+os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+
+def torch_threads_per_worker(workers):
+    """
+    Intra-op threads per worker, so that all workers together use each core once
+    """
+    return config.TORCH_THREADS_PER_WORKER or max(1, (os.cpu_count() or 1) // workers)
+
+def preload():
+    """
+    Load everything that is safe to share across fork (runs once, in the master)
+
+    No forward pass happens here: torch's thread pool is created per worker.
+    The ONNX encoder is not preloaded either, since an ONNX Runtime session
+    can't be used across fork; it is small and loads quickly per worker.
+    """
+    from retrieve import get_retriever, load_model
+    from warmup import startup
+
+    if config.ENCODER_BACKEND == "torch":
+        with startup.phase("preload model"):
+            load_model()
+    if config.SEARCH_BACKEND != "chroma" and config.ENCODER_BACKEND == "torch":
+        with startup.phase("preload index"):
+            get_retriever()
+    if startup.phases:
+        print(f"✓ Preloaded {' and '.join(name.split()[-1] for name in startup.phases)} "
+              f"in {sum(startup.phases.values()):.1f}s")
+
+def post_fork(server, worker):
+    """
+    Per-worker setup: pin torch (or ONNX Runtime) threads, then open the search
+    backend and warm up before accepting requests
+    """
+    from warmup import startup
+
+    threads = torch_threads_per_worker(server.cfg.workers)
+    if config.ENCODER_BACKEND == "onnx":
+        config.ONNX_THREADS = config.ONNX_THREADS or threads
+    else:
+        import torch
+        torch.set_num_threads(threads)
+
+    startup.warm_up()
+    server.log.info(f"Worker {worker.pid} {startup.state} ({threads} intra-op threads)")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the retrieval API with pre-forked gunicorn workers")
+    parser.add_argument("--bind", default=config.SERVE_BIND, help="HOST:PORT to listen on")
+    parser.add_argument("--workers", type=int, default=config.SERVE_WORKERS, help="worker processes")
+    parser.add_argument("--threads", type=int, default=config.SERVE_THREADS, help="request threads per worker")
+    parser.add_argument("--timeout", type=int, default=config.SERVE_TIMEOUT, help="worker timeout in seconds")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    from gunicorn.app.base import BaseApplication
+
+    args = parse_args(argv)
+
+    class ServerApplication(BaseApplication):
+        def load_config(self):
+            settings = {
+                "bind": args.bind,
+                "workers": args.workers,
+                "threads": args.threads,
+                "worker_class": "gthread",
+                "timeout": args.timeout,
+                "preload_app": True,
+                "post_fork": post_fork,
+            }
+            for key, value in settings.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            # With preload_app this runs in the master, before any worker is forked
+            preload()
+            from app import app
+            return app
+
+    print("\n" + "="*50)
+    print("🚀 Starting production server")
+    print("="*50)
+    print(f"🌐 Bind: {args.bind}")
+    print(f"👷 Workers: {args.workers} x {args.threads} threads, "
+          f"{torch_threads_per_worker(args.workers)} torch threads each")
+    print(f"🔍 Backend: {config.SEARCH_BACKEND}")
+    print("="*50 + "\n")
+
+    ServerApplication().run()
+
+if __name__ == "__main__":
+    main()
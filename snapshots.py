@@ -0,0 +1,189 @@
+"""
+Index Snapshots
+Immutable, versioned copies of the exported index under
+config.VECTOR_INDEX_DIR, and the CURRENT pointer that selects one:
+
+    vector_index/
+        CURRENT                          name of the snapshot being served
+        20261017T101500.482913-3f2a9c/   vectors, texts, metadata, filter / BM25 / quantized indexes
+        20261017T093012.077215-b71d04/   previous snapshots, kept for rollback
+
+A snapshot is written to a staging directory and renamed into place only
+when complete; CURRENT is then replaced atomically. Running retrievers
+notice the new pointer and swap to it (see retrieve.py); rolling back is
+just pointing CURRENT at an older snapshot.
+
+Usage:
+    python snapshots.py list
+    python snapshots.py rollback [VERSION]
+    python snapshots.py prune [--keep N]
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import time
+import uuid
+import config
+from vector_index import MANIFEST
+
+CURRENT = "CURRENT"
+STAGING_PREFIX = ".staging-"
+
+def snapshot_root(root=None):
+    return root or config.VECTOR_INDEX_DIR
+
+def new_snapshot(root=None):
+    """
+    Reserve a version name and an empty staging directory to write it into
+
+    Returns:
+        tuple: (version, staging directory)
+    """
+    root = snapshot_root(root)
+    now = time.time()
+    stamp = time.strftime("%Y%m%dT%H%M%S", time.localtime(now))
+    version = f"{stamp}.{int(now * 1e6) % 1000000:06d}-{uuid.uuid4().hex[:6]}"
+    staging = os.path.join(root, STAGING_PREFIX + version)
+    os.makedirs(staging)
+    return version, staging
+
+def publish_snapshot(staging, version, root=None, keep=None):
+    """
+    Make a fully written staging directory the current snapshot
+
+    Files are flushed to disk before the directory is renamed into place, and
+    the rename happens before CURRENT moves, so readers only ever see complete
+    snapshots. Older snapshots beyond `keep` are then removed, except the one
+    CURRENT pointed at until now: processes may still be draining it or not
+    have swapped yet, and open its BM25 / restaurant indexes lazily. It goes
+    at the next publish.
+    """
+    root = snapshot_root(root)
+    previous = current_version(root)
+    for directory, _, files in os.walk(staging):
+        for name in files:
+            fd = os.open(os.path.join(directory, name), os.O_RDONLY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+    os.replace(staging, os.path.join(root, version))
+    set_current(version, root)
+    prune_snapshots(config.SNAPSHOT_KEEP if keep is None else keep, root, protect=[previous])
+
+def set_current(version, root=None):
+    """
+    Atomically point CURRENT at a snapshot
+    """
+    root = snapshot_root(root)
+    if not os.path.exists(os.path.join(root, version, MANIFEST)):
+        raise ValueError(f"No snapshot '{version}' in {root}")
+    tmp_path = os.path.join(root, f"{CURRENT}.tmp-{os.getpid()}")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(version)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, os.path.join(root, CURRENT))
+
+def current_version(root=None):
+    """
+    Name of the snapshot CURRENT points at, or None
+    """
+    try:
+        with open(os.path.join(snapshot_root(root), CURRENT), encoding="utf-8") as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+def snapshot_dir(version=None, root=None):
+    """
+    Directory of a snapshot (default: the current one)
+
+    Without any snapshot this is the root itself, the layout ingest.py
+    wrote before snapshots existed.
+    """
+    root = snapshot_root(root)
+    version = version or current_version(root)
+    return os.path.join(root, version) if version else root
+
+def list_snapshots(root=None):
+    """
+    Complete snapshots, oldest first (names start with their creation time)
+    """
+    root = snapshot_root(root)
+    if not os.path.isdir(root):
+        return []
+    return sorted(
+        name for name in os.listdir(root)
+        if not name.startswith(".") and os.path.exists(os.path.join(root, name, MANIFEST))
+    )
+
+def rollback(version=None, root=None):
+    """
+    Point CURRENT at `version`, or at the snapshot before the current one
+
+    Returns:
+        str: The version now current
+    """
+    snapshots = list_snapshots(root)
+    if version is None:
+        current = current_version(root)
+        older = [name for name in snapshots if current is None or name < current]
+        if not older:
+            raise ValueError("No older snapshot to roll back to")
+        version = older[-1]
+    set_current(version, root)
+    return version
+
+def prune_snapshots(keep, root=None, protect=()):
+    """
+    Delete the oldest snapshots beyond `keep`, never the current one (nor
+    the versions in `protect`)
+
+    Processes still serving a deleted snapshot keep the files they have
+    already mapped, but can no longer open its lazily loaded side indexes.
+
+    Returns:
+        list: Removed versions
+    """
+    root = snapshot_root(root)
+    current = current_version(root)
+    snapshots = list_snapshots(root)
+    removable = [
+        name for name in snapshots[:max(len(snapshots) - keep, 0)]
+        if name != current and name not in protect
+    ]
+    for name in removable:
+        shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+    return removable
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="List, roll back and prune index snapshots")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("list", help="snapshots, oldest first; * marks the current one")
+    back = commands.add_parser("rollback", help="serve an older snapshot")
+    back.add_argument("version", nargs="?", help="snapshot to serve (default: the one before the current)")
+    prune = commands.add_parser("prune", help="delete old snapshots")
+    prune.add_argument("--keep", type=int, default=config.SNAPSHOT_KEEP)
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    try:
+        if args.command == "list":
+            current = current_version()
+            for name in list_snapshots():
+                print(f"{'*' if name == current else ' '} {name}")
+        elif args.command == "rollback":
+            print(f"✓ Serving snapshot {rollback(args.version)}")
+        else:
+            removed = prune_snapshots(args.keep)
+            print(f"✓ Removed {len(removed)} snapshot(s)")
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
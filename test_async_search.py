@@ -0,0 +1,88 @@
+"""
+Tests for admission control on the async search path
+"""
+
+import asyncio
+import threading
+import pytest
+from async_search import DeadlineExceeded, Saturated, SearchExecutor
+from batcher import QueryBatcher
+
+def test_full_queue_is_rejected_with_retry_after():
+    """Beyond workers + queue limit, requests fail fast instead of waiting"""
+    executor = SearchExecutor(workers=1, max_queue=1, deadline_ms=5000)
+    release = threading.Event()
+
+    async def scenario():
+        running = asyncio.ensure_future(executor.run(release.wait))
+        queued = asyncio.ensure_future(executor.run(lambda: "queued"))
+        await asyncio.sleep(0.05)
+        with pytest.raises(Saturated) as rejected:
+            await executor.run(lambda: "rejected")
+        release.set()
+        return rejected.value, await running, await queued
+
+    rejected, running, queued = asyncio.run(scenario())
+    assert rejected.retry_after >= 1
+    assert (running, queued) == (True, "queued")
+    stats = executor.stats()
+    assert stats["rejected"] == 1 and stats["completed"] == 2 and stats["in_flight"] == 0
+
+def test_deadline_drops_queued_work():
+    """A request that can't start before its deadline times out and its work is skipped"""
+    executor = SearchExecutor(workers=1, max_queue=4, deadline_ms=5000)
+    release = threading.Event()
+    ran = []
+
+    async def scenario():
+        blocker = asyncio.ensure_future(executor.run(release.wait))
+        await asyncio.sleep(0.01)
+        with pytest.raises(DeadlineExceeded):
+            await executor.run(lambda: ran.append(1), deadline_ms=50)
+        release.set()
+        await blocker
+
+    asyncio.run(scenario())
+    assert ran == []
+    assert executor.stats()["timed_out"] == 1
+
+class EchoRetriever:
+    def __init__(self):
+        self.batches = []
+
+    def retrieve_many(self, queries, top_k=None, threshold=None, filters=None, mode=None):
+        self.batches.append(len(queries))
+        return [[q] for q in queries]
+
+def test_batched_requests_do_not_hold_pool_threads():
+    """Awaiting batcher futures lets more requests than threads share one batch"""
+    executor = SearchExecutor(workers=1, max_queue=0, deadline_ms=5000)
+    retriever = EchoRetriever()
+    batcher = QueryBatcher(window_ms=200, max_batch=8, retriever_factory=lambda: retriever)
+
+    async def scenario():
+        return await asyncio.gather(*(
+            executor.run_future(batcher.submit, f"q{i}", concurrency=8) for i in range(8)
+        ))
+
+    assert asyncio.run(scenario()) == [[f"q{i}"] for i in range(8)]
+    assert retriever.batches == [8]
+    assert executor.stats()["in_flight"] == 0 and executor.stats()["completed"] == 8
+
+def test_timed_out_batched_request_is_skipped():
+    """A query whose deadline passes while it waits for its batch is never searched"""
+    executor = SearchExecutor(workers=1, max_queue=4, deadline_ms=5000)
+    retriever = EchoRetriever()
+    batcher = QueryBatcher(window_ms=300, max_batch=8, retriever_factory=lambda: retriever)
+
+    async def scenario():
+        with pytest.raises(DeadlineExceeded):
+            await executor.run_future(batcher.submit, "late", deadline_ms=50)
+        return await executor.run_future(batcher.submit, "on time")
+
+    assert asyncio.run(scenario()) == ["on time"]
+    assert retriever.batches == [1]
+    assert executor.stats()["timed_out"] == 1
+
+if __name__ == "__main__":
+    pytest.main([__file__])
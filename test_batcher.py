@@ -0,0 +1,38 @@
+"""
+Tests for query micro-batching
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from batcher import QueryBatcher
+
+class RecordingRetriever:
+    """Fake retriever that echoes queries and records each batch"""
+    def __init__(self):
+        self.calls = []
+
+    def retrieve_many(self, queries, top_k=None, threshold=None, filters=None, mode=None):
+        self.calls.append((list(queries), top_k, threshold))
+        return [[{"query": q, "top_k": top_k}] for q in queries]
+
+def test_concurrent_queries_share_a_batch():
+    """Queries inside the window are searched together, each caller gets its own results"""
+    retriever = RecordingRetriever()
+    batcher = QueryBatcher(window_ms=200, max_batch=8, retriever_factory=lambda: retriever)
+    queries = [f"q{i}" for i in range(8)]
+    with ThreadPoolExecutor(8) as pool:
+        results = list(pool.map(lambda q: batcher.search(q, 3, 0.5, timeout=5), queries))
+    assert [r[0]["query"] for r in results] == queries
+    assert len(retriever.calls) == 1
+    assert batcher.stats()["batch_sizes"] == {8: 1}
+
+def test_different_parameters_are_searched_separately():
+    """Queries with different top_k are never mixed in one search call"""
+    retriever = RecordingRetriever()
+    batcher = QueryBatcher(window_ms=100, max_batch=4, retriever_factory=lambda: retriever)
+    futures = [batcher.submit("a", 3), batcher.submit("b", 5)]
+    assert [f.result(5)[0]["top_k"] for f in futures] == [3, 5]
+    assert sorted(call[1] for call in retriever.calls) == [3, 5]
+
+if __name__ == "__main__":
+    pytest.main([__file__])
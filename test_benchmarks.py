@@ -0,0 +1,36 @@
+"""
+Tests for the benchmark helpers (corpus generation and latency summaries)
+"""
+
+import pandas as pd
+import pytest
+import config
+from benchmarks.common import percentiles
+from benchmarks.corpus import generate_corpus, sample_queries
+
+def test_synthetic_corpus_keeps_schema_and_scales(tmp_path):
+    """Generated rows have the source columns, valid ratings and dates, in chunks"""
+    out = tmp_path / "bench.csv"
+    generate_corpus(1234, str(out), chunk_rows=500, reviews_per_restaurant=100)
+    df = pd.read_csv(out)
+
+    source = pd.read_csv(config.DATA_PATH)
+    assert list(df.columns) == list(source.columns)
+    assert len(df) == 1234
+    assert df[config.RESTAURANT_COLUMN].nunique() > source[config.RESTAURANT_COLUMN].nunique()
+    assert set(df[config.RATING_COLUMN]) <= set(source[config.RATING_COLUMN])
+    assert pd.to_datetime(df[config.DATE_COLUMN], format=config.DATE_FORMAT).notna().all()
+    assert df[config.TEXT_COLUMN].nunique() > 1200
+
+    queries = sample_queries(str(out), 20, words=4)
+    assert len(queries) == 20 and all(1 <= len(q.split()) <= 4 for q in queries)
+
+def test_percentiles_in_milliseconds():
+    summary = percentiles([0.001 * i for i in range(1, 101)])
+    assert summary["count"] == 100
+    assert summary["p50"] == pytest.approx(50.5)
+    assert summary["max"] == pytest.approx(100)
+    assert percentiles([]) == {"count": 0}
+
+if __name__ == "__main__":
+    pytest.main([__file__])
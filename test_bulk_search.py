@@ -0,0 +1,75 @@
+"""
+Tests for the offline bulk-search CLI
+"""
+
+import json
+import os
+import numpy as np
+import pytest
+import bulk_search
+import config
+import retrieve
+from metadata_index import build_metadata_index
+from pipeline import PipelineError
+from snapshots import new_snapshot, publish_snapshot
+from vector_index import IndexWriter
+
+QUERIES = ["alpha", "beta", "", "gamma", "alpha", "beta"]
+
+class AxisEncoder:
+    def encode(self, texts, **kwargs):
+        return np.eye(3, dtype=np.float32)[[["alpha", "beta", "gamma"].index(t) for t in texts]]
+
+@pytest.fixture
+def queries_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "VECTOR_INDEX_DIR", str(tmp_path / "index"))
+    monkeypatch.setattr(config, "INDEX_VERSION_FILE", str(tmp_path / "index_version"))
+    monkeypatch.setattr(config, "SEARCH_BACKEND", "numpy")
+    monkeypatch.setattr(config, "USE_EMBEDDING_CACHE", False)
+    monkeypatch.setattr(retrieve, "_model", AxisEncoder())
+    monkeypatch.setattr(retrieve, "_retriever", None)
+    os.makedirs(config.VECTOR_INDEX_DIR)
+    version, staging = new_snapshot(config.VECTOR_INDEX_DIR)
+    writer = IndexWriter(staging, 3, 3, "test-model")
+    writer.add(["a", "b", "c"], ["a", "b", "c"], [{"review_idx": i} for i in range(3)], np.eye(3, dtype=np.float32))
+    writer.close()
+    build_metadata_index(staging)
+    publish_snapshot(staging, version, config.VECTOR_INDEX_DIR)
+
+    path = tmp_path / "queries.txt"
+    path.write_text("\n".join(QUERIES) + "\n", encoding="utf-8")
+    return str(path)
+
+def read_jsonl(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+def test_bulk_search_jsonl(queries_file, tmp_path):
+    output = str(tmp_path / "out.jsonl")
+    summary = bulk_search.bulk_search(queries_file, output, top_k=1, threshold=0, workers=1, batch_size=2)
+    records = read_jsonl(output)
+    assert [r["line"] for r in records] == [0, 1, 3, 4, 5]
+    assert [r["results"][0]["id"] for r in records] == ["a", "b", "c", "a", "b"]
+    assert (summary["queries"], summary["hits"], summary["batches"]) == (5, 5, 3)
+    assert not os.path.exists(bulk_search.checkpoint_path(output))
+
+def test_bulk_search_resumes_without_duplicates(queries_file, tmp_path, monkeypatch):
+    output = str(tmp_path / "out.jsonl")
+    write = bulk_search.JsonlWriter.write
+    calls = []
+
+    def failing_write(self, *batch):
+        calls.append(batch)
+        if len(calls) == 2:
+            raise RuntimeError("interrupted")
+        return write(self, *batch)
+
+    monkeypatch.setattr(bulk_search.JsonlWriter, "write", failing_write)
+    with pytest.raises(PipelineError):
+        bulk_search.bulk_search(queries_file, output, top_k=1, threshold=0, workers=1, batch_size=2)
+    assert [r["line"] for r in read_jsonl(output)] == [0, 1]
+
+    monkeypatch.setattr(bulk_search.JsonlWriter, "write", write)
+    summary = bulk_search.bulk_search(queries_file, output, top_k=1, threshold=0, workers=1, batch_size=2, resume=True)
+    assert summary["queries"] == 3
+    assert [r["line"] for r in read_jsonl(output)] == [0, 1, 3, 4, 5]
@@ -0,0 +1,78 @@
+"""
+Tests for the persistent embedding cache
+"""
+
+import multiprocessing
+import numpy as np
+import pytest
+from embedding_cache import EmbeddingCache, cached_encode
+
+def fake_encode(calls):
+    """Encoder that records what it was asked to encode"""
+    def encode(texts):
+        calls.extend(texts)
+        return np.array([[len(t), 1.0, 0.0] for t in texts], dtype=np.float32)
+    return encode
+
+def test_cache_round_trip_and_normalization(tmp_path):
+    """Stored vectors come back, whitespace variants share an entry"""
+    cache = EmbeddingCache(str(tmp_path), "test-model")
+    cache.put_many(["good  service"], np.array([[1.0, 2.0, 3.0]]))
+    found = cache.get_many([" good service ", "bad service"])
+    assert found[0].tolist() == [1.0, 2.0, 3.0]
+    assert found[1] is None
+
+    reopened = EmbeddingCache(str(tmp_path), "test-model")
+    assert reopened.get_many(["good service"])[0].tolist() == [1.0, 2.0, 3.0]
+    assert EmbeddingCache(str(tmp_path), "other-model").get_many(["good service"])[0] is None
+
+def test_cached_encode_only_encodes_misses(tmp_path):
+    """Texts already in the cache are never encoded again"""
+    cache = EmbeddingCache(str(tmp_path), "test-model")
+    calls = []
+    first = cached_encode(cache, ["a", "bb", "a"], fake_encode(calls))
+    assert calls == ["a", "bb"]
+    second = cached_encode(cache, ["bb", "ccc", "a"], fake_encode(calls))
+    assert calls == ["a", "bb", "ccc"]
+    assert second[:, 0].tolist() == [2, 3, 1]
+    assert first.dtype == np.float32
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    """Beyond the size limit the least recently used entries are evicted"""
+    cache = EmbeddingCache(str(tmp_path), "test-model", max_mb=3 * 4 * 2 / (1024 * 1024))
+    cache.put_many(["a", "b"], np.ones((2, 3)))
+    cache.get_many(["a"])
+    cache.put_many(["c"], np.full((1, 3), 2.0))
+    found = cache.get_many(["a", "b", "c"])
+    assert found[0] is not None
+    assert found[1] is None
+    assert found[2].tolist() == [2.0, 2.0, 2.0]
+    assert len(cache) == 2
+
+def _put_worker(directory, worker):
+    cache = EmbeddingCache(directory, "test-model", max_mb=3 * 4 * 300 / (1024 * 1024))
+    for i in range(0, 400, 4):
+        texts = [f"{worker}-{i + j}" for j in range(4)]
+        cache.put_many(texts, np.array([[worker, i + j, 7.0] for j in range(4)]))
+        cache.get_many(texts[:2])
+
+def test_cache_concurrent_writers_never_mix_rows(tmp_path):
+    """Processes writing (and evicting) at once never map a key to another key's row"""
+    context = multiprocessing.get_context("fork")
+    workers = [context.Process(target=_put_worker, args=(str(tmp_path), w)) for w in range(4)]
+    for p in workers:
+        p.start()
+    for p in workers:
+        p.join()
+        assert p.exitcode == 0
+
+    cache = EmbeddingCache(str(tmp_path), "test-model")
+    texts = [f"{w}-{i}" for w in range(4) for i in range(400)]
+    found = cache.get_many(texts)
+    stored = [(text, vector) for text, vector in zip(texts, found) if vector is not None]
+    assert 0 < len(stored) <= 300
+    for text, vector in stored:
+        assert f"{int(vector[0])}-{int(vector[1])}" == text
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,54 @@
+"""
+Tests for the ONNX Runtime encoder against the PyTorch SentenceTransformer
+"""
+
+import numpy as np
+import pytest
+
+pytest.importorskip("onnx")
+pytest.importorskip("onnxruntime")
+
+from encoders import OnnxEncoder, export_onnx, parity_check
+
+WORDS = ["the", "pizza", "was", "great", "service", "slow", "ice", "cream", "cheese", "bread"]
+
+@pytest.fixture(scope="module")
+def tiny_model(tmp_path_factory):
+    """A small randomly initialized BERT SentenceTransformer, built offline"""
+    from sentence_transformers import SentenceTransformer
+    try:
+        from sentence_transformers.sentence_transformer import modules as models
+    except ImportError:
+        from sentence_transformers import models
+    from transformers import BertConfig, BertModel, BertTokenizerFast
+
+    path = tmp_path_factory.mktemp("tiny-bert")
+    vocab = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"] + WORDS
+    (path / "vocab.txt").write_text("\n".join(vocab))
+    BertTokenizerFast(str(path / "vocab.txt")).save_pretrained(str(path))
+    config = BertConfig(vocab_size=len(vocab), hidden_size=32, num_hidden_layers=2,
+                        num_attention_heads=2, intermediate_size=64)
+    BertModel(config).save_pretrained(str(path))
+
+    transformer = models.Transformer(str(path), max_seq_length=16)
+    pooling = models.Pooling(32, "mean")
+    return SentenceTransformer(modules=[transformer, pooling, models.Normalize()], device="cpu")
+
+def test_onnx_encoder_matches_pytorch(tiny_model, tmp_path):
+    """Exported model + tokenizer + pooling reproduce the PyTorch embeddings"""
+    meta = export_onnx(tiny_model, "tiny", str(tmp_path / "onnx"), quantize=True)
+    assert meta["pooling"] == "mean" and meta["normalize"]
+
+    texts = ["the pizza was great", "slow service", "ice cream", "great great cheese bread with pizza"]
+    expected = tiny_model.encode(texts)
+    encoder = OnnxEncoder(str(tmp_path / "onnx"))
+    assert np.allclose(encoder.encode(texts, batch_size=3), expected, atol=1e-5)
+    assert np.allclose(encoder.encode("slow service"), expected[1], atol=1e-5)
+
+    quantized = OnnxEncoder(str(tmp_path / "onnx"), quantized=True)
+    report = parity_check(tiny_model, quantized, texts, texts[:2], k=2)
+    assert 0 <= report["cosine_drift"]["max"] < 0.1
+    assert 0 <= report["recall_at_k"]["reindexed"] <= 1
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,70 @@
+"""
+Tests for HNSW settings, distance-space scores and the tuner
+"""
+
+import json
+import numpy as np
+import pytest
+import config
+from hnsw import choose, exact_top_k, hnsw_settings, pareto_front, split_held_out, sweep
+from metadata_index import build_metadata_index
+from retrieve import NumpyBackend, format_results
+from vector_index import IndexWriter
+
+def test_tuned_settings_override_config_for_the_same_space(tmp_path, monkeypatch):
+    path = tmp_path / "hnsw_settings.json"
+    monkeypatch.setattr(config, "HNSW_SETTINGS_FILE", str(path))
+    monkeypatch.setattr(config, "HNSW_SPACE", "cosine")
+    path.write_text(json.dumps({"space": "cosine", "M": 32, "construction_ef": 64, "search_ef": 40}))
+    assert hnsw_settings() == {"space": "cosine", "M": 32, "construction_ef": 64, "search_ef": 40}
+
+    # Tuned for another space: ignored
+    monkeypatch.setattr(config, "HNSW_SPACE", "l2")
+    assert hnsw_settings()["M"] == config.HNSW_M
+
+def test_cosine_space_threshold_is_cosine_similarity():
+    hits = [{"id": "a", "text": "a", "distance": 0.2, "metadata": {}},
+            {"id": "b", "text": "b", "distance": 0.6, "metadata": {}}]
+    assert [r["score"] for r in format_results(hits, 0.5, "cosine")] == [0.8]
+    assert [r["score"] for r in format_results(hits, 0.5, "l2")] == [0.8333, 0.625]
+
+def test_numpy_backend_uses_the_snapshot_space(tmp_path, monkeypatch):
+    """Distances follow the space recorded at export, not the current config"""
+    monkeypatch.setattr(config, "HNSW_SPACE", "l2")
+    monkeypatch.setattr(config, "HNSW_SETTINGS_FILE", str(tmp_path / "tuned.json"))
+    for space in ("cosine", None):
+        directory = str(tmp_path / str(space))
+        writer = IndexWriter(directory, 2, 2, "test-model", space)
+        writer.add(["a", "b"], ["a", "b"], [{}, {}], np.eye(2, dtype=np.float32))
+        writer.close()
+        build_metadata_index(directory)
+        assert NumpyBackend(directory).space == (space or "l2")
+
+def test_pareto_front_and_choice():
+    points = [
+        {"p50_ms": 1.0, "recall_at_k": 0.80},
+        {"p50_ms": 2.0, "recall_at_k": 0.96},
+        {"p50_ms": 2.5, "recall_at_k": 0.90},  # dominated
+        {"p50_ms": 4.0, "recall_at_k": 0.99},
+    ]
+    front = pareto_front(points)
+    assert [p["p50_ms"] for p in front] == [1.0, 2.0, 4.0]
+    assert choose(front, 0.95)["p50_ms"] == 2.0
+    assert choose(front, 0.999)["recall_at_k"] == 0.99
+
+def test_sweep_measures_recall_against_exact_search():
+    pytest.importorskip("chromadb")
+    rng = np.random.default_rng(0)
+    corpus, queries = split_held_out(rng.normal(size=(400, 16)).astype(np.float32), 20)
+    assert len(corpus) == 380 and len(queries) == 20
+
+    points = sweep(corpus, queries, 5, "cosine", [8], [64], [5, 100])
+    assert [p["search_ef"] for p in points] == [5, 100]
+    assert points[-1]["recall_at_k"] >= 0.95
+    assert all(p["p50_ms"] > 0 for p in points)
+
+def test_exact_top_k_inner_product():
+    vectors = np.array([[1, 0], [3, 0], [0, 1]], dtype=np.float32)
+    query = np.array([[1, 0.1]], dtype=np.float32)
+    assert exact_top_k(vectors, query, 1, "ip")[0, 0] == 1
+    assert exact_top_k(vectors, query, 1, "l2")[0, 0] == 0
@@ -0,0 +1,92 @@
+"""
+Tests for the ingestion pipeline
+"""
+
+import pytest
+import config
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import embedding_pool
+from pipeline import run_pipeline, PipelineError
+from ingest import make_doc_id, build_records, diff_records, iter_review_batches, load_data
+
+def test_doc_id_is_content_addressed():
+    """Same text gives the same ID, different text a different one"""
+    assert make_doc_id("great ice cream") == make_doc_id("great ice cream")
+    assert make_doc_id("great ice cream") != make_doc_id("slow service")
+    assert make_doc_id("great ice cream").startswith("doc_")
+
+def test_build_records_drops_duplicate_texts():
+    """Duplicate texts keep only their first occurrence"""
+    ids, docs, metadatas = build_records(["a", "b", "a"], [0, 1, 2])
+    assert docs == ["a", "b"]
+    assert metadatas == [{"review_idx": 0}, {"review_idx": 1}]
+    assert len(set(ids)) == 2
+
+def test_diff_records():
+    """New, moved, unchanged and deleted rows are classified correctly"""
+    ids, _, metadatas = build_records(["kept", "moved", "new"], [0, 1, 2])
+    stored = {
+        ids[0]: {"review_idx": 0},
+        ids[1]: {"review_idx": 5},
+        make_doc_id("gone"): {"review_idx": 3},
+    }
+    added, updated, removed, skipped = diff_records(ids, metadatas, stored)
+    assert added == [2]
+    assert updated == [1]
+    assert skipped == [0]
+    assert removed == [make_doc_id("gone")]
+
+def test_stream_batches_match_full_load():
+    """Streaming yields the same reviews as load_data, in fixed-size batches"""
+    batches = list(iter_review_batches(config.DATA_PATH, 64))
+    texts = [t for _, batch, _ in batches for t in batch]
+    metadatas = [m for _, _, batch in batches for m in batch]
+    assert (texts, metadatas) == load_data()
+    assert all(len(batch) == 64 for _, batch, _ in batches[:-1])
+
+    resumed = list(iter_review_batches(config.DATA_PATH, 64, skip_rows=100))
+    assert resumed[0][0][0] == 100
+
+def test_pipeline_preserves_order_and_counts():
+    """Items flow through all stages in order and are counted per stage"""
+    seen = []
+    stats, _ = run_pipeline(
+        ([i] * 3 for i in range(10)),
+        [("double", lambda item: [x * 2 for x in item]), ("collect", seen.append)],
+        queue_size=2
+    )
+    assert seen == [[i * 2] * 3 for i in range(10)]
+    assert [s.rows for s in stats] == [30, 30, 30]
+
+def test_pipeline_propagates_stage_errors():
+    """A failing stage stops the pipeline and raises PipelineError"""
+    def fail(item):
+        raise ValueError("bad batch")
+    with pytest.raises(PipelineError, match="bad batch"):
+        run_pipeline(([i] for i in range(100)), [("fail", fail)], queue_size=1)
+
+class LengthModel:
+    """Fake encoder: the embedding is the text length"""
+    def encode(self, texts, **kwargs):
+        return np.array([[len(t), 1.0] for t in texts])
+
+def test_parallel_encode_restores_input_order(monkeypatch):
+    """Length-bucketed chunks are written back to their original positions"""
+    monkeypatch.setattr(embedding_pool, "_worker_model", LengthModel())
+    monkeypatch.setattr(embedding_pool, "get_pool", lambda name, workers: ThreadPoolExecutor(workers))
+    docs = ["x" * n for n in [7, 1, 30, 4, 4, 12, 2, 9]]
+    vectors = embedding_pool.parallel_encode(None, "fake", docs, 3, batch_size=2, batches_per_task=1)
+    assert vectors[:, 0].tolist() == [len(d) for d in docs]
+
+def test_reviews_keep_typed_metadata():
+    """Restaurant, rating and date are kept as typed metadata"""
+    texts, metadatas = load_data()
+    assert len(texts) == len(metadatas)
+    first = metadatas[0]
+    assert first["restaurant"].startswith("https://www.yelp.com/biz/")
+    assert first["rating"] == 5
+    assert (first["date"], first["date_key"]) == ("2022-01-22", 20220122)
+
+if __name__ == "__main__":
+    pytest.main([__file__])
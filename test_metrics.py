@@ -0,0 +1,52 @@
+"""
+Tests for the metrics registry, slow-query log and /metrics endpoint
+"""
+
+import json
+import metrics
+from metrics import Counter, Histogram, Registry, SlowQueryLog
+
+def test_registry_renders_prometheus_text():
+    """Histograms are cumulative with +Inf, _sum and _count; labels are escaped"""
+    registry = Registry()
+    latency = registry.register(Histogram("t_seconds", "Latency", ["stage"], buckets=(0.1, 1.0)))
+    requests = registry.register(Counter("t_total", "Requests", ["path"]))
+    for value in (0.05, 0.5, 3.0):
+        latency.observe(value, stage="encode")
+    requests.inc(path='say "hi"')
+
+    text = registry.render()
+    assert "# TYPE t_seconds histogram" in text
+    assert 't_seconds_bucket{stage="encode",le="0.1"} 1' in text
+    assert 't_seconds_bucket{stage="encode",le="1.0"} 2' in text
+    assert 't_seconds_bucket{stage="encode",le="+Inf"} 3' in text
+    assert 't_seconds_count{stage="encode"} 3' in text
+    assert 't_seconds_sum{stage="encode"} 3.55' in text
+    assert 't_total{path="say \\"hi\\""} 1' in text
+
+def test_slow_query_log_threshold_and_file(tmp_path):
+    path = tmp_path / "slow.jsonl"
+    log = SlowQueryLog(threshold_ms=100, sample_rate=1.0, path=str(path))
+    assert not log.maybe_record(["fast"], "vector", 5, None, {"encode_ms": 10, "total_ms": 20})
+    assert log.maybe_record(["slow"], "vector", 5, None, {"encode_ms": 150, "total_ms": 180})
+
+    entries = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [e["queries"] for e in entries] == [["slow"]]
+    assert entries[0]["timings_ms"]["encode_ms"] == 150
+    assert SlowQueryLog(threshold_ms=0, sample_rate=0.0, path="").maybe_record(["q"], "vector", 5, None, {}) is False
+
+def test_metrics_endpoint_does_not_load_the_model():
+    """Scraping before the first search must not create the retriever"""
+    from app import app
+    import retrieve
+
+    metrics.record_retrieval("vector", 2, {"encode_ms": 3.0, "search_ms": 1.0, "total_ms": 5.0})
+    response = app.test_client().get("/metrics")
+    body = response.get_data(as_text=True)
+
+    assert response.status_code == 200
+    assert response.mimetype == "text/plain"
+    assert 'rag_retrieve_stage_seconds_count{stage="encode"}' in body
+    assert 'rag_retrieve_queries_total{mode="vector"}' in body
+    assert "rag_search_in_flight 0" in body
+    assert retrieve.loaded_retriever() is None
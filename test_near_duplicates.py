@@ -0,0 +1,74 @@
+"""
+Tests for MinHash / LSH near-duplicate detection and its use at ingest
+"""
+
+import numpy as np
+from near_duplicates import NearDuplicateIndex, shingle_hashes
+from ingest import collapse_batches, collapse_near_duplicates, make_doc_id, write_batch
+
+REVIEW = ("The matcha ice cream was creamy and not too sweet, the staff were friendly "
+          "and we got a table right away even on a busy Saturday night downtown. "
+          "Portions are generous, prices are fair for the area and the waffle cones "
+          "are made fresh every morning, so the whole place smells amazing when you walk in")
+REPOST = REVIEW.replace("Saturday", "Friday").upper() + "!!"
+OTHER = ("Waited forty minutes for cold fries and a burger that was burnt on one side, "
+         "the manager never came over and the tables were sticky")
+
+def test_index_collapses_reposts_only():
+    """A lightly edited repost joins its original; an unrelated review doesn't"""
+    index = NearDuplicateIndex()
+    assert index.add(REVIEW, "a") == "a"
+    assert index.add(OTHER, "b") == "b"
+    assert index.add(REPOST, "c") == "a"
+    assert index.add(REVIEW, "a") == "a"  # the same document again is not a duplicate
+    assert len(index) == 2 and dict(index.duplicate_counts) == {"a": 1}
+    assert index.stats()["duplicates"] == 1
+    assert len(shingle_hashes("Great!")) == 1
+
+def test_collapse_keeps_first_with_duplicate_count():
+    docs, idxs, metadatas = collapse_near_duplicates(
+        [REVIEW, OTHER, REPOST, REVIEW], [0, 1, 2, 3], [{"rating": 5}, {"rating": 1}, {"rating": 4}, {}]
+    )
+    assert docs == [REVIEW, OTHER] and idxs == [0, 1]
+    assert metadatas == [{"rating": 5, "duplicate_count": 2}, {"rating": 1}]
+
+def test_streamed_batches_count_duplicates_of_earlier_batches():
+    """In-batch duplicates update the kept metadata; later ones are returned by review"""
+    batches = [([0, 1, 2], [REVIEW, REPOST, OTHER], [{}, {}, {}]), ([3, 4], [REVIEW, OTHER], [{}, {}])]
+    first, second = collapse_batches(iter(batches), NearDuplicateIndex())
+    assert first == ([0, 2], [REVIEW, OTHER], [{"duplicate_count": 1, "duplicate_last_idx": 1}, {}], 3, {})
+    assert second == ([], [], [], 5, {make_doc_id(REVIEW): [3], make_doc_id(OTHER): [4]})
+
+class FakeCollection:
+    """Dict-backed stand-in for the Chroma calls write_batch makes"""
+    def __init__(self):
+        self.records = {}
+        self.upserts = 0
+
+    def upsert(self, ids, documents, embeddings, metadatas):
+        self.upserts += 1
+        for record in zip(ids, documents, embeddings, metadatas):
+            self.records[record[0]] = record[1:]
+
+    def get(self, ids, include):
+        found = [i for i in ids if i in self.records]
+        return {
+            "ids": found,
+            "documents": [self.records[i][0] for i in found],
+            "embeddings": [self.records[i][1] for i in found],
+            "metadatas": [self.records[i][2] for i in found],
+        }
+
+def test_duplicate_counts_are_written_with_the_batch_and_replay_safely():
+    """Counts for earlier documents land in the batch's upsert; a replay doesn't add them again"""
+    collection = FakeCollection()
+    batches = [([0, 1], [REVIEW, REPOST], [{}, {}]), ([2, 3], [OTHER, REPOST], [{}, {}])]
+    first, second = collapse_batches(iter(batches), NearDuplicateIndex())
+    for review_idxs, texts, metadatas, _, duplicates in (first, second, second):
+        vectors = np.ones((len(texts), 2), dtype=np.float32)
+        write_batch(collection, texts, review_idxs, vectors, metadatas, duplicates)
+
+    assert collection.upserts == 3
+    metadata = collection.records[make_doc_id(REVIEW)][2]
+    assert metadata["duplicate_count"] == 2 and metadata["duplicate_last_idx"] == 3
+    assert "duplicate_count" not in collection.records[make_doc_id(OTHER)][2]
@@ -0,0 +1,96 @@
+"""
+Tests for the in-process query caches
+"""
+
+import os
+import numpy as np
+import pytest
+import config
+import retrieve
+from metadata_index import build_metadata_index
+from query_cache import LRUCache, SemanticCache
+from snapshots import new_snapshot, publish_snapshot
+from vector_index import IndexWriter
+
+def test_lru_evicts_least_recently_used():
+    """The least recently used entry goes first and counters are kept"""
+    cache = LRUCache(maxsize=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"]) == (2, 1, 1)
+
+def test_lru_ttl_expiry(monkeypatch):
+    """Entries older than the TTL are treated as misses"""
+    now = [100.0]
+    monkeypatch.setattr("query_cache.time.monotonic", lambda: now[0])
+    cache = LRUCache(maxsize=10, ttl=5)
+    cache.put("q", "results")
+    now[0] += 4
+    assert cache.get("q") == "results"
+    now[0] += 2
+    assert cache.get("q") is None
+    assert len(cache) == 0
+
+def test_semantic_cache_radius_key_and_eviction():
+    """Near embeddings under the same key hit; others miss; the LRU entry goes first"""
+    cache = SemanticCache(maxsize=2, radius=0.05)
+    cache.put(("v1", 5), [1.0, 0.0], "service")
+    assert cache.get(("v1", 5), [2.0, 0.1])[0] == "service"
+    assert cache.get(("v1", 5), [1.0, 1.0]) == (None, None)
+    assert cache.get(("v1", 10), [1.0, 0.0]) == (None, None)
+
+    cache.put(("v1", 5), [0.0, 1.0], "food")
+    cache.get(("v1", 5), [1.0, 0.0])
+    cache.put(("v1", 5), [-1.0, 0.0], "parking")
+    assert cache.get(("v1", 5), [0.0, 1.0])[0] is None
+    assert cache.get(("v1", 5), [1.0, 0.0])[0] == "service"
+    stats = cache.stats()
+    assert (stats["size"], stats["hits"], stats["misses"], stats["evictions"]) == (2, 3, 3, 1)
+
+    cache.clear()
+    assert len(cache) == 0 and cache.get(("v1", 5), [1.0, 0.0])[0] is None
+
+class NearEncoder:
+    """'service' and 'service?' embed almost identically; 'food' doesn't"""
+    def encode(self, texts, **kwargs):
+        vectors = {"service": [1, 0, 0], "service?": [1, 0.05, 0], "food": [0, 1, 0]}
+        return np.asarray([vectors[t] for t in texts], dtype=np.float32)
+
+def test_retriever_semantic_cache_and_audit(tmp_path, monkeypatch):
+    """Near-identical queries reuse results, and audited hits record their recall"""
+    monkeypatch.setattr(config, "VECTOR_INDEX_DIR", str(tmp_path / "index"))
+    monkeypatch.setattr(config, "INDEX_VERSION_FILE", str(tmp_path / "index_version"))
+    monkeypatch.setattr(config, "USE_EMBEDDING_CACHE", False)
+    monkeypatch.setattr(config, "SEMANTIC_CACHE", True)
+    monkeypatch.setattr(config, "SEMANTIC_CACHE_RADIUS", 0.01)
+    monkeypatch.setattr(retrieve, "_model", NearEncoder())
+    os.makedirs(config.VECTOR_INDEX_DIR)
+    version, staging = new_snapshot(config.VECTOR_INDEX_DIR)
+    writer = IndexWriter(staging, 3, 3, "test-model")
+    writer.add(["a", "b", "c"], ["a", "b", "c"], [{"review_idx": i} for i in range(3)], np.eye(3, dtype=np.float32))
+    writer.close()
+    build_metadata_index(staging)
+    publish_snapshot(staging, version, config.VECTOR_INDEX_DIR)
+
+    retriever = retrieve.Retriever(backend="numpy")
+    first = retriever.retrieve("service", top_k=1, threshold=0)
+    assert retriever.retrieve("service?", top_k=1, threshold=0) == first
+    assert retriever.retrieve("food", top_k=1, threshold=0)[0]["id"] == "b"
+    stats = retriever.cache_stats()["semantic"]
+    assert (stats["hits"], stats["size"]) == (1, 2)
+
+    monkeypatch.setattr(config, "SEMANTIC_CACHE_AUDIT_RATE", 1.0)
+    retriever.query_cache.clear()
+    retriever.result_cache.clear()
+    retriever.semantic_cache.put((retriever.view.version, 2, 0, None), [1, 0, 0], [])
+    retriever.retrieve("service?", top_k=2, threshold=0)
+    stats = retriever.cache_stats()["semantic"]
+    assert stats["audits"] == 1 and stats["audit_recall"] == 0.0
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,91 @@
+"""
+Tests for the per-restaurant centroid index and restaurant-level retrieval
+"""
+
+import os
+import numpy as np
+import config
+import retrieve
+from metadata_index import build_metadata_index
+from restaurant_index import RestaurantIndex, build_restaurant_index, restaurant_centroids
+from snapshots import new_snapshot, publish_snapshot
+from vector_index import IndexWriter
+
+# Two restaurants: "pizza" reviews point along axis 0, "sushi" along axis 1,
+# and one sushi review along axis 2 (a second topic for that restaurant)
+REVIEWS = [
+    ("pizza", 5, "2022-01-03", [1, 0, 0]),
+    ("pizza", 3, "2022-05-01", [0.9, 0.1, 0]),
+    ("sushi", 4, "2021-07-15", [0, 1, 0]),
+    ("sushi", 2, "2023-02-20", [0, 0.1, 1]),
+]
+
+def write_snapshot(root, max_centroids=2, reviews_per_centroid=1):
+    version, staging = new_snapshot(str(root))
+    writer = IndexWriter(staging, len(REVIEWS), 3, "test-model")
+    writer.add(
+        [f"review-{i}" for i in range(len(REVIEWS))],
+        [f"{name} review {i}" for i, (name, *_) in enumerate(REVIEWS)],
+        [{"review_idx": i, "restaurant": name, "rating": rating, "date": date}
+         for i, (name, rating, date, _) in enumerate(REVIEWS)],
+        np.asarray([vector for *_, vector in REVIEWS], dtype=np.float32)
+    )
+    writer.close()
+    build_metadata_index(staging)
+    built = build_restaurant_index(staging, max_centroids, reviews_per_centroid)
+    publish_snapshot(staging, version, str(root))
+    return os.path.join(str(root), version), built
+
+def test_centroids_split_only_large_restaurants():
+    vectors = np.eye(4, dtype=np.float32)
+    assert restaurant_centroids(vectors, 4, 10).shape == (1, 4)
+    assert restaurant_centroids(vectors, 2, 1).shape == (2, 4)
+    assert np.allclose(np.linalg.norm(restaurant_centroids(vectors, 4, 2), axis=1), 1)
+
+def test_build_and_search(tmp_path):
+    directory, built = write_snapshot(tmp_path)
+    assert built == {"restaurants": 2, "centroids": 4}
+
+    index = RestaurantIndex(directory)
+    best = index.search([0, 0, 1], top_k=5)
+    assert [r["restaurant"] for r in best] == ["sushi", "pizza"]
+    assert best[0]["score"] > 0.99
+    assert best[0]["reviews"] == 2 and best[0]["rating_mean"] == 3.0
+    assert best[0]["rating_histogram"] == [0, 1, 0, 1, 0]
+    assert (best[0]["first_date"], best[0]["last_date"]) == ("2021-07-15", "2023-02-20")
+
+    assert [r["restaurant"] for r in index.search([1, 0, 0], top_k=1)] == ["pizza"]
+    assert index.search([1, 0, 0], top_k=5, min_reviews=3) == []
+
+class AxisEncoder:
+    def encode(self, texts, **kwargs):
+        return np.eye(3, dtype=np.float32)[[["pizza", "sushi", "eel"].index(t) for t in texts]]
+
+def test_retrieve_restaurants_with_supporting_reviews(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "VECTOR_INDEX_DIR", str(tmp_path / "index"))
+    monkeypatch.setattr(config, "INDEX_VERSION_FILE", str(tmp_path / "index_version"))
+    monkeypatch.setattr(config, "USE_EMBEDDING_CACHE", False)
+    monkeypatch.setattr(retrieve, "_model", AxisEncoder())
+    os.makedirs(config.VECTOR_INDEX_DIR)
+    write_snapshot(config.VECTOR_INDEX_DIR)
+
+    retriever = retrieve.Retriever(backend="numpy")
+    timings = {}
+    found = retriever.retrieve_restaurants("eel", top_k=1, reviews=1, timings=timings)
+    assert [r["restaurant"] for r in found] == ["sushi"]
+    assert [r["id"] for r in found[0]["supporting_reviews"]] == ["review-3"]
+    assert {"encode_ms", "restaurants_ms", "reviews_ms", "total_ms"} <= set(timings)
+
+    # Supporting reviews only come from the restaurant they support
+    found = retriever.retrieve_restaurants("pizza", top_k=2, reviews=5)
+    assert [r["restaurant"] for r in found] == ["pizza", "sushi"]
+    assert {r["metadata"]["restaurant"] for r in found[1]["supporting_reviews"]} == {"sushi"}
+
+    # Without supporting reviews the per-restaurant search is skipped
+    def no_search(*args, **kwargs):
+        raise AssertionError("searched reviews")
+    view = retriever.acquire_view()
+    retriever.release_view(view)
+    monkeypatch.setattr(view.backend, "search", no_search)
+    found = retriever.retrieve_restaurants("sushi", top_k=2, reviews=0)
+    assert [r["supporting_reviews"] for r in found] == [[], []]
@@ -3,7 +3,7 @@ Tests for the RAG retrieval system
 """
 
 import pytest
-from retrieve import retrieve, RetrieverError
+from retrieve import retrieve, retrieve_many, RetrieverError
 
 def test_retrieve_normal_query():
     """Test retrieval with a normal query"""
@@ -33,5 +33,19 @@ def test_retrieve_with_params():
     for r in results:
         assert r['score'] >= 0.7
 
+def test_retrieve_many_matches_single_queries():
+    """Batched retrieval returns the same results as one call per query"""
+    queries = ["ice cream", "service", "ice cream"]
+    batched = retrieve_many(queries, top_k=3, threshold=0)
+    assert len(batched) == 3
+    assert batched[0] == batched[2]
+    for query, results in zip(queries, batched):
+        assert results == retrieve(query, top_k=3, threshold=0)
+
+def test_retrieve_many_rejects_empty_query():
+    """An empty query anywhere in the batch is an error"""
+    with pytest.raises(RetrieverError):
+        retrieve_many(["ice cream", "  "])
+
 if __name__ == "__main__":
     pytest.main([__file__])
\ No newline at end of file
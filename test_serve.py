@@ -0,0 +1,66 @@
+"""
+Tests for the pre-fork server hooks
+"""
+
+from types import SimpleNamespace
+import numpy as np
+import pytest
+import torch
+import config
+import encoders
+import retrieve
+import serve
+import warmup
+
+class FakeRetriever:
+    def __init__(self):
+        self.model = SimpleNamespace(encode=lambda texts, **kwargs: np.ones((len(texts), 2), dtype=np.float32))
+        self.searches = 0
+
+    def search_many(self, embeddings, top_k, threshold):
+        self.searches += 1
+        return [[]]
+
+@pytest.fixture
+def fresh_startup(monkeypatch):
+    startup = warmup.Startup()
+    monkeypatch.setattr(warmup, "startup", startup)
+    return startup
+
+def test_post_fork_pins_threads_and_warms_up(monkeypatch, fresh_startup):
+    retriever = FakeRetriever()
+    monkeypatch.setattr(encoders, "import_backend", lambda: None)
+    monkeypatch.setattr(retrieve, "load_model", lambda: retriever.model)
+    monkeypatch.setattr(retrieve, "get_retriever", lambda: retriever)
+    monkeypatch.setattr(config, "ENCODER_BACKEND", "torch")
+    monkeypatch.setattr(config, "TORCH_THREADS_PER_WORKER", 3)
+    threads = []
+    monkeypatch.setattr(torch, "set_num_threads", threads.append)
+
+    logged = []
+    server = SimpleNamespace(cfg=SimpleNamespace(workers=2), log=SimpleNamespace(info=logged.append))
+    serve.post_fork(server, SimpleNamespace(pid=1234))
+
+    assert threads == [3]
+    assert fresh_startup.ready and retriever.searches == 1
+    assert logged == ["Worker 1234 ready (3 intra-op threads)"]
+
+def test_preload_loads_the_model_and_index_before_fork(monkeypatch, fresh_startup):
+    loaded = []
+    monkeypatch.setattr(retrieve, "load_model", lambda: loaded.append("model"))
+    monkeypatch.setattr(retrieve, "get_retriever", lambda: loaded.append("index"))
+    monkeypatch.setattr(config, "ENCODER_BACKEND", "torch")
+
+    monkeypatch.setattr(config, "SEARCH_BACKEND", "numpy")
+    serve.preload()
+    assert loaded == ["model", "index"]
+    assert {"preload model", "preload index"} <= set(fresh_startup.phases)
+
+    # The ChromaDB client is not fork-safe: with that backend only the model is preloaded
+    loaded.clear()
+    monkeypatch.setattr(config, "SEARCH_BACKEND", "chroma")
+    serve.preload()
+    assert loaded == ["model"]
+
+if __name__ == "__main__":
+    pytest.main([__file__])
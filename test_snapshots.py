@@ -0,0 +1,114 @@
+"""
+Tests for versioned index snapshots and the retriever's hot swap
+"""
+
+import os
+import numpy as np
+import pytest
+import config
+import retrieve
+from lexical_index import build_lexical_index
+from metadata_index import build_metadata_index
+from snapshots import (current_version, list_snapshots, new_snapshot, prune_snapshots,
+                       publish_snapshot, rollback, snapshot_dir)
+from vector_index import IndexWriter
+
+def write_snapshot(root, texts, keep=10):
+    """Publish a snapshot whose rows are one-hot vectors labelled by `texts`"""
+    version, staging = new_snapshot(str(root))
+    writer = IndexWriter(staging, len(texts), len(texts), "test-model")
+    writer.add(texts, texts, [{"review_idx": i} for i in range(len(texts))], np.eye(len(texts), dtype=np.float32))
+    writer.close()
+    build_metadata_index(staging)
+    build_lexical_index(staging)
+    publish_snapshot(staging, version, str(root), keep=keep)
+    return version
+
+def test_publish_rollback_and_prune(tmp_path):
+    first = write_snapshot(tmp_path, ["a", "b"])
+    second = write_snapshot(tmp_path, ["c", "d"])
+    assert current_version(str(tmp_path)) == second
+    assert list_snapshots(str(tmp_path)) == sorted([first, second])
+    assert not [name for name in os.listdir(tmp_path) if name.startswith(".staging-")]
+
+    assert rollback(root=str(tmp_path)) == first
+    assert snapshot_dir(root=str(tmp_path)) == os.path.join(str(tmp_path), first)
+    with pytest.raises(ValueError):
+        rollback("missing", root=str(tmp_path))
+
+    # The current snapshot survives pruning even when it is the oldest
+    assert prune_snapshots(1, str(tmp_path)) == [] and len(list_snapshots(str(tmp_path))) == 2
+    rollback(second, root=str(tmp_path))
+    assert prune_snapshots(1, str(tmp_path)) == [first]
+
+class OneHotEncoder:
+    def encode(self, texts, **kwargs):
+        return np.eye(2, dtype=np.float32)[[0 if t == "first" else 1 for t in texts]]
+
+def test_retriever_swaps_snapshots_without_dropping_requests(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "VECTOR_INDEX_DIR", str(tmp_path / "index"))
+    monkeypatch.setattr(config, "INDEX_VERSION_FILE", str(tmp_path / "index_version"))
+    monkeypatch.setattr(config, "INDEX_CHECK_INTERVAL", 0)
+    monkeypatch.setattr(config, "USE_EMBEDDING_CACHE", False)
+    monkeypatch.setattr(retrieve, "_model", OneHotEncoder())
+    os.makedirs(config.VECTOR_INDEX_DIR)
+
+    old = write_snapshot(config.VECTOR_INDEX_DIR, ["old-0", "old-1"])
+    retriever = retrieve.Retriever(backend="numpy")
+    assert retriever.retrieve("first", top_k=1, threshold=0)[0]["id"] == "old-0"
+
+    # A request still running on the old snapshot keeps it open across the swap
+    in_flight = retriever.acquire_view()
+    new = write_snapshot(config.VECTOR_INDEX_DIR, ["new-0", "new-1"])
+    assert retriever.retrieve("first", top_k=1, threshold=0)[0]["id"] == "new-0"
+    assert retriever.index_stats()["draining"] == [{"snapshot": old, "active_requests": 1}]
+    assert in_flight.backend.search(np.eye(2, dtype=np.float32)[:1], 1)[0][0]["id"] == "old-0"
+
+    retriever.release_view(in_flight)
+    assert in_flight.backend is None and retriever.index_stats()["draining"] == []
+
+    # Rollback is just moving CURRENT back; cached results of the newer version aren't reused
+    rollback(old, root=config.VECTOR_INDEX_DIR)
+    assert retriever.retrieve("first", top_k=1, threshold=0)[0]["id"] == "old-0"
+    assert retriever.index_stats()["snapshot"] == old != new
+
+def test_version_checks_are_rate_limited(tmp_path, monkeypatch):
+    """Within INDEX_CHECK_INTERVAL requests don't look at the version files"""
+    monkeypatch.setattr(config, "VECTOR_INDEX_DIR", str(tmp_path / "index"))
+    monkeypatch.setattr(config, "INDEX_VERSION_FILE", str(tmp_path / "index_version"))
+    monkeypatch.setattr(config, "INDEX_CHECK_INTERVAL", 60)
+    monkeypatch.setattr(config, "USE_EMBEDDING_CACHE", False)
+    monkeypatch.setattr(retrieve, "_model", OneHotEncoder())
+    os.makedirs(config.VECTOR_INDEX_DIR)
+
+    write_snapshot(config.VECTOR_INDEX_DIR, ["old-0", "old-1"])
+    retriever = retrieve.Retriever(backend="numpy")
+    reads, read_index_version = [], retrieve.read_index_version
+    monkeypatch.setattr(retrieve, "read_index_version", lambda: reads.append(1) or read_index_version())
+    write_snapshot(config.VECTOR_INDEX_DIR, ["new-0", "new-1"])
+    assert retriever.retrieve("first", top_k=1, threshold=0)[0]["id"] == "old-0"
+    assert reads == []
+
+    retriever.next_version_check = 0
+    assert retriever.retrieve("first", top_k=1, threshold=0)[0]["id"] == "new-0"
+    assert reads == [1]
+
+def test_publish_keeps_previous_snapshot_for_lazy_side_indexes(tmp_path, monkeypatch):
+    """A view still on the replaced snapshot can open its BM25 index after a publish"""
+    monkeypatch.setattr(config, "VECTOR_INDEX_DIR", str(tmp_path / "index"))
+    monkeypatch.setattr(config, "INDEX_VERSION_FILE", str(tmp_path / "index_version"))
+    monkeypatch.setattr(config, "USE_EMBEDDING_CACHE", False)
+    monkeypatch.setattr(retrieve, "_model", OneHotEncoder())
+    os.makedirs(config.VECTOR_INDEX_DIR)
+
+    first = write_snapshot(config.VECTOR_INDEX_DIR, ["old-0", "old-1"], keep=1)
+    retriever = retrieve.Retriever(backend="numpy")
+    in_flight = retriever.acquire_view()
+    second = write_snapshot(config.VECTOR_INDEX_DIR, ["new-0", "new-1"], keep=1)
+    assert list_snapshots(config.VECTOR_INDEX_DIR) == [first, second]
+    assert in_flight.get_lexical_index().search("old", 1)[0]["id"] == "old-0"
+    retriever.release_view(in_flight)
+
+    # Deferred to the next publish
+    third = write_snapshot(config.VECTOR_INDEX_DIR, ["next-0", "next-1"], keep=1)
+    assert list_snapshots(config.VECTOR_INDEX_DIR) == [second, third]
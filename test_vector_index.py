@@ -0,0 +1,143 @@
+"""
+Tests for the memory-mapped vector index and exact numpy search
+"""
+
+import os
+import numpy as np
+import pytest
+from vector_index import IndexWriter, VectorIndex, top_k_l2, recall_at_k, sample_queries
+from quantization import build_quantized, load_quantizer, quantized_top_k
+from metadata_index import MetadataIndex, build_metadata_index, normalize_filters
+from lexical_index import LexicalIndex, build_lexical_index
+from retrieve import fuse_results
+
+def test_index_round_trip(tmp_path):
+    """Rows written in batches are read back from the mapped files"""
+    vectors = np.random.default_rng(0).random((5, 4), dtype=np.float32)
+    writer = IndexWriter(str(tmp_path), 5, 4, "test-model")
+    writer.add(["a", "b"], ["first", "café"], [{"review_idx": 0}, {}], vectors[:2])
+    writer.add(["c", "d", "e"], ["x", "y", "z"], [{"review_idx": i} for i in (2, 3, 4)], vectors[2:])
+    writer.close()
+
+    index = VectorIndex(str(tmp_path))
+    assert len(index) == 5
+    assert np.allclose(index.vectors, vectors)
+    assert index.hit(1, 0.5) == {"id": "b", "text": "café", "distance": 0.5, "metadata": {}}
+    assert index.hit(4, 0.0)["metadata"] == {"review_idx": 4}
+
+def test_top_k_matches_brute_force():
+    """Blocked top-k equals a full sort of squared L2 distances"""
+    rng = np.random.default_rng(1)
+    vectors = rng.random((1000, 16), dtype=np.float32)
+    queries = rng.random((3, 16), dtype=np.float32)
+    sq_norms = (vectors ** 2).sum(axis=1)
+
+    rows, distances = top_k_l2(vectors, sq_norms, queries, 10, block_rows=128)
+    exact = ((queries[:, None, :] - vectors[None, :, :]) ** 2).sum(axis=2)
+    assert (rows == np.argsort(exact, axis=1)[:, :10]).all()
+    assert np.allclose(distances, np.sort(exact, axis=1)[:, :10], atol=1e-4)
+
+    subset = np.arange(0, 1000, 7)
+    rows, _ = top_k_l2(vectors, sq_norms, queries, 5, block_rows=50, rows=subset)
+    assert (rows == subset[np.argsort(exact[:, subset], axis=1)[:, :5]]).all()
+
+@pytest.mark.parametrize("name", ["int8", "pq", "pca"])
+def test_quantized_search_with_rescoring(tmp_path, name):
+    """Codes are smaller than float32 and re-scoring recovers the exact top-k"""
+    vectors = np.random.default_rng(2).random((600, 16), dtype=np.float32)
+    sq_norms = (vectors ** 2).sum(axis=1)
+    build_quantized(str(tmp_path), vectors, name, pq_subvectors=4, pca_dims=12)
+    quantizer = load_quantizer(str(tmp_path), name)
+    assert quantizer.nbytes() < vectors.nbytes
+
+    queries = sample_queries(vectors, 20)
+    exact_rows, exact_dist = top_k_l2(vectors, sq_norms, queries, 5)
+    rows, distances = quantized_top_k(quantizer, vectors, sq_norms, queries, 5, rescore_factor=20)
+    assert recall_at_k(rows, exact_rows) == 1.0
+    assert np.allclose(distances, exact_dist, atol=1e-4)
+
+def test_pca_coarse_distances_are_exact_at_full_rank(tmp_path):
+    """Keeping every component loses nothing, so coarse distances are exact"""
+    vectors = np.random.default_rng(3).normal(size=(300, 8)).astype(np.float32)
+    sq_norms = (vectors ** 2).sum(axis=1)
+    build_quantized(str(tmp_path), vectors, "pca", pca_dims=8)
+    quantizer = load_quantizer(str(tmp_path), "pca")
+    queries = sample_queries(vectors, 5)
+    exact = ((queries[:, None, :] - vectors[None, :, :]) ** 2).sum(axis=2)
+    assert np.allclose(quantizer.distances(queries, sq_norms, 0, 300), exact, atol=1e-3)
+    assert quantizer.explained == pytest.approx(1.0)
+
+def test_metadata_filters_resolve_to_rows(tmp_path):
+    """Restaurant, rating range and date range filters intersect to the right rows"""
+    metadatas = [
+        {"restaurant": "a", "rating": 5, "date_key": 20220101},
+        {"restaurant": "b", "rating": 1, "date_key": 20210615},
+        {"restaurant": "a", "rating": 2, "date_key": 20220301},
+        {"restaurant": "a", "rating": 4},
+        {},
+    ]
+    writer = IndexWriter(str(tmp_path), 5, 2)
+    writer.add([str(i) for i in range(5)], ["t"] * 5, metadatas, np.zeros((5, 2)))
+    writer.close()
+    build_metadata_index(str(tmp_path))
+    index = MetadataIndex(str(tmp_path))
+
+    def rows(filters):
+        return index.candidate_rows(normalize_filters(filters)).tolist()
+
+    assert index.candidate_rows(normalize_filters({})) is None
+    assert rows({"restaurant": "a"}) == [0, 2, 3]
+    assert rows({"restaurant": "a", "rating_min": 3}) == [0, 3]
+    assert rows({"date_from": "2022-01-01", "date_to": "2022-12-31"}) == [0, 2]
+    assert rows({"restaurant": "missing"}) == []
+    for bad in ("01/01/2022", [1], {"y": 2022}, 1.5, True):
+        with pytest.raises(ValueError):
+            normalize_filters({"date_from": bad})
+
+def test_bm25_ranking_and_fusion(tmp_path):
+    """Rare exact terms rank first under BM25, and RRF favours hits found by both legs"""
+    texts = [
+        "the pizza was great",
+        "great service and great pizza",
+        "try the khachapuri, a cheese bread",
+        "service was slow",
+    ]
+    metadatas = [{"restaurant": "a"}, {"restaurant": "b"}, {"restaurant": "a"}, {"restaurant": "b"}]
+    writer = IndexWriter(str(tmp_path), 4, 2)
+    writer.add([f"doc_{i}" for i in range(4)], texts, metadatas, np.zeros((4, 2)))
+    writer.close()
+    build_metadata_index(str(tmp_path))
+    build_lexical_index(str(tmp_path))
+    index = LexicalIndex(str(tmp_path))
+
+    assert [hit["id"] for hit in index.search("Khachapuri", 5)] == ["doc_2"]
+    assert [hit["id"] for hit in index.search("great pizza", 5)] == ["doc_1", "doc_0"]
+    assert [hit["id"] for hit in index.search("pizza", 5, {"restaurant": "b"})] == ["doc_1"]
+    assert index.search("sushi", 5) == []
+
+    vector = [{"id": "doc_3", "text": "", "score": 0.9, "distance": 0.1, "metadata": {}},
+              {"id": "doc_1", "text": "", "score": 0.8, "distance": 0.2, "metadata": {}}]
+    fused = fuse_results(vector, index.search("great pizza", 5), top_k=3, rrf_k=60)
+    assert [r["id"] for r in fused] == ["doc_1", "doc_3", "doc_0"]
+    assert fused[0]["vector_score"] == 0.8 and fused[0]["bm25"] > 0
+    assert fused[1]["bm25"] is None
+
+def test_bm25_spilled_blocks_match_one_block(tmp_path):
+    """Postings merged from many spilled blocks equal those built in one block"""
+    texts = ["great pizza", "pizza pizza and wine", "", "wine bar", "great great service", "pizza"]
+    built = {}
+    for block_rows in (2, 100):
+        directory = str(tmp_path / str(block_rows))
+        writer = IndexWriter(directory, len(texts), 2)
+        writer.add([f"doc_{i}" for i in range(len(texts))], texts, [{}] * len(texts), np.zeros((len(texts), 2)))
+        writer.close()
+        build_lexical_index(directory, block_rows=block_rows)
+        built[block_rows] = [np.load(os.path.join(directory, name)) for name in
+                             ("term_offsets.npy", "postings_rows.npy", "postings_tf.npy", "doc_lengths.npy")]
+        assert not os.path.exists(os.path.join(directory, "lexical_runs"))
+    for spilled, single in zip(built[2], built[100]):
+        assert spilled.tolist() == single.tolist()
+    assert built[2][1].tolist()[:2] == [1, 3]  # "and", then "bar": terms are sorted
+
+if __name__ == "__main__":
+    pytest.main([__file__])
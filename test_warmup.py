@@ -0,0 +1,69 @@
+"""
+Tests for startup warm-up and the /ready check
+"""
+
+import numpy as np
+import pytest
+import encoders
+import retrieve
+import warmup
+
+class FakeModel:
+    def encode(self, texts, **kwargs):
+        return np.ones((len(texts), 2), dtype=np.float32)
+
+class FakeRetriever:
+    """Records the dummy search the warm-up runs"""
+    def __init__(self):
+        self.model = FakeModel()
+        self.searches = []
+
+    def search_many(self, embeddings, top_k, threshold):
+        self.searches.append((len(embeddings), top_k))
+        return [[]]
+
+def fake_model_loading(monkeypatch, retriever):
+    """Point the warm-up at a fake retriever instead of the real model and index"""
+    monkeypatch.setattr(encoders, "import_backend", lambda: None)
+    monkeypatch.setattr(retrieve, "load_model", lambda: retriever.model)
+    monkeypatch.setattr(retrieve, "get_retriever", lambda: retriever)
+
+def test_ready_is_503_until_warm_up_has_run(monkeypatch):
+    import app
+
+    fresh = warmup.Startup()
+    monkeypatch.setattr(app, "startup", fresh)
+    retriever = FakeRetriever()
+    fake_model_loading(monkeypatch, retriever)
+    client = app.app.test_client()
+
+    response = client.get("/ready")
+    assert response.status_code == 503
+    assert response.get_json()["status"] == "starting"
+    assert client.get("/health").status_code == 200
+
+    fresh.start().join(5)
+    response = client.get("/ready")
+    assert response.status_code == 200
+    assert response.get_json()["status"] == "ready"
+    assert {"load model", "open index", "warm-up query"} <= set(response.get_json()["startup_seconds"])
+    assert retriever.searches == [(1, 1)]
+
+def test_failed_warm_up_stays_unready(monkeypatch):
+    import app
+
+    fresh = warmup.Startup()
+    monkeypatch.setattr(app, "startup", fresh)
+    fake_model_loading(monkeypatch, FakeRetriever())
+
+    def missing_index():
+        raise FileNotFoundError("no index")
+    monkeypatch.setattr(retrieve, "get_retriever", missing_index)
+
+    fresh.warm_up()
+    response = app.app.test_client().get("/ready")
+    assert response.status_code == 503
+    assert response.get_json()["status"] == "failed" and "no index" in response.get_json()["error"]
+
+if __name__ == "__main__":
+    pytest.main([__file__])
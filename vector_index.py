@@ -0,0 +1,244 @@
+"""
+On-Disk Vector Index
+Memory-mappable export of the review collection, used by the in-process search
+backends in retrieve.py
+
+Layout of an index directory:
+    manifest.json          count, dim, model, distance space, creation time
+    vectors.npy            float32 (count, dim) embeddings
+    sq_norms.npy           float32 (count,) squared L2 norms of the embeddings
+    ids.bin / ids_offsets.npy            UTF-8 string table of document IDs
+    texts.bin / texts_offsets.npy        UTF-8 string table of review texts
+    metadata.bin / metadata_offsets.npy  UTF-8 string table of JSON metadata
+
+Every file is written once, front to back, so an index of any size can be
+produced with bounded memory; readers map the files instead of loading them.
+"""
+
+import json
+import os
+import shutil
+import time
+import numpy as np
+
+MANIFEST = "manifest.json"
+
+class StringTable:
+    """
+    Read-only, memory-mapped table of strings (bytes blob + int64 offsets)
+    """
+
+    def __init__(self, directory, name):
+        self.offsets = np.load(os.path.join(directory, f"{name}_offsets.npy"), mmap_mode="r")
+        blob_path = os.path.join(directory, f"{name}.bin")
+        if os.path.getsize(blob_path) > 0:
+            self.blob = np.memmap(blob_path, dtype=np.uint8, mode="r")
+        else:
+            self.blob = np.zeros(0, dtype=np.uint8)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        start, end = int(self.offsets[i]), int(self.offsets[i + 1])
+        return self.blob[start:end].tobytes().decode("utf-8")
+
+class StringTableWriter:
+    """
+    Streams strings into a StringTable of known length
+    """
+
+    def __init__(self, directory, name, count):
+        self.blob = open(os.path.join(directory, f"{name}.bin"), "wb")
+        self.offsets = np.lib.format.open_memmap(
+            os.path.join(directory, f"{name}_offsets.npy"), mode="w+", dtype=np.int64, shape=(count + 1,)
+        )
+        self.offsets[0] = 0
+        self.position = 0
+        self.row = 0
+
+    def add(self, strings):
+        for string in strings:
+            data = string.encode("utf-8")
+            self.blob.write(data)
+            self.position += len(data)
+            self.row += 1
+            self.offsets[self.row] = self.position
+
+    def close(self):
+        self.blob.close()
+        self.offsets.flush()
+        del self.offsets
+
+class IndexWriter:
+    """
+    Writes an index directory from batches of (ids, texts, metadatas, vectors)
+
+    The total row count must be known up front; rows are appended in order.
+    """
+
+    def __init__(self, directory, count, dim, model_name=None, space=None):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.count = count
+        self.dim = dim
+        self.model_name = model_name
+        self.space = space
+        self.row = 0
+        self.vectors = np.lib.format.open_memmap(
+            os.path.join(directory, "vectors.npy"), mode="w+", dtype=np.float32, shape=(count, dim)
+        )
+        self.sq_norms = np.lib.format.open_memmap(
+            os.path.join(directory, "sq_norms.npy"), mode="w+", dtype=np.float32, shape=(count,)
+        )
+        self.ids = StringTableWriter(directory, "ids", count)
+        self.texts = StringTableWriter(directory, "texts", count)
+        self.metadata = StringTableWriter(directory, "metadata", count)
+
+    def add(self, ids, texts, metadatas, vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        end = self.row + len(ids)
+        if end > self.count:
+            raise ValueError(f"Index sized for {self.count} rows, got at least {end}")
+        self.vectors[self.row:end] = vectors
+        self.sq_norms[self.row:end] = np.einsum("ij,ij->i", vectors, vectors)
+        self.ids.add(ids)
+        self.texts.add(texts)
+        self.metadata.add(json.dumps(m or {}, sort_keys=True) for m in metadatas)
+        self.row = end
+
+    def close(self):
+        if self.row != self.count:
+            raise ValueError(f"Index sized for {self.count} rows, only {self.row} written")
+        self.vectors.flush()
+        self.sq_norms.flush()
+        del self.vectors, self.sq_norms
+        for table in (self.ids, self.texts, self.metadata):
+            table.close()
+        manifest = {
+            "count": self.count,
+            "dim": self.dim,
+            "model": self.model_name,
+            "space": self.space,
+            "created": time.time(),
+        }
+        with open(os.path.join(self.directory, MANIFEST), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+
+def replace_directory(tmp_dir, final_dir):
+    """
+    Move a freshly written directory into place, removing the previous one
+    """
+    old_dir = None
+    if os.path.exists(final_dir):
+        old_dir = f"{final_dir}.old-{os.getpid()}"
+        os.replace(final_dir, old_dir)
+    os.replace(tmp_dir, final_dir)
+    if old_dir:
+        shutil.rmtree(old_dir, ignore_errors=True)
+
+class VectorIndex:
+    """
+    Read-only view of an index directory; vectors and strings stay memory-mapped
+    """
+
+    def __init__(self, directory):
+        manifest_path = os.path.join(directory, MANIFEST)
+        if not os.path.exists(manifest_path):
+            raise FileNotFoundError(f"No vector index at {directory} (run ingest.py --export-index)")
+        with open(manifest_path, encoding="utf-8") as f:
+            self.manifest = json.load(f)
+
+        self.directory = directory
+        self.vectors = np.load(os.path.join(directory, "vectors.npy"), mmap_mode="r")
+        self.sq_norms = np.load(os.path.join(directory, "sq_norms.npy"), mmap_mode="r")
+        self.ids = StringTable(directory, "ids")
+        self.texts = StringTable(directory, "texts")
+        self.metadata = StringTable(directory, "metadata")
+
+    def __len__(self):
+        return self.manifest["count"]
+
+    @property
+    def dim(self):
+        return self.manifest["dim"]
+
+    def hit(self, row, distance):
+        """
+        Result entry for one row, in the shape the retriever formats
+        """
+        return {
+            "id": self.ids[row],
+            "text": self.texts[row],
+            "distance": float(distance),
+            "metadata": json.loads(self.metadata[row]),
+        }
+
+def top_k_l2(vectors, sq_norms, queries, top_k, block_rows=65536, rows=None):
+    """
+    Exact top-k by squared L2 distance (the same distance ChromaDB reports)
+
+    Args:
+        vectors (np.ndarray): (n, dim) float32, may be memory-mapped
+        sq_norms (np.ndarray): (n,) squared norms of vectors
+        queries (np.ndarray): (b, dim) float32
+        top_k (int): Results per query
+        block_rows (int): Rows scored per matrix multiply (bounds temporary memory)
+        rows (np.ndarray): Optional sorted subset of row numbers to search
+
+    Returns:
+        tuple: (rows, distances), each (b, k) with k = min(top_k, n), closest first
+    """
+    queries = np.asarray(queries, dtype=np.float32)
+    n = len(vectors) if rows is None else len(rows)
+    k = min(top_k, n)
+    if k == 0:
+        empty = np.zeros((len(queries), 0))
+        return empty.astype(np.int64), empty.astype(np.float32)
+
+    q_sq = np.einsum("ij,ij->i", queries, queries)
+    best_rows = np.zeros((len(queries), 0), dtype=np.int64)
+    best_dist = np.zeros((len(queries), 0), dtype=np.float32)
+
+    for start in range(0, n, block_rows):
+        if rows is None:
+            block_ids = np.arange(start, min(start + block_rows, n))
+            block = np.asarray(vectors[start:start + block_rows])
+            block_sq = np.asarray(sq_norms[start:start + block_rows])
+        else:
+            block_ids = np.asarray(rows[start:start + block_rows])
+            block = np.asarray(vectors[block_ids])
+            block_sq = np.asarray(sq_norms[block_ids])
+
+        # ||q - x||^2 = ||q||^2 + ||x||^2 - 2 q.x, for every (query, row) pair
+        dist = q_sq[:, None] + block_sq[None, :] - 2.0 * (queries @ block.T)
+        np.maximum(dist, 0, out=dist)
+
+        cand_dist = np.concatenate([best_dist, dist], axis=1)
+        cand_rows = np.concatenate([best_rows, np.broadcast_to(block_ids, dist.shape)], axis=1)
+        if cand_dist.shape[1] > k:
+            keep = np.argpartition(cand_dist, k - 1, axis=1)[:, :k]
+            cand_dist = np.take_along_axis(cand_dist, keep, axis=1)
+            cand_rows = np.take_along_axis(cand_rows, keep, axis=1)
+        best_dist, best_rows = cand_dist, cand_rows
+
+    order = np.argsort(best_dist, axis=1, kind="stable")
+    return np.take_along_axis(best_rows, order, axis=1), np.take_along_axis(best_dist, order, axis=1)
+
+def recall_at_k(found_rows, exact_rows):
+    """
+    Mean fraction of the exact top-k found by an approximate search
+    """
+    hits = [len(set(found) & set(exact)) / max(len(exact), 1) for found, exact in zip(found_rows, exact_rows)]
+    return float(np.mean(hits)) if hits else 1.0
+
+def sample_queries(vectors, count, seed=0, noise=0.05):
+    """
+    Held-out style queries: randomly chosen stored vectors with a little noise,
+    so the query is not trivially its own nearest neighbour
+    """
+    rng = np.random.default_rng(seed)
+    rows = np.sort(rng.choice(len(vectors), min(count, len(vectors)), replace=False))
+    queries = np.asarray(vectors[rows], dtype=np.float32)
+    scale = noise * float(np.sqrt(np.mean(np.einsum("ij,ij->i", queries, queries)) / max(queries.shape[1], 1)))
+    return queries + rng.normal(0, scale, queries.shape).astype(np.float32)
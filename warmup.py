@@ -0,0 +1,102 @@
+"""
+Startup and Warm-Up
+Loads the model, opens the index and runs a dummy encode + search before the
+first user query, timing each phase; /ready reports the outcome
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+import config
+
+class Startup:
+    """
+    Startup state ("starting" -> "warming" -> "ready" or "failed") and the
+    duration of each phase, in seconds
+    """
+
+    def __init__(self):
+        self.state = "starting"
+        self.error = None
+        self.phases = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def ready(self):
+        return self.state == "ready"
+
+    def record(self, name, seconds):
+        with self._lock:
+            self.phases[name] = round(seconds, 3)
+
+    @contextmanager
+    def phase(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started)
+
+    def warm_up(self):
+        """
+        Load and exercise everything a query needs (blocking)
+        """
+        self.state = "warming"
+        try:
+            with self.phase("import model libraries"):
+                from encoders import import_backend
+                from retrieve import get_retriever, load_model
+                import_backend()
+
+            with self.phase("load model"):
+                load_model()
+
+            with self.phase("open index"):
+                retriever = get_retriever()
+                if config.SEARCH_MODE != "vector":
+                    retriever.get_lexical_index()
+
+            with self.phase("warm-up encode"):
+                embedding = retriever.model.encode(["warm-up"], show_progress_bar=False)
+
+            # Searches the backend directly so the dummy query doesn't land in the result cache
+            with self.phase("warm-up query"):
+                retriever.search_many(embedding, 1, 0.0)
+
+            self.state = "ready"
+        except Exception as e:
+            self.error = str(e)
+            self.state = "failed"
+        self.log()
+
+    def start(self):
+        """
+        Warm up on a background thread (once); returns immediately
+        """
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self.warm_up, name="warm-up", daemon=True)
+                self._thread.start()
+        return self._thread
+
+    def log(self):
+        total = sum(self.phases.values())
+        breakdown = " | ".join(f"{name} {seconds:.2f}s" for name, seconds in self.phases.items())
+        if self.ready:
+            print(f"✓ Ready in {total:.2f}s: {breakdown}")
+        else:
+            print(f"❌ Warm-up failed after {total:.2f}s ({breakdown}): {self.error}")
+
+    def status(self):
+        with self._lock:
+            phases = dict(self.phases)
+        return {
+            "status": self.state,
+            "error": self.error,
+            "startup_seconds": phases,
+            "total_seconds": round(sum(phases.values()), 3),
+        }
+
+# Singleton instance
+startup = Startup()